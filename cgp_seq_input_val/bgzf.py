@@ -0,0 +1,278 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Minimal BGZF (blocked gzip) support, detection, block aligned offsets for
+splitting a file between processes, block decompression and a writer.
+
+See the SAM specification, section 4.1, for the format.
+"""
+
+import gzip
+import io
+import os
+import re
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cgp_seq_input_val.error_classes import SeqValidationError
+
+try:  # optional, roughly twice as fast as zlib
+    from isal import isal_zlib as _zlib
+except ImportError:
+    _zlib = zlib
+
+# gzip member with FEXTRA set and a 'BC' subfield holding the block size
+BGZF_HEADER = re.compile(b'\x1f\x8b\x08\x04.{6}\x06\x00BC\x02\x00', re.DOTALL)
+HEADER_SIZE = 18
+MAX_BLOCK = 65536
+# data per block as written by htslib, leaves room for incompressible input
+BLOCK_DATA = 0xff00
+# isal only has levels 0-3, higher levels are compressed by zlib
+ISAL_MAX_LEVEL = 3 if _zlib is not zlib else -1
+EOF_BLOCK = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def is_bgzf(filename):
+    """
+    Checks the first block of a file for the BGZF header
+    """
+    with open(filename, 'rb') as raw:
+        return BGZF_HEADER.match(raw.read(HEADER_SIZE)) is not None
+
+
+def _block_size(header):
+    return struct.unpack_from('<H', header, 16)[0] + 1
+
+
+def block_start(raw, offset, end):
+    """
+    Finds the first block starting at or after offset, a candidate header is
+    only accepted when the block it describes is followed by another header
+    (or ends exactly at end) so compressed data resembling a header is
+    skipped.
+
+    Args:
+        raw - binary handle of the BGZF file
+        offset - position to search from
+        end - size of the file
+
+    Returns:
+        int - offset of the block, end when there is none
+    """
+    raw.seek(offset)
+    window = raw.read(MAX_BLOCK * 2 + HEADER_SIZE)
+    for match in BGZF_HEADER.finditer(window):
+        pos = match.start()
+        following = pos + _block_size(window[pos:pos + HEADER_SIZE])
+        if offset + following == end:
+            return offset + pos
+        if following + HEADER_SIZE > len(window):
+            raw.seek(offset + following)
+            header = raw.read(HEADER_SIZE)
+        else:
+            header = window[following:following + HEADER_SIZE]
+        if BGZF_HEADER.match(header) is not None:
+            return offset + pos
+    return end
+
+
+def chunk_offsets(filename, chunk_bytes):
+    """
+    Divides a BGZF file into chunks of roughly chunk_bytes compressed data,
+    each starting on a block boundary.
+
+    Returns:
+        list - offsets of each chunk start followed by the file size
+    """
+    size = os.path.getsize(filename)
+    chunks = max(1, size // chunk_bytes)
+    offsets = [0]
+    with open(filename, 'rb') as raw:
+        for idx in range(1, chunks):
+            offset = block_start(raw, size * idx // chunks, size)
+            if offsets[-1] < offset < size:
+                offsets.append(offset)
+    offsets.append(size)
+    return offsets
+
+
+def iter_blocks(raw, start, end, filename):
+    """
+    Decompresses the blocks between two block aligned offsets, one block at
+    a time.
+
+    Yields:
+        bytes - the data of each block
+
+    Raises:
+        SeqValidationError - when a block header is not found where expected
+    """
+    raw.seek(start)
+    pos = start
+    while pos < end:
+        header = raw.read(HEADER_SIZE)
+        if BGZF_HEADER.match(header) is None:
+            raise SeqValidationError("Invalid BGZF block at offset %d of %s" % (pos, filename))
+        size = _block_size(header)
+        block = header + raw.read(size - HEADER_SIZE)
+        try:
+            yield _zlib.decompress(block, 31)
+        except zlib.error as err:
+            raise SeqValidationError("Invalid BGZF block at offset %d of %s: %s"
+                                     % (pos, filename, err))
+        pos += size
+
+
+class BlockIndex(object):
+    """
+    Converts offsets in the decompressed data of a BGZF file to virtual
+    offsets, (block offset << 16) | offset within the block data.  Only block
+    headers and sizes are read, walking forwards from the previous call so
+    increasing offsets cost one pass over the headers in total.
+
+    Args:
+        filename - BGZF file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._block = 0  # compressed offset of the current block
+        self._data = 0  # decompressed offset of the start of the current block
+
+    def virtual_offset(self, offset):
+        """
+        Virtual offset of a position in the decompressed data, must not be
+        before the position of the previous call
+
+        Raises:
+            SeqValidationError - when a block header is not found where expected
+        """
+        with open(self.filename, 'rb') as raw:
+            while True:
+                raw.seek(self._block)
+                header = raw.read(HEADER_SIZE)
+                if not header:  # end of file
+                    return self._block << 16
+                if BGZF_HEADER.match(header) is None:
+                    raise SeqValidationError("Invalid BGZF block at offset %d of %s"
+                                             % (self._block, self.filename))
+                size = _block_size(header)
+                raw.seek(self._block + size - 4)
+                data_size = struct.unpack('<I', raw.read(4))[0]
+                if offset < self._data + data_size:
+                    return (self._block << 16) | (offset - self._data)
+                self._block += size
+                self._data += data_size
+
+
+def open_virtual(filename, virtual_offset):
+    """
+    Opens a BGZF file for reading decompressed data from a virtual offset
+
+    Returns:
+        binary file handle
+    """
+    fq_fh = gzip.GzipFile(filename, 'rb')
+    fq_fh.fileobj.seek(virtual_offset >> 16)  # before anything is read
+    skip = virtual_offset & 0xffff
+    while skip:
+        skip -= len(fq_fh.read(skip))
+    return fq_fh
+
+
+def compress_block(data, level=6):
+    """
+    Compresses up to BLOCK_DATA bytes as a single BGZF block
+    """
+    codec = _zlib if level <= ISAL_MAX_LEVEL else zlib
+    compressor = codec.compressobj(level, codec.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    header = struct.pack('<4BI2BH2BHH', 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2,
+                         len(cdata) + HEADER_SIZE + 8 - 1)
+    return header + cdata + struct.pack('<II', _zlib.crc32(data) & 0xffffffff,
+                                        len(data) & 0xffffffff)
+
+
+class BgzfWriter(io.RawIOBase):
+    """
+    Writes BGZF compressed data to a binary handle, closing adds the empty
+    end of file block.  Blocks can be compressed by a pool of threads, zlib
+    releases the GIL so this overlaps with the caller and scales with the
+    threads.
+
+    Args:
+        raw - binary handle to write to, closed with the writer
+        level - compression level
+        threads - threads compressing blocks, 0 compresses in the caller's thread
+    """
+    def __init__(self, raw, level=6, threads=0):
+        self.raw = raw
+        self.level = level
+        self._buffer = bytearray()
+        self._pool = ThreadPoolExecutor(max_workers=threads) if threads else None
+        self._pending = deque()
+        self._max_pending = threads * 4
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= BLOCK_DATA:
+            self._write_block(bytes(self._buffer[:BLOCK_DATA]))
+            del self._buffer[:BLOCK_DATA]
+        return len(data)
+
+    def _write_block(self, data):
+        if self._pool is None:
+            self.raw.write(compress_block(data, self.level))
+            return
+        self._pending.append(self._pool.submit(compress_block, data, self.level))
+        while len(self._pending) > self._max_pending:
+            self.raw.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._write_block(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self.raw.write(self._pending.popleft().result())
+            self.raw.write(EOF_BLOCK)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+            self.raw.close()
+            super().close()
@@ -0,0 +1,115 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Checkpoints of the progress of a long running validation, an interrupted run
+can resume from the last one.
+"""
+
+import json
+import os
+import time
+
+from cgp_seq_input_val.constants import CHECKPOINT_SECONDS
+from cgp_seq_input_val.error_classes import SeqValidationError
+
+# bumped whenever the content of a checkpoint changes
+CHECKPOINT_VERSION = 1
+
+
+def input_identity(filename):
+    """
+    Details of an input file that change if it is replaced or modified
+
+    Returns:
+        dict
+    """
+    stat = os.stat(filename)
+    return {'path': os.path.abspath(filename), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+class Checkpoint(object):
+    """
+    Saves the state of a validation to a json file at most once per interval.
+    The file is replaced atomically so a run killed while saving leaves the
+    previous checkpoint intact.
+
+    Args:
+        filename - checkpoint file
+        interval - optional, seconds between checkpoints [CHECKPOINT_SECONDS]
+    """
+    def __init__(self, filename, interval=CHECKPOINT_SECONDS):
+        self.filename = filename
+        self.interval = interval
+        self._saved = time.monotonic()
+
+    def due(self):
+        """
+        True when interval seconds have passed since the last save (or creation)
+        """
+        return time.monotonic() - self._saved >= self.interval
+
+    def save(self, state):
+        """
+        Writes the state (json compatible dict)
+        """
+        state = dict(state, version=CHECKPOINT_VERSION)
+        partial = self.filename + '.tmp'
+        with open(partial, 'w') as fp:
+            json.dump(state, fp)
+        os.replace(partial, self.filename)
+        self._saved = time.monotonic()
+
+    def load(self):
+        """
+        Reads the last state saved
+
+        Returns:
+            dict - None when there is no checkpoint
+
+        Raises:
+            SeqValidationError - when the checkpoint was written by another version
+        """
+        if not os.path.exists(self.filename):
+            return None
+        with open(self.filename, 'r') as fp:
+            state = json.load(fp)
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise SeqValidationError("Checkpoint %s was written by an incompatible version"
+                                     % self.filename)
+        return state
+
+    def remove(self):
+        """
+        Deletes the checkpoint, once the validation has finished
+        """
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
@@ -30,8 +30,11 @@
 ########## LICENCE ##########
 
 """General command line utility functions"""
+import argparse
 import os
 
+from cgp_seq_input_val.constants import version
+
 
 def extn_check(parser, choices, fname, readable=False):
     """Checks file extensions fit expected sets
@@ -51,3 +54,17 @@ def extn_check(parser, choices, fname, readable=False):
         # can't cover these easily
         parser.error("File doesn't end with {}".format(choices))
     return fname
+
+
+class VersionAction(argparse.Action):
+    """
+    As action='version' but the version of this package is only looked up
+    when asked for, reading package metadata is slow
+    """
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS,
+                 help="show program's version number and exit"):
+        super().__init__(option_strings, dest=dest, default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print('%s %s' % (parser.prog, version()))
+        parser.exit()
@@ -35,27 +35,51 @@ Handle the command line parsing and select the correct sub process.
 
 import argparse
 import sys
-import pkg_resources  # part of setuptools
+from importlib import import_module
 
 from cgp_seq_input_val import constants, cliutil
-from cgp_seq_input_val.manifest import normalise
-from cgp_seq_input_val.manifest import wrapped_validate
-from cgp_seq_input_val.seq_validator import validate_seq_files
-version = pkg_resources.require("cgp_seq_input_val")[0].version
+from cgp_seq_input_val.constants import (BATCH_ENGINES, CACHE_FILE, CHECKPOINT_SECONDS,
+                                         COMPRESS_LEVEL, DIGESTS, ENGINES, READ_BACKENDS,
+                                         WRITE_BACKENDS)
+from cgp_seq_input_val.resources import ResourceUsage
+
+
+def subcommand(module, function):
+    """
+    Entry point of a sub-command, the module is only imported when the
+    sub-command runs so the command line starts quickly
+
+    Args:
+        module - module of this package
+        function - name of the function taking the parsed arguments
+    """
+    def run_subcommand(args):
+        return getattr(import_module('cgp_seq_input_val.' + module), function)(args)
+    return run_subcommand
 
 
 def main():
     """
     Sets up the parser and handles triggereing of correct sub-command
     """
+    usage = ResourceUsage()
     common_parser = argparse.ArgumentParser('parent', add_help=False)
     common_parser.add_argument('-v', '--version',
-                               action='version',
-                               version='%(prog)s ' + version)
+                               action=cliutil.VersionAction)
+    common_parser.add_argument('--resource-log',
+                               dest='resource_log',
+                               metavar='FILE',
+                               help='Write peak memory, cpu, wall time and I/O as json at exit',
+                               required=False)
+    common_parser.add_argument('--profile',
+                               dest='profile',
+                               metavar='FILE',
+                               help='Profile the command (main thread) writing pstats data',
+                               required=False)
 
     parser = argparse.ArgumentParser(prog='cgpSeqInputVal', parents=[common_parser])
 
-    subparsers = parser.add_subparsers(help='sub-command help')
+    subparsers = parser.add_subparsers(help='sub-command help', dest='command')
 
     # create the parser for the "man-norm" command
     parser_a = subparsers.\
@@ -79,7 +103,7 @@ def main():
                           help='Output file *.tsv [default: sub. extension]',
                           required=False,
                           type=lambda s: cliutil.extn_check(parser, ('tsv'), s))
-    parser_a.set_defaults(func=normalise)
+    parser_a.set_defaults(func=subcommand('manifest', 'normalise'))
 
     # create the parser for the "man-valid" command
     parser_b = subparsers.add_parser('man-valid',
@@ -88,12 +112,14 @@ def main():
     parser_b.add_argument('-i', '--input',
                           dest='input',
                           metavar='FILE',
-                          help='Input manifest in tsv formats',
+                          nargs='+',
+                          help='Input manifests in tsv formats, "-" for stdin (files in the \
+                          manifest are then relative to the current directory)',
                           required=True,
-                          type=lambda s: cliutil.extn_check(parser,
-                                                            ('tsv'),
-                                                            s,
-                                                            readable=True))
+                          type=lambda s: s if s == '-' else cliutil.extn_check(parser,
+                                                                               ('tsv'),
+                                                                               s,
+                                                                               readable=True))
     parser_b.add_argument('-o', '--output',
                           dest='output',
                           metavar='DIR',
@@ -103,7 +129,13 @@ def main():
                           dest='checkfiles',
                           action='store_true',
                           help='When present check file exist and are non-zero size')
-    parser_b.set_defaults(func=wrapped_validate)
+    parser_b.add_argument('-p', '--processes',
+                          dest='processes',
+                          type=int,
+                          default=None,
+                          help='Manifests validated at the same time [all cpus]',
+                          required=False)
+    parser_b.set_defaults(func=subcommand('manifest', 'wrapped_validate'))
 
     # create the parser for the "seq-valid" command
     parser_c = subparsers.add_parser('seq-valid',
@@ -124,18 +156,256 @@ def main():
     parser_c.add_argument('-q', '--qc',
                           dest='qc',
                           type=int,
-                          default=100000,
-                          help='Assess phred quality scale using N pairs (0=all, slow)',
+                          default=0,
+                          help='Assess phred quality scale using N pairs (0=all)',
                           required=False)
     parser_c.add_argument('-o', '--output',
                           dest='output',
                           type=str,
                           help='Output as interleaved FASTQ (ignored for interleaved input)',
                           required=False)
-    parser_c.set_defaults(func=validate_seq_files)
+    parser_c.add_argument('-e', '--engine',
+                          dest='engine',
+                          choices=ENGINES,
+                          default='line',
+                          help='Parser, "block" reads binary blocks and is faster',
+                          required=False)
+    parser_c.add_argument('-b', '--backend',
+                          dest='backend',
+                          choices=READ_BACKENDS,
+                          default='auto',
+                          help='Decompression of input, "auto" uses the fastest available',
+                          required=False)
+    parser_c.add_argument('-t', '--threads',
+                          dest='threads',
+                          type=int,
+                          default=1,
+                          help='Threads available to the (de)compression backends',
+                          required=False)
+    parser_c.add_argument('-w', '--write-backend',
+                          dest='write_backend',
+                          choices=WRITE_BACKENDS,
+                          default='auto',
+                          help='Compression of -o output, "auto" uses the fastest available',
+                          required=False)
+    parser_c.add_argument('--compress-level',
+                          dest='compress_level',
+                          type=int,
+                          choices=range(1, 10),
+                          metavar='1-9',
+                          default=COMPRESS_LEVEL,
+                          help='gzip level of -o output, 1 is fastest [%d]' % COMPRESS_LEVEL,
+                          required=False)
+    parser_c.add_argument('-p', '--processes',
+                          dest='processes',
+                          type=int,
+                          default=None,
+                          help='Worker processes for the "parallel" engine [all cpus]',
+                          required=False)
+    parser_c.add_argument('-s', '--stats',
+                          dest='stats',
+                          action='store_true',
+                          help='Report read lengths, base composition and Casava tile counts',
+                          required=False)
+    parser_c.add_argument('-a', '--strict',
+                          dest='strict',
+                          action='store_true',
+                          help='Only allow IUPAC bases and printable ascii quality characters',
+                          required=False)
+    parser_c.add_argument('-c', '--checkpoint',
+                          dest='checkpoint',
+                          metavar='FILE',
+                          help='Periodically save progress to FILE ("block"/"batch" engines)',
+                          required=False)
+    parser_c.add_argument('--checkpoint-interval',
+                          dest='checkpoint_interval',
+                          metavar='SECONDS',
+                          type=int,
+                          default=CHECKPOINT_SECONDS,
+                          help='Time between checkpoints [%(default)s]',
+                          required=False)
+    parser_c.add_argument('--resume',
+                          dest='resume',
+                          action='store_true',
+                          help='Continue from the --checkpoint FILE when it exists',
+                          required=False)
+    parser_c.add_argument('--sample',
+                          dest='sample',
+                          metavar='SITES',
+                          type=int,
+                          default=0,
+                          help='Triage: only validate a sample of pairs at SITES sites, '
+                               '0 validates everything [%(default)s]',
+                          required=False)
+    parser_c.add_argument('--digest',
+                          dest='digests',
+                          choices=DIGESTS,
+                          action='append',
+                          help='Checksum of the raw input and -o output, repeat for several',
+                          required=False)
+    parser_c.add_argument('--performance',
+                          dest='performance',
+                          action='store_true',
+                          help='Report time in each stage and bytes ("block"/"batch" engines)',
+                          required=False)
+    parser_c.add_argument('--profile-every',
+                          dest='profile_every',
+                          metavar='N',
+                          type=int,
+                          default=0,
+                          help='With --profile, only profile every Nth block of records '
+                               '("line"/"block"/"batch" engines)',
+                          required=False)
+    parser_c.add_argument('--resources',
+                          dest='resources',
+                          action='store_true',
+                          help='Add peak memory, cpu, wall time and I/O to the report',
+                          required=False)
+    parser_c.add_argument('--cache',
+                          dest='cache',
+                          metavar='FILE',
+                          default=CACHE_FILE,
+                          help='Cache of results of unchanged files [%(default)s]',
+                          required=False)
+    parser_c.add_argument('--no-cache',
+                          dest='no_cache',
+                          action='store_true',
+                          help='Always validate, neither use nor update the cache',
+                          required=False)
+    parser_c.set_defaults(func=subcommand('seq_validator', 'validate_seq_files'))
+
+    # create the parser for the "seq-valid-batch" command
+    parser_d = subparsers.add_parser('seq-valid-batch',
+                                     parents=[common_parser],
+                                     description='Validates the sequencing data files of every '
+                                                 'row of a manifest.')
+    parser_d.add_argument('-i', '--input',
+                          dest='input',
+                          metavar='FILE',
+                          help='Manifest json, as written by man-valid',
+                          required=True,
+                          type=lambda s: cliutil.extn_check(parser, ('json'), s, readable=True))
+    parser_d.add_argument('-d', '--input-dir',
+                          dest='input_dir',
+                          metavar='DIR',
+                          help='Directory the manifest files are relative to, the directory of '
+                               'the tsv given to man-valid',
+                          required=True)
+    parser_d.add_argument('-r', '--report',
+                          dest='report',
+                          type=argparse.FileType('w'),
+                          default='-',
+                          help='Output json report, keyed by manifest row',
+                          required=False)
+    parser_d.add_argument('-p', '--processes',
+                          dest='processes',
+                          type=int,
+                          default=None,
+                          help='Rows validated at the same time [all cpus]',
+                          required=False)
+    parser_d.add_argument('-m', '--max-decompressors',
+                          dest='decompressors',
+                          type=int,
+                          default=None,
+                          help='Rows of compressed files validated at the same time [processes]',
+                          required=False)
+    parser_d.add_argument('-f', '--fail-fast',
+                          dest='fail_fast',
+                          action='store_true',
+                          help='Stop at the first failure, rows not finished are cancelled',
+                          required=False)
+    parser_d.add_argument('-q', '--qc',
+                          dest='qc',
+                          type=int,
+                          default=0,
+                          help='Assess phred quality scale using N pairs (0=all)',
+                          required=False)
+    parser_d.add_argument('-e', '--engine',
+                          dest='engine',
+                          choices=BATCH_ENGINES,
+                          default='block',
+                          help='Parser, as seq-valid',
+                          required=False)
+    parser_d.add_argument('-b', '--backend',
+                          dest='backend',
+                          choices=READ_BACKENDS,
+                          default='auto',
+                          help='Decompression of input, "auto" uses the fastest available',
+                          required=False)
+    parser_d.add_argument('-t', '--threads',
+                          dest='threads',
+                          type=int,
+                          default=1,
+                          help='Threads available to the decompression backend of each row',
+                          required=False)
+    parser_d.add_argument('-s', '--stats',
+                          dest='stats',
+                          action='store_true',
+                          help='Report read lengths, base composition and Casava tile counts',
+                          required=False)
+    parser_d.add_argument('-a', '--strict',
+                          dest='strict',
+                          action='store_true',
+                          help='Only allow IUPAC bases and printable ascii quality characters',
+                          required=False)
+    parser_d.add_argument('--sample',
+                          dest='sample',
+                          metavar='SITES',
+                          type=int,
+                          default=0,
+                          help='Triage: only validate a sample of pairs at SITES sites, '
+                               '0 validates everything [%(default)s]',
+                          required=False)
+    parser_d.add_argument('--digest',
+                          dest='digests',
+                          choices=DIGESTS,
+                          action='append',
+                          help='Checksum of the raw input files, repeat for several',
+                          required=False)
+    parser_d.add_argument('--cache',
+                          dest='cache',
+                          metavar='FILE',
+                          default=CACHE_FILE,
+                          help='Cache of results of unchanged files [%(default)s]',
+                          required=False)
+    parser_d.add_argument('--no-cache',
+                          dest='no_cache',
+                          action='store_true',
+                          help='Always validate, neither use nor update the cache',
+                          required=False)
+    parser_d.set_defaults(func=subcommand('seq_batch', 'validate_manifest_files'))
 
     args = parser.parse_args()
-    if len(sys.argv) > 1:
-        args.func(args)
+    if args.command == 'man-valid' and '-' in args.input and len(args.input) > 1:
+        parser.error('stdin ("-") can only be validated on its own')
+    if getattr(args, 'profile_every', 0) and not args.profile:
+        parser.error('--profile-every requires --profile')
+    if len(sys.argv) > 1 and args.command is not None:
+        run(args, usage)
     else:
         sys.exit('\nERROR Arguments required\n\tPlease run: cgpSeqInputVal --help\n')
+
+
+def run(args, usage):
+    """
+    Runs the selected sub-command, writing the resources used to
+    --resource-log and the profile to --profile when given, also when the
+    command fails
+    """
+    args.profiler = None
+    if args.profile:
+        profiling = import_module('cgp_seq_input_val.profiling')
+        args.profiler = profiling.Profiler(getattr(args, 'profile_every', 0))
+        args.profiler.start()
+    exit_code = 1
+    try:
+        args.func(args)
+        exit_code = 0
+    except SystemExit as err:
+        exit_code = err.code if isinstance(err.code, int) else int(err.code is not None)
+        raise
+    finally:
+        if args.profiler is not None:
+            args.profiler.dump(args.profile)
+        if args.resource_log:
+            usage.write(args.resource_log, args.command, exit_code)
@@ -31,7 +31,48 @@
 
 """Contains constants for package"""
 
+import os
+from functools import lru_cache
+from importlib import import_module
+
 # tuple not list as immutable
 MANIFEST_EXTNS = ('xls', 'xlsx', 'csv', 'tsv')
 # start of line denoting change between header and body
 HEADER_BODY_SWITCH = 'Group_ID'
+
+# Options of the sub-commands are defined here so the command line can be
+# built without importing the modules that use them.
+
+# seq-valid engines
+# line: FastqRead per record, block: FastqBlockReader over binary blocks,
+# batch: as block but records are held in numpy backed RecordBatches (needs numpy),
+# threaded: block parsing and record validation on a worker thread per file,
+# parallel: chunks of interleaved BGZF or uncompressed input validated by a pool
+# of processes
+ENGINES = ('line', 'block', 'batch', 'threaded', 'parallel')
+# seq-valid-batch engines, the 'parallel' engine starts its own pool, one row
+# per process is the same idea
+BATCH_ENGINES = ('line', 'block', 'batch', 'threaded')
+# decompression backends, see read_backend
+READ_BACKENDS = ('auto', 'isal', 'igzip', 'pigz', 'lbzip2', 'pbzip2', 'python')
+# compression backends, see write_backend
+WRITE_BACKENDS = ('auto', 'bgzip', 'pigz', 'python')
+# gzip level of written output, as before the backends (xopen's default)
+COMPRESS_LEVEL = 6
+# default time between checkpoints
+CHECKPOINT_SECONDS = 600
+# default location of the result cache, under $XDG_CACHE_HOME (~/.cache)
+CACHE_FILE = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                          os.path.join(os.path.expanduser('~'), '.cache'),
+                          'cgp_seq_input_val', 'results.sqlite')
+# checksums of input and output
+DIGESTS = ('md5', 'sha256')
+
+
+@lru_cache(maxsize=None)
+def version():
+    """
+    Installed version of this package, from the distribution metadata
+    """
+    metadata = import_module('importlib.metadata')  # slow to import, rarely needed
+    return metadata.version('cgp_seq_input_val')
@@ -0,0 +1,217 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Checksums of the raw (compressed) bytes of files, computed on a separate
+thread from the data as it is read or written so the files aren't read again.
+"""
+
+import hashlib
+import io
+import queue
+import threading
+
+from cgp_seq_input_val.constants import DIGESTS
+
+# pieces of data waiting to be hashed, bounds memory use
+QUEUE_CHUNKS = 16
+# read size when hashing the part of a file that wasn't read by the validation
+READ_BYTES = 1024 * 1024
+
+
+class Digester(object):
+    """
+    Hashes the content of a file passed to update in order, on a thread.
+    hashlib releases the GIL for large pieces so this overlaps with parsing.
+
+    Data not seen by the end, e.g. when an engine reads parts of the file
+    itself, is read from the file by hexdigests so the checksums are always
+    those of the whole file.
+
+    Args:
+        filename - file being hashed
+        algorithms - names from DIGESTS
+    """
+    def __init__(self, filename, algorithms):
+        self.filename = filename
+        self.position = 0  # bytes passed to update
+        self._hashes = [(name, hashlib.new(name)) for name in algorithms]
+        self._queue = queue.Queue(QUEUE_CHUNKS)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._reader = None
+        self._result = None
+        self._handles = []  # DigestReaders, closed with the digester
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            for (_, digest) in self._hashes:
+                digest.update(data)
+
+    def update(self, data, offset=None):
+        """
+        Adds data to the checksums, with offset only the part beyond the data
+        already seen
+
+        Args:
+            data - bytes
+            offset - optional, position of data in the file [position]
+        """
+        if offset is not None:
+            if offset + len(data) <= self.position:
+                return
+            data = data[self.position - offset:]
+        self.position += len(data)
+        self._queue.put(data)
+
+    def read_rest(self):
+        """
+        Hashes the file from position to the end
+        """
+        with open(self.filename, 'rb') as raw:
+            raw.seek(self.position)
+            data = raw.read(READ_BYTES)
+            while data:
+                self.update(data)
+                data = raw.read(READ_BYTES)
+
+    def start_reading(self):
+        """
+        Hashes the rest of the file on another thread, for engines that don't
+        read the file as a stream
+        """
+        self._reader = threading.Thread(target=self.read_rest, daemon=True)
+        self._reader.start()
+
+    def hexdigests(self):
+        """
+        Completes the checksums, the file must not be read or written afterwards
+
+        Returns:
+            dict - hex digest by algorithm name
+        """
+        if self._result is None:
+            if self._reader is not None:
+                self._reader.join()
+            self._close_handles()
+            self.read_rest()
+            self.close()
+            self._result = dict((name, digest.hexdigest()) for (name, digest) in self._hashes)
+        return self._result
+
+    def track(self, handle):
+        """
+        Closes handle with the digester, for handles passed to (de)compressors
+        that don't close them
+        """
+        self._handles.append(handle)
+
+    def _close_handles(self):
+        for handle in self._handles:
+            handle.close()
+        self._handles = []
+
+    def close(self):
+        """
+        Stops the hashing thread and closes the tracked handles
+        """
+        self._close_handles()
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+class DigestReader(io.RawIOBase):
+    """
+    Raw reader passing everything read from a binary handle to a Digester.
+    Reading the same file again from the start doesn't hash it twice.
+
+    Args:
+        raw - binary handle at the start of the file, closed with the reader
+              (which is closed at the latest with the digester)
+        digester - Digester
+    """
+    def __init__(self, raw, digester):
+        self.raw = raw
+        self.name = getattr(raw, 'name', None)
+        self.digester = digester
+        self._offset = 0
+        digester.track(self)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        if count:
+            self.digester.update(bytes(buffer[:count]), self._offset)
+            self._offset += count
+        return count
+
+    def close(self):
+        if self.closed:
+            return
+        self.raw.close()
+        super().close()
+
+
+class DigestWriter(io.RawIOBase):
+    """
+    Raw writer passing everything written to a binary handle to a Digester
+
+    Args:
+        raw - binary handle, closed with the writer (which is closed at the
+              latest with the digester)
+        digester - Digester
+    """
+    def __init__(self, raw, digester):
+        self.raw = raw
+        self.name = getattr(raw, 'name', None)
+        self.digester = digester
+        digester.track(self)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.raw.write(data)
+        self.digester.update(data)
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self.raw.close()
+        super().close()
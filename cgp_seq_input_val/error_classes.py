@@ -37,6 +37,14 @@ class SeqValidationError(RuntimeError):
     pass
 
 
+class BackendError(SeqValidationError):
+    """
+    Exception for failures of a (de)compression backend or external tool
+    rather than of the data, these results are not cached.
+    """
+    pass
+
+
 class ConfigError(RuntimeError):
     """
     Exception for errors in the values of config/*.json files.
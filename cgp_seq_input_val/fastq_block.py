@@ -0,0 +1,415 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Block based fastq parsing, works on binary handles and never decodes the data
+"""
+
+import re
+from operator import itemgetter
+
+from cgp_seq_input_val.error_classes import SeqValidationError
+from cgp_seq_input_val.fastq_read import (FastqFormat,
+                                          ILLUMINA_FASTQ_HEADER_PATTERN,
+                                          CASAVA_FASTQ_HEADER_PATTERN)
+
+# decompressed bytes requested from the handle on each read
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# bytes equivalents of the patterns in fastq_read, the str versions are used in messages
+ILLUMINA_HEADER_BYTES = re.compile(ILLUMINA_FASTQ_HEADER_PATTERN.pattern.encode())
+CASAVA_HEADER_BYTES = re.compile(CASAVA_FASTQ_HEADER_PATTERN.pattern.encode())
+
+# whitespace that str.rstrip() would remove from the end of a line
+RSTRIP_CHARS = (b'\r', b'\t', b'\x0b', b'\x0c', b' \n')
+
+# patterns matching the headers of a batch joined by (and ending with) newlines,
+# whitespace within a header is limited so a match can't span lines
+BATCH_HEADER_BYTES = {
+    FastqFormat.ILLUMINA: re.compile(rb'(?:@\S+/[12]\n)*'),
+    FastqFormat.CASAVA: re.compile(rb'(?:@\S+[ \t\r\x0b\x0c][12]:[YN]+:[\d+]+:\S+\n)*')}
+# pair member as it appears in joined headers, only possible at that position
+MEMBER_MARKS = {FastqFormat.ILLUMINA: (b'/1\n', b'/2\n'),
+                FastqFormat.CASAVA: (b' 1:', b' 2:')}
+
+# strict alphabet, IUPAC nucleotide codes (either case) and printable ascii quality
+SEQ_ALPHABET = b'ACGTURYSWKMBDHVNacgturyswkmbdhvn'
+QUAL_ALPHABET = bytes(range(33, 127))
+
+
+class FastqBlockReader(object):
+    """
+    Reads fastq records from a binary file handle in large blocks, record
+    boundaries are found by splitting each block on newlines.
+
+    Records are returned as tuples of bytes:
+        (line_no, seq_header, seq, qual_header, qual)
+
+    line_no is counted in the same way as FastqRead.file_pos[0] so that
+    messages are identical regardless of the parser used.  A record truncated
+    by the end of the file has qual_header and qual set to None.
+
+    Inputs:
+        fq_fh: file handle opened in binary mode
+        block_size: bytes to request from fq_fh on each read
+        interleaved: an empty line only ends the file after the second read
+                     of a pair
+        line_no: when fq_fh is positioned part way through a file (at the
+                 start of a record, or pair if interleaved) the line number
+                 that FastqRead would give the record
+        data: bytes already read from fq_fh, parsed before anything else
+    """
+    def __init__(self, fq_fh, block_size=BLOCK_SIZE, interleaved=False, line_no=None,
+                 data=b''):
+        self.fq_fh = fq_fh
+        self.block_size = block_size
+        self.interleaved = interleaved
+        self._resumed = line_no is not None
+        self.line_no = line_no if self._resumed else 0
+        self.count = 0  # records returned so far
+        self.finished = False  # no more records will be returned
+        self._lines = []
+        self._idx = 0
+        self._partial = b''  # incomplete last line of the previous block
+        self._data = data  # handled as the first block read
+        self._read_bytes = 0
+        self._stripped = False  # whitespace has been removed from lines
+        self._eof = False
+        self._header = None  # header of the next record, None = start of file
+
+    def _load(self):
+        """
+        Adds the complete lines from the next block to the line buffer.
+
+        Returns:
+            False when the handle is exhausted
+        """
+        if self._eof:
+            return False
+        while True:
+            block = self._data or self.fq_fh.read(self.block_size)
+            self._data = b''
+            self._read_bytes += len(block)
+            if block:
+                data = self._partial + block
+                cut = data.rfind(b'\n')
+                if cut == -1:
+                    self._partial = data
+                    continue
+                self._partial = data[cut + 1:]
+                data = data[:cut]
+            else:
+                self._eof = True
+                if not self._partial:
+                    return False
+                data = self._partial
+                self._partial = b''
+                self._read_bytes += 1  # counted as if the last line had a newline
+
+            lines = data.split(b'\n')
+            if data[-1:].isspace() or any(chars in data for chars in RSTRIP_CHARS):
+                lines = [line.rstrip() for line in lines]
+                self._stripped = True
+            self._lines = self._lines[self._idx:] + lines
+            self._idx = 0
+            return True
+
+    def _next_line(self):
+        """
+        Returns the next line, None at end of file
+        """
+        if self._idx >= len(self._lines) and not self._load():
+            return None
+        line = self._lines[self._idx]
+        self._idx += 1
+        return line
+
+    def _read_record(self, header, line_no):
+        """
+        Reads a single record line by line, handles multi-line records and
+        anything else not suited to the fast path in read_records.  Follows
+        the same rules as FastqRead.__init__.
+
+        Returns:
+            (record, header of next record, line_no)
+        """
+        start = line_no
+        seq_parts = []
+        line = self._next_line()
+        line_no += 1
+        while line is None or not line.startswith(b'+'):
+            if line is None:
+                return (start, header, b''.join(seq_parts), None, None), None, line_no
+            seq_parts.append(line)
+            line = self._next_line()
+            line_no += 1
+        seq = b''.join(seq_parts)
+        seq_len = len(seq)
+        qual_header = line
+
+        qual_parts = []
+        qual_len = 0
+        line = self._next_line()
+        while qual_len < seq_len:
+            if line is None:
+                line = b''
+            qual_parts.append(line)
+            qual_len += len(line)
+            line = self._next_line()
+            line_no += 1
+            if not line:
+                break
+        return (start, header, seq, qual_header, b''.join(qual_parts)), line, line_no
+
+    def tell(self):
+        """
+        Position of the next record, bytes of fq_fh (and data) before it
+
+        Returns:
+            int - None once whitespace has been stripped from any line as the
+                  original length of the lines is lost
+        """
+        if self._stripped:
+            return None
+        lines = self._lines[self._idx:]
+        pending = len(self._partial) + sum(map(len, lines)) + len(lines)
+        if self._header is not None:
+            pending += len(self._header) + 1
+        return self._read_bytes - pending
+
+    def read_records(self, count):
+        """
+        Read up to count records, fewer are only returned when the file is
+        finished.  An empty line in place of a header is treated as the end
+        of the file.
+
+        Returns:
+            list of record tuples
+        """
+        records = []
+        if self.finished:
+            return records
+        header = self._header
+        line_no = self.line_no
+        if header is None:
+            header = self._next_line()
+            if not self._resumed:
+                line_no = 1
+            # resumed after a record (or pair) so an empty line also ends the file
+            if header is None or (self._resumed and not header):
+                self.finished = True
+                return records
+
+        append = records.append
+        lines = self._lines
+        idx = self._idx
+        while len(records) < count:
+            if idx + 4 > len(lines):
+                self._idx = idx
+                self._load()
+                lines = self._lines
+                idx = self._idx
+            seq = None
+            if idx + 4 <= len(lines):
+                seq = lines[idx]
+                qual = lines[idx + 2]
+            # fast path, 4 line record with another record or EOF following
+            if (seq and seq[0] != 43 and lines[idx + 1][:1] == b'+'
+                    and len(qual) >= len(seq)):
+                append((line_no, header, seq, lines[idx + 1], qual))
+                header = lines[idx + 3]
+                idx += 4
+                line_no += 3
+            else:
+                self._idx = idx
+                (record, header, line_no) = self._read_record(header, line_no)
+                append(record)
+                lines = self._lines
+                idx = self._idx
+            if not header and (header is None or not self.interleaved
+                               or (self.count + len(records)) % 2 == 0):
+                self.finished = True
+                break
+
+        self.count += len(records)
+        self._idx = idx
+        self._header = header
+        self.line_no = line_no
+        return records
+
+
+def get_fq_format(record):
+    """
+    Determine the fastq format from the header of a record
+
+    Raises:
+        SeqValidationError - when header matches no known format
+    """
+    seq_header = b'' if record is None else record[1]
+    if ILLUMINA_HEADER_BYTES.match(seq_header) is not None:
+        return FastqFormat.ILLUMINA
+    if CASAVA_HEADER_BYTES.match(seq_header) is not None:
+        return FastqFormat.CASAVA
+    raise SeqValidationError("Unsupported FastQ header format: %s"
+                             % seq_header.decode('utf-8', 'replace'))
+
+
+def record_validator(fq_format):
+    """
+    Generates the function used to validate each record of the given format.
+
+    The returned function takes (record, filename) and returns the
+    (name, pair_member) of the record as bytes, raising SeqValidationError
+    with the same messages as CasavaFastqRead/IlluminaFastqRead.validate.
+    """
+    if fq_format == FastqFormat.ILLUMINA:
+        header_match = ILLUMINA_HEADER_BYTES.match
+        pattern = ILLUMINA_FASTQ_HEADER_PATTERN.pattern
+    else:
+        header_match = CASAVA_HEADER_BYTES.match
+        pattern = CASAVA_FASTQ_HEADER_PATTERN.pattern
+    casava = fq_format == FastqFormat.CASAVA
+
+    def validate(record, filename):
+        match = header_match(record[1])
+        if match is None:
+            raise SeqValidationError(
+                "Sequence record header must match pattern: '%s', line %d of %s"
+                % (pattern, record[0], filename))
+        if record[4] is None or len(record[4]) != len(record[2]):
+            raise SeqValidationError("Fastq record at line %d of %s appears to be corrupt"
+                                     % (record[0], filename))
+        if casava:
+            groups = match.groups()
+            return groups[0] + b' ' + groups[2], groups[1]
+        return match.group(1), match.group(2)
+
+    return validate
+
+
+def joined_headers(records):
+    """
+    Headers of the records as one buffer, each followed by a newline
+    """
+    if not records:
+        return b''
+    return b'\n'.join(map(itemgetter(1), records)) + b'\n'
+
+
+def records_valid(records, fq_format, headers=None):
+    """
+    Checks a batch of records in bulk, the headers are matched as one buffer
+    and the lengths compared without a python loop per record.
+
+    Args:
+        records - record tuples from FastqBlockReader
+        fq_format - FastqFormat of the file
+        headers - optional, joined_headers(records) when already available
+
+    Returns:
+        bool - True when every record would pass record_validator, when
+               False use record_validator to find the error
+    """
+    try:
+        if (list(map(len, map(itemgetter(2), records)))
+                != list(map(len, map(itemgetter(4), records)))):
+            return False
+    except TypeError:  # record truncated by the end of the file
+        return False
+    if headers is None:
+        headers = joined_headers(records)
+    return BATCH_HEADER_BYTES[fq_format].fullmatch(headers) is not None
+
+
+def pairs_named(headers_1, headers_2, pairs, fq_format):
+    """
+    Compares the names and members of pairs of valid records in bulk, no
+    name is extracted from any header.
+
+    Args:
+        headers_1 - joined_headers of the first read of each pair
+        headers_2 - joined_headers of the second read of each pair
+        pairs - number of pairs
+        fq_format - FastqFormat of the file
+
+    Returns:
+        bool - True when all names match with members 1 and 2, when False
+               use record_validator to find the pair
+    """
+    (mark_1, mark_2) = MEMBER_MARKS[fq_format]
+    return (headers_1.count(mark_1) == pairs and headers_2.count(mark_2) == pairs
+            and headers_1.replace(mark_1, mark_2) == headers_2)
+
+
+def pairs_valid(records_1, records_2, fq_format):
+    """
+    Checks pairs of records in bulk (lists of the same length), see
+    records_valid and pairs_named.
+
+    Returns:
+        bool - True when all records are valid and all pairs match
+    """
+    headers_1 = joined_headers(records_1)
+    headers_2 = joined_headers(records_2)
+    return (records_valid(records_1, fq_format, headers_1)
+            and records_valid(records_2, fq_format, headers_2)
+            and pairs_named(headers_1, headers_2, len(records_1), fq_format))
+
+
+def alphabet_valid(records):
+    """
+    Checks the sequence and quality of many records against SEQ_ALPHABET and
+    QUAL_ALPHABET, whole buffers are checked at once.
+
+    Returns:
+        bool - False if any record has an invalid character
+    """
+    seqs = b''.join([record[2] for record in records])
+    quals = b''.join([record[4] or b'' for record in records])
+    return not (seqs.translate(None, SEQ_ALPHABET) or quals.translate(None, QUAL_ALPHABET))
+
+
+def alphabet_error(record, filename):
+    """
+    Checks the sequence and quality of a record against SEQ_ALPHABET and
+    QUAL_ALPHABET.
+
+    Raises:
+        SeqValidationError - reporting the first invalid character
+    """
+    for (line, data, alphabet) in (('sequence', record[2], SEQ_ALPHABET),
+                                   ('quality', record[4] or b'', QUAL_ALPHABET)):
+        invalid = data.translate(None, alphabet)
+        if invalid:
+            raise SeqValidationError(
+                "Fastq record at line %d of %s has invalid %s character %r at position %d"
+                % (record[0], filename, line, invalid[:1].decode('latin-1'),
+                   data.index(invalid[:1]) + 1))
@@ -42,18 +42,13 @@ class FileMeta(object):
     functions to validate actual files.
     """
     def __init__(self, headers, details, rel_path):
-        self.attributes = {}
         self.rel_path = rel_path
-        cnt = 0
-        for h in headers:
-            val = None
-            if cnt == len(details) and h == 'File_2':
-                val = '.'
-            else:
-                val = details[cnt]
-
-            self.attributes[h] = val
-            cnt += 1
+        if len(details) < len(headers):
+            # only a trailing empty File_2 may be missing
+            if len(details) + 1 != len(headers) or headers[-1] != 'File_2':
+                raise IndexError('Row has %d values, expected %d' % (len(details), len(headers)))
+            details = list(details) + ['.']
+        self.attributes = dict(zip(headers, details))
 
     def get_path(self, f_type):
         """
@@ -34,19 +34,22 @@ Functions and classes to support normalisation, reading and validation of
 manifests.
 """
 import os
+import collections
+import concurrent.futures
+import itertools
 import json
 import re
 import sys
 import shutil
 import uuid
-from importlib import import_module
-from pkg_resources import resource_string, resource_filename
+from functools import lru_cache
+from importlib import import_module, resources
 
 from cgp_seq_input_val import constants
 from cgp_seq_input_val.error_classes import (ConfigError,
                                              ParsingError,
                                              ValidationError)
-from cgp_seq_input_val.file_meta import FileMeta
+from cgp_seq_input_val.file_meta import FileMeta, FileValidationError
 
 VAL_LIM_ERROR = "Only %d sample(s) with a value of '%s' is allowed in column \
                 '%s' when rows grouped by '%s'"
@@ -57,22 +60,143 @@ VAL_LIM_CONFIG_ERROR = "'limit' and 'limit_by' must both be defined when either
 # except '+' as CWL can not glob the output when it is in output file name
 # the reference linked to the line in CWLtool repo
 CWL_EN_STRICT_RE = re.compile(r"^[a-zA-Z0-9._-]+$")
+# extensions a file type extension can be followed by, 'fq.gz'
+COMPRESSION_EXTNS = frozenset(('gz', 'bz2'))
+
+PackagedConfig = collections.namedtuple('PackagedConfig', 'config rules')
 
 
 def wrapped_validate(args):
     """
-    Top level entry point for validating a manifest
+    Top level entry point for validating a manifest, or several in a pool of
+    processes
     """
+    if len(args.input) > 1:
+        failed = 0
+        results = validate_manifests(args.input, args.output, args.checkfiles, args.processes)
+        for (infile, files, error) in results:
+            if error is None:
+                print("Created files for %s:\n\t%s\n\t%s" % ((infile,) + files))
+            else:
+                failed += 1
+                print("ERROR: %s: %s" % (infile, error), file=sys.stderr)
+        if failed:
+            sys.exit("ERROR: %d of %d manifests failed validation" % (failed, len(args.input)))
+        return
     try:
-        manifest = Manifest(args.input)
-        manifest.validate()
+        manifest = Manifest(sys.stdin if args.input[0] == '-' else args.input[0])
+        manifest.validate(checkFiles=args.checkfiles)
         # output new manifest in tsv and json.
         (tsv_file, json_file) = manifest.write(args.output)
         print("Created files:\n\t%s\n\t%s" % (tsv_file, json_file))
-    except ValidationError as ve:
+    except (ValidationError, FileValidationError) as ve:
         sys.exit("ERROR: " + str(ve))
 
 
+def validate_manifest(infile, outdir, check_files=False):
+    """
+    Validates a manifest, writing the tsv and json to outdir, errors are
+    returned so one bad manifest doesn't stop the others
+
+    Returns:
+        tuple - infile, (tsv file, json file) or None, error message or None
+    """
+    try:
+        manifest = Manifest(infile)
+        manifest.validate(checkFiles=check_files)
+        return (infile, manifest.write(outdir), None)
+    except (ValidationError, FileValidationError, ParsingError, ConfigError) as err:
+        return (infile, None, str(err))
+
+
+def validate_manifests(infiles, outdir, check_files=False, processes=None):
+    """
+    Validates manifests in a pool of processes, each process reads the config
+    of a manifest type once, see validate_manifest
+
+    Args:
+        infiles - tsv manifests
+        outdir - directory for the tsv and json of each
+        check_files - optional, check the files of each manifest exist
+        processes - optional, manifests validated at the same time [all cpus]
+
+    Returns:
+        list - result of validate_manifest for each, in input order
+    """
+    processes = min(processes or os.cpu_count(), len(infiles))
+    if processes <= 1:
+        return [validate_manifest(infile, outdir, check_files) for infile in infiles]
+    # manifests are small, a few to a task keeps the processes busy
+    chunksize = max(1, len(infiles) // (processes * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(validate_manifest, infiles, itertools.repeat(outdir),
+                                 itertools.repeat(check_files), chunksize=chunksize))
+
+
+def validate_config_json(config, form_type, version):
+    """
+    Check the config is valid, simple set of rules:
+    1. 'header' exists:
+      - 'expected', 'required' and 'validate' must exist.
+      - 'validate' keys must exist in 'required' list.
+      - 'required' list must exist in 'expected' list.
+    2. 'body' exists:
+      - body content validated by it's own class.
+    """
+    if 'header' not in config:
+        raise ConfigError("header (dict/hash) not found in json file: \
+                          %s-%s.json" % (form_type, version))
+    if 'expected' not in config['header']:
+        raise ConfigError("header.expected (list/array) not found in json \
+                          file: %s-%s.json" % (form_type, version))
+    if 'required' not in config['header']:
+        raise ConfigError("header.required (list/array) not found in json \
+                          file: %s-%s.json" % (form_type, version))
+    if 'validate' not in config['header']:
+        raise ConfigError("header.validate (dict/hash) not found in json \
+                          file: %s-%s.json" % (form_type, version))
+    if 'body' not in config:
+        raise ConfigError("body (dict/hash) not found in json file: \
+                          %s-%s.json" % (form_type, version))
+
+
+def check_config(config, cfg_file, form_type, version):
+    """
+    Checks a config is for the manifest type and version and is valid
+
+    Raises:
+        ParsingError - type or version do not match
+        ConfigError - see validate_config_json
+    """
+    if config['type'] != form_type:
+        raise ParsingError("Filename (%s) does not match 'type' (%s) \
+                           within file" % (cfg_file, config['type']))
+    if config['version'] != version:
+        raise ParsingError("Filename (%s) does not match 'version' (%s) \
+                           within file" % (cfg_file, config['version']))
+    validate_config_json(config, form_type, version)
+
+
+@lru_cache(maxsize=None)
+def packaged_config(form_type, version):
+    """
+    Config of a manifest type and version from the package config directory,
+    read, checked and compiled once per process.
+
+    Returns:
+        PackagedConfig - config dict (not to be modified) and its BodyRules
+
+    Raises:
+        ParsingError, ConfigError - see check_config and BodyRules
+    """
+    resource = resources.files(__package__).joinpath('config').joinpath(
+        '%s-%s.json' % (form_type, version))
+    config = json.loads(resource.read_text(encoding='utf-8'))
+    # resource for error messages
+    check_config(config, str(resource), form_type, version)
+    return PackagedConfig(config, BodyRules(config['body']))
+
+
 def uuid4_chk(uuid_str):
     """Tests validity of uuid"""
     try:
@@ -113,25 +237,95 @@ def normalise(args):
     manifest.convert_by_extn(args.output)
 
 
-def evaulate_value_limits(field, chk, limit_chks):
+def _extension_start(name):
+    # as os.path.splitext, a name of only leading dots has no extension
+    dot = name.rfind('.')
+    if dot < 1 or (name[0] == '.' and not name[:dot].strip('.')):
+        return len(name)
+    return dot
+
+
+def full_extension(filename):
     """
-    Handles validation of fields where presence of partiular value has a max
-    occurence within a grouping of rows
+    Extension of a file name including any compression extension, '.fq.gz',
+    as two calls of os.path.splitext without their overhead
     """
-    for val_limit in chk:
-        if 'limit' not in val_limit:
-            continue
-        lim_chk_lookup = field + '_' + val_limit['value']
-        if lim_chk_lookup not in limit_chks:
-            continue
-        # its the number of samples within the group with an attribute that is important
-        for val in limit_chks[lim_chk_lookup]:
-            sample_count = len(limit_chks[lim_chk_lookup][val].keys())
-            if sample_count > val_limit['limit']:
-                raise ValidationError(VAL_LIM_ERROR % (val_limit['limit'],
-                                                       val_limit['value'],
-                                                       field,
-                                                       val_limit['limit_by']))
+    name = filename[filename.rfind('/') + 1:]
+    if name[:1] == '.':
+        dot = _extension_start(name)
+        ext = name[dot:]
+        if ext == '.gz' or ext == '.bz2':
+            return name[_extension_start(name[:dot]):]
+        return ext
+    # every dot starts an extension
+    parts = name.rsplit('.', 2)
+    if len(parts) == 1:
+        return ''
+    if len(parts) == 3 and parts[2] in COMPRESSION_EXTNS:
+        return '.' + parts[1] + '.' + parts[2]
+    return '.' + parts[-1]
+
+
+class ManifestReader(object):
+    """
+    Single streaming parse of a tsv manifest shared by Header and Body.  The
+    header rows are read on construction, body rows are read as they are
+    iterated so validation of the header (and of each row) can start before
+    the input is complete, rows are whitespace stripped once.
+
+    Args:
+        manifest - tsv file name, or a text handle (in memory buffer or pipe)
+        rel_path - optional, directory body files are relative to [directory
+                   of the manifest file, current directory for a handle]
+
+    Attributes:
+        header_items - dict of header field to value
+        headings - column headings of the body, None when not found
+        offset - line of the headings, body rows follow from offset + 1
+    """
+    def __init__(self, manifest, rel_path=None):
+        csv = import_module('csv')
+        if isinstance(manifest, str):
+            self.name = manifest
+            self._handle = open(manifest, 'r')
+            self._close = True
+            if rel_path is None:
+                rel_path = os.path.dirname(manifest)
+        else:
+            self.name = getattr(manifest, 'name', '<stream>')
+            self._handle = manifest
+            self._close = False  # the caller's handle
+        self.rel_path = '' if rel_path is None else rel_path
+        self._reader = csv.reader(self._handle, delimiter='\t')
+        self.header_items = {}
+        self.headings = None
+        self.offset = 1
+        for row in self._reader:
+            # clean any white space around each cell
+            row = [ele.strip() for ele in row]
+            if row[0] == constants.HEADER_BODY_SWITCH:
+                self.headings = row
+                break
+            self.header_items[row[0]] = row[1] if len(row) > 1 else ''
+            self.offset += 1
+        if self.headings is None:
+            self.close()
+
+    def rows(self):
+        """
+        Yields the whitespace stripped body rows, once, closing the input at
+        the end.
+        """
+        try:
+            for row in self._reader:
+                yield [ele.strip() for ele in row]
+        finally:
+            self.close()
+
+    def close(self):
+        """Closes the input when opened by this object"""
+        if self._close:
+            self._handle.close()
 
 
 class Manifest(object):
@@ -142,10 +336,16 @@ class Manifest(object):
 
     Configuration is handled via the json files found in the config sub
     directory.
+
+    Args:
+        infile - tsv file name, or a text handle for validate
     """
     def __init__(self, infile):
         self.infile = infile
-        self.informat = os.path.splitext(infile)[1][1:]
+        if isinstance(infile, str):
+            self.informat = os.path.splitext(infile)[1][1:]
+        else:
+            self.informat = 'tsv'
         self.header = None
         self.config = None
         self.body = None
@@ -198,7 +398,7 @@ class Manifest(object):
 
     def validate(self, checkFiles=False):
         """
-        Runs the actual validation of a manifest:
+        Runs the actual validation of a manifest, the input is parsed once:
          - Create header object
          - Load config
          - Validate header
@@ -208,13 +408,17 @@ class Manifest(object):
         if self.informat != 'tsv':
             raise ValueError('Manifest.validate only accepts files of type \
                              "tsv"')
-        # Generate the header object
-        self.header = Header(self.infile)
-        self.config = self.header.get_config()
-        self.header.validate(self.config['header'])
-        # process body of document
-        self.body = Body(self.infile, self.config['body'])
-        self.body.validate(self.config['body'])
+        reader = ManifestReader(self.infile)
+        try:
+            # Generate the header object
+            self.header = Header(reader)
+            (self.config, rules) = packaged_config(self.header.type, self.header.version)
+            self.header.validate(self.config['header'])
+            # process body of document
+            self.body = Body(reader, self.config['body'])
+        finally:
+            reader.close()
+        self.body.validate(rules)
         if checkFiles:
             self.body.file_tests()
 
@@ -256,21 +460,19 @@ class Manifest(object):
 class Header(object):
     """
     Object to load and validate the header section of a manifest
+
+    Args:
+        manifest - tsv file name or a ManifestReader shared with Body
     """
     def __init__(self, manifest):
-        self.manifest = manifest
-        csv = import_module('csv')
-        header_items = {}
-        with open(self.manifest, 'r') as ifh:
-            for row in csv.reader(ifh, delimiter='\t'):
-                # clean any white space around each cell
-                row = [ele.strip() for ele in row]
-                if row[0] == constants.HEADER_BODY_SWITCH:
-                    break
-                val = ''
-                if len(row) > 1:
-                    val = row[1]
-                header_items[row[0]] = val
+        if isinstance(manifest, ManifestReader):
+            header_items = manifest.header_items
+            self.manifest = manifest.name
+        else:
+            reader = ManifestReader(manifest)
+            reader.close()
+            header_items = reader.header_items
+            self.manifest = manifest
 
         # now load the ini based on 'Form type:' and 'Form version:'
         if 'Form type:' not in header_items:
@@ -298,57 +500,22 @@ class Header(object):
 
     def get_config(self, cfg_file=None):
         """
-        Return the location of the config file to use in validation steps
+        Return the location of the config file to use in validation steps,
+        those of the package are only read and checked once, do not modify
         """
-        config = None
         if cfg_file is None:
-            resource = 'config/%s-%s.json' % (self.type, self.version)
-            resource_as_string = resource_string(__name__,
-                                                 resource).decode("utf-8",
-                                                                  "strict")
-            config = json.loads(resource_as_string)
-            # for error messages
-            cfg_file = resource_filename(__name__, resource)
-        else:
-            print('direct from file', cfg_file, file=sys.stderr)
-            with open(cfg_file, 'r') as j:
-                config = json.load(j)
-
-        if config['type'] != self.type:
-            raise ParsingError("Filename (%s) does not match 'type' (%s) \
-                               within file" % (cfg_file, config['type']))
-        if config['version'] != self.version:
-            raise ParsingError("Filename (%s) does not match 'version' (%s) \
-                               within file" % (cfg_file, config['version']))
-
-        self.validate_json(config)
+            return packaged_config(self.type, self.version).config
+        print('direct from file', cfg_file, file=sys.stderr)
+        with open(cfg_file, 'r') as j:
+            config = json.load(j)
+        check_config(config, cfg_file, self.type, self.version)
         return config
 
     def validate_json(self, config):
         """
-        Check the config is valid, simple set of rules:
-        1. 'header' exists:
-          - 'expected', 'required' and 'validate' must exist.
-          - 'validate' keys must exist in 'required' list.
-          - 'required' list must exist in 'expected' list.
-        2. 'body' exists:
-          - body content validated by it's own class.
-        """
-        if 'header' not in config:
-            raise ConfigError("header (dict/hash) not found in json file: \
-                              %s-%s.json" % (self.type, self.version))
-        if 'expected' not in config['header']:
-            raise ConfigError("header.expected (list/array) not found in json \
-                              file: %s-%s.json" % (self.type, self.version))
-        if 'required' not in config['header']:
-            raise ConfigError("header.required (list/array) not found in json \
-                              file: %s-%s.json" % (self.type, self.version))
-        if 'validate' not in config['header']:
-            raise ConfigError("header.validate (dict/hash) not found in json \
-                              file: %s-%s.json" % (self.type, self.version))
-        if 'body' not in config:
-            raise ConfigError("body (dict/hash) not found in json file: \
-                              %s-%s.json" % (self.type, self.version))
+        Check the config is valid, see validate_config_json
+        """
+        validate_config_json(config, self.type, self.version)
 
     def fields_exist(self, expected):
         """
@@ -416,34 +583,219 @@ class Header(object):
             self.uuid = uuid_found
 
 
+class BodyRules(object):
+    """
+    The body section of a config compiled once into a plan that checks every
+    rule of a row in one pass over the rows.  Allowed values and extensions
+    are sets, value limits count the samples of each group as rows are seen.
+
+    Errors are those of checking each rule over all rows in turn, the first
+    failing check (in the order of the constants below) then the first line,
+    a check stops being evaluated once an earlier one has failed.
+
+    Args:
+        config - body section of the config
+
+    Raises:
+        ConfigError - when only one of 'limit' and 'limit_by' is defined
+    """
+    REQUIRED, VALUES, UNIQUE, EXTENSION, CWL = range(5)
+    PASSED = 5
+
+    def __init__(self, config):
+        self.required = tuple(config['required'])
+        # (field, allowed values, ((value, limit, limit_by), ...)) in config order
+        self.fields = []
+        for field, chk in config['validate'].items():
+            limits = []
+            for val_limit in chk:
+                if 'limit' not in val_limit and 'limit_by' not in val_limit:
+                    continue
+                if 'limit' not in val_limit or 'limit_by' not in val_limit:
+                    # must be found in both
+                    raise ConfigError(VAL_LIM_CONFIG_ERROR+field)
+                limits.append((val_limit['value'], val_limit['limit'], val_limit['limit_by']))
+            self.fields.append((field, frozenset(d['value'] for d in chk), tuple(limits)))
+        # file type: (valid extensions, for messages)
+        self.extensions = {f_type: (frozenset(extns), ', '.join(extns))
+                           for f_type, extns in config['validate_ext'].items()}
+        # on unless disabled, configs before 1.5.2 do not have it
+        self.reject_cwl = config.get('reject_cwl_incompatible_filename', True)
+
+    def check(self, file_detail, offset):
+        """
+        Validates the rows of a body
+
+        Args:
+            file_detail - FileMeta of each row
+            offset - line of the headings, the first row is on the next line
+
+        Raises:
+            ValidationError - the first failing check
+        """
+        errors = [None] * self.PASSED
+        failed = self.PASSED  # earliest check with an error
+        # first invalid value of each field
+        invalid = [None] * len(self.fields)
+        # per field and limit, distinct samples of each limit_by group and those seen
+        counts = [[(collections.Counter(), set()) for _ in limits]
+                  for (_, _, limits) in self.fields]
+        all_files = set()
+        required = self.required
+        fields = tuple(enumerate(self.fields))
+        cwl_match = CWL_EN_STRICT_RE.match if self.reject_cwl else None
+        cnt = offset
+        for fd in file_detail:
+            cnt += 1
+            attributes = fd.attributes
+            for req in required:
+                value = attributes[req]
+                if (not value) or value == '.':
+                    errors[self.REQUIRED] = ValidationError(
+                        "Required metadata value absent for \
+                        '%s' on line %d ('.' not acceptable)" % (req, cnt))
+                    break
+            if errors[self.REQUIRED] is not None:
+                break
+
+            # an earlier field failing on a later row decides the error so all are checked
+            for idx, (field, allowed, limits) in fields:
+                if invalid[idx] is not None:
+                    continue
+                value = attributes[field]
+                if value not in allowed:
+                    invalid[idx] = ValidationError(
+                        "Metadata item '%s' has an invalid \
+                        value of '%s' on line %d" % (field, value, cnt))
+                    failed = min(failed, self.VALUES)
+                    continue
+                for ((lim_value, limit, limit_by), (samples, seen)) in zip(limits, counts[idx]):
+                    if value != lim_value:
+                        continue
+                    key = (attributes[limit_by], attributes['Sample'])
+                    if key not in seen:
+                        seen.add(key)
+                        samples[key[0]] += 1
+                        if samples[key[0]] > limit:
+                            failed = min(failed, self.VALUES)
+
+            if failed <= self.UNIQUE:
+                continue
+            file_1 = attributes['File']
+            file_2 = attributes['File_2']
+            if file_1 != '.':
+                if file_1 in all_files:
+                    errors[self.UNIQUE] = ValidationError(
+                        "Metadata item '%s' has a duplicate \
+                        value of '%s' on line %d" % ('File', file_1, cnt))
+                    failed = self.UNIQUE
+                    continue
+                all_files.add(file_1)
+            if file_2 != '.':
+                if file_2 in all_files:
+                    errors[self.UNIQUE] = ValidationError(
+                        "Metadata item '%s' has a duplicate \
+                        value of '%s' on line %d" % ('File_2', file_2, cnt))
+                    failed = self.UNIQUE
+                    continue
+                all_files.add(file_2)
+
+            if failed <= self.EXTENSION:
+                continue
+            errors[self.EXTENSION] = self.extension_error(file_1, file_2, cnt)
+            if errors[self.EXTENSION] is not None:
+                failed = self.EXTENSION
+                continue
+
+            if failed <= self.CWL or cwl_match is None:
+                continue
+            for item in (file_1, file_2):
+                if not cwl_match(item):
+                    errors[self.CWL] = ValidationError(
+                        "File has CWL imcompatible character(s) in the name: '%s' on line %d."
+                        % (item, cnt) + f" Acceptable pattern is: '{CWL_EN_STRICT_RE.pattern}'."
+                    )
+                    failed = self.CWL
+                    break
+
+        errors[self.VALUES] = self.values_error(invalid, counts)
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def extension_error(self, file_1, file_2, cnt):
+        """
+        Checks the files of a row have valid and matching extensions
+
+        Returns:
+            ValidationError - or None when valid
+        """
+        last_ext = None
+        for (f_type, item) in (('File', file_1), ('File_2', file_2)):
+            if item == '.':
+                continue
+            full_ext = full_extension(item)
+            (valid, valid_extn) = self.extensions[f_type]
+            if full_ext.lower() not in valid:
+                return ValidationError(
+                    f"File extension of '{full_ext}' is not valid ({valid_extn}), " +
+                    f"'{f_type}' on line {cnt} of manifest."
+                )
+
+            if last_ext is not None and last_ext != full_ext:
+                return ValidationError(
+                    "File extensions for same row must match," +
+                    f"'{last_ext}' vs '{full_ext}' on line {cnt} of manifest."
+                )
+            last_ext = full_ext
+        return None
+
+    def values_error(self, invalid, counts):
+        """
+        The error of the first field with an invalid value or, when all of
+        its values are valid, a value with more samples than its limit in a
+        group
+
+        Returns:
+            ValidationError - or None when valid
+        """
+        for idx, (field, _, limits) in enumerate(self.fields):
+            if invalid[idx] is not None:
+                return invalid[idx]
+            for ((lim_value, limit, limit_by), (samples, _)) in zip(limits, counts[idx]):
+                if any(count > limit for count in samples.values()):
+                    return ValidationError(VAL_LIM_ERROR % (limit, lim_value, field, limit_by))
+        return None
+
+
 class Body(object):
     """
     Body object validates the individual records of a manifest.
     Takes the body component of the config object loaded/checked
     by header object.
+
+    Args:
+        manifest - tsv file name or a ManifestReader, rows are read from the
+                   reader's current position
+        config - body section of the config
     """
     def __init__(self, manifest, config):
-        self.manifest = manifest
-        self.offset = 1  # start at one otherwise need to increment for header
-        manifest_dir = os.path.dirname(manifest)
-        csv = import_module('csv')
+        reader = manifest
+        if not isinstance(manifest, ManifestReader):
+            reader = ManifestReader(manifest)
+        self.manifest = reader.name
+        self.offset = reader.offset  # line of the headings
         self.file_detail = []
-        loadRows = False
-        with open(self.manifest, 'r') as ifh:
-            for row in csv.reader(ifh, delimiter='\t'):
-                # clean any white space around each cell
-                row = [ele.strip() for ele in row]
-                if row[0] == constants.HEADER_BODY_SWITCH:
-                    loadRows = True
-                    self.headings = row
-                    self.heading_check(config)
-                    continue
-                if not loadRows:
-                    self.offset += 1
-                    continue
-                self.file_detail.append(FileMeta(self.headings,
-                                                 row,
-                                                 manifest_dir))
+        if reader.headings is None:
+            return
+        self.headings = reader.headings
+        try:
+            self.heading_check(config)
+        except ValidationError:
+            reader.close()
+            raise
+        for row in reader.rows():
+            self.file_detail.append(FileMeta(self.headings, row, reader.rel_path))
 
     def write(self, fp, config):
         """
@@ -465,139 +817,17 @@ class Body(object):
 
     def validate(self, rules):
         """
-        Runs the different elements of body validation:
-         - validate fields with restricted dict
+        Runs all elements of body validation in a single pass over the rows,
+        rules are the body section of the config or compiled BodyRules:
+         - required fields have values
+         - validate fields with restricted dict, and value limits
          - validate file/file_2 do not overlap
+         - file extensions
+         - CWL compatible file names
         """
-        self.fields_have_values(rules['required'])
-        self.field_values_valid(rules['validate'])
-        self.uniq_files()
-        self.file_ext_check(rules['validate_ext'])
-        self.filename_cwl_compatibility_check(rules['reject_cwl_incompatible_filename'])
-
-    def field_values_valid(self, validate):
-        """
-        Check fields with restriced dict are valid
-        Must run after self.fields_have_values()
-        If 'limit' and 'limit_by' are defined will create a counter for each of
-        these entities and error if 'limit' exceeded
-        """
-        for field, chk in validate.items():
-            cnt = self.offset
-            limit_chks = {}
-            for fd in self.file_detail:
-                cnt += 1
-                # checks all values are valid
-                if fd.attributes[field] not in [d['value'] for d in chk]:
-                    raise ValidationError("Metadata item '%s' has an invalid \
-                                          value of '%s' on line %d"
-                                          % (field, fd.attributes[field], cnt))
-                # Construct value occurence limiting counts
-                for val_limit in chk:
-                    if 'limit' not in val_limit and 'limit_by' not in val_limit:
-                        # if in neither skip
-                        continue
-
-                    if 'limit' not in val_limit or 'limit_by' not in val_limit:
-                        # must be found in both
-                        raise ConfigError(VAL_LIM_CONFIG_ERROR+field)
-
-                    if fd.attributes[field] != val_limit['value']:
-                        continue
-
-                    lim_chk_lookup = field + '_' + val_limit['value']
-                    limit_by_value = fd.attributes[val_limit['limit_by']]
-
-                    # handled things we've not seen yet
-                    if lim_chk_lookup not in limit_chks:
-                        limit_chks[lim_chk_lookup] = {}
-                    if limit_by_value not in limit_chks[lim_chk_lookup]:
-                        limit_chks[lim_chk_lookup][limit_by_value] = {}
-
-                    if fd.attributes['Sample'] not in limit_chks[lim_chk_lookup][limit_by_value]:
-                        limit_chks[lim_chk_lookup][limit_by_value][fd.attributes['Sample']] = 0
-                    limit_chks[lim_chk_lookup][limit_by_value][fd.attributes['Sample']] += 1
-
-            evaulate_value_limits(field, chk, limit_chks)
-
-    def fields_have_values(self, rules):
-        """
-        Check the fields listed as required are populated
-        """
-        cnt = self.offset
-        for fd in self.file_detail:
-            cnt += 1
-            for req in rules:
-                if (not fd.attributes[req]) or fd.attributes[req] == '.':
-                    raise ValidationError("Required metadata value absent for \
-                                          '%s' on line %d ('.' not acceptable)"
-                                          % (req, cnt))
-
-    def uniq_files(self):
-        """
-        Check all filenames are uniq within this manifest
-        """
-        cnt = self.offset
-        all_files = []
-        for fd in self.file_detail:
-            cnt += 1
-            for f_type in ('File', 'File_2'):
-                item = fd.attributes[f_type]
-                if item == '.':
-                    continue
-                if item in all_files:
-                    raise ValidationError("Metadata item '%s' has a duplicate \
-                                          value of '%s' on line %d"
-                                          % (f_type, item, cnt))
-                all_files.append(item)
-
-    def file_ext_check(self, rules):
-        """
-        Check all files have valid extentions
-        - see config/*.json
-        """
-        cnt = self.offset
-        for fd in self.file_detail:
-            cnt += 1
-            last_ext = None
-            for f_type in ('File', 'File_2'):
-                item = fd.attributes[f_type]
-                if item == '.':
-                    continue
-                extra = ''
-                (base, ext) = os.path.splitext(item)
-                if ext == '.gz' or ext == '.bz2':
-                    extra = ext
-                    (base, ext) = os.path.splitext(base)
-                full_ext = ext + extra
-
-                if full_ext.lower() not in rules[f_type]:
-                    valid_extn = ', '.join(rules[f_type])
-                    raise ValidationError(
-                        f"File extension of '{full_ext}' is not valid ({valid_extn}), " +
-                        f"'{f_type}' on line {cnt} of manifest."
-                    )
-
-                if last_ext is not None and last_ext != full_ext:
-                    raise ValidationError(
-                        "File extensions for same row must match," +
-                        f"'{last_ext}' vs '{full_ext}' on line {cnt} of manifest."
-                    )
-                last_ext = full_ext
-
-    def filename_cwl_compatibility_check(self, rules: bool):
-        if not rules:
-            return
-        cnt = self.offset
-        for fd in self.file_detail:
-            cnt += 1
-            for f_type in ('File', 'File_2'):
-                item = fd.attributes[f_type]
-                if not CWL_EN_STRICT_RE.match(item):
-                    raise ValidationError(
-                        "File has CWL imcompatible character(s) in the name: '%s' on line %d."
-                        % (item, cnt) + f" Acceptable pattern is: '{CWL_EN_STRICT_RE.pattern}'."
-                    )
+        if not isinstance(rules, BodyRules):
+            rules = BodyRules(rules)
+        rules.check(self.file_detail, self.offset)
 
     def heading_check(self, config):
         """
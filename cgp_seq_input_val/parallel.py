@@ -0,0 +1,413 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Validation of independent chunks of fastq files in separate processes.
+
+BGZF chunks start at the first record (pair when interleaved) found after
+a block boundary, resyncing in the same way for the chunk and the one
+before it so that the chunks cover the file with no gaps or overlaps.
+
+Uncompressed files are memory mapped and divided by line, the lines in
+each part of the file are counted first so that a chunk covers the same
+records of both files of a pair.
+
+Workers only accept chunks made entirely of valid 4 line records, anything
+else is reported as a failure and the parent re-validates serially from
+the start of that chunk, giving the same messages and line numbers as the
+serial engines.
+"""
+
+import io
+import mmap
+import os
+from bisect import bisect_left
+from collections import namedtuple
+
+from cgp_seq_input_val.error_classes import SeqValidationError
+from cgp_seq_input_val import bgzf
+from cgp_seq_input_val.fastq_block import (FastqBlockReader, alphabet_valid, pairs_valid,
+                                           record_validator)
+from cgp_seq_input_val.quality import QualityHistogram
+from cgp_seq_input_val.seq_stats import SeqStats
+
+# compressed (BGZF) or uncompressed bytes handled by each worker process
+CHUNK_BYTES = 16 * 1024 * 1024
+# slice of a mapped file copied at a time when counting lines
+COUNT_BYTES = 1024 * 1024
+# records validated together by a worker, must be even
+BATCH_RECORDS = 8192
+# returned by find_record_start when the data ends before a candidate is confirmed
+NEED_MORE = -1
+
+# ok - False when the parent needs to re-validate from the start of the chunk
+# start - BGZF: offset of the first record in the decompressed chunk,
+#         mapped: tuple of the offset of the first record in each file
+# next_start - BGZF: offset of the first record in the decompressed following chunk
+# quality - counts of each quality character (list of 256), None if not assessed
+# stats - SeqStats of the chunk, None if not collected
+ChunkResult = namedtuple('ChunkResult', 'ok start next_start pairs quality stats')
+
+
+def _failed(start=None, next_start=None):
+    return ChunkResult(False, start, next_start, 0, None, None)
+
+
+def _record_at(data, start, validate_record):
+    """
+    Checks for a 4 line record at start and returns (name, member, next_start)
+
+    Returns:
+        None - not a valid 4 line record
+        NEED_MORE - data ends before the record and the following '@'
+    """
+    ends = []
+    pos = start
+    for _ in range(4):
+        end = data.find(b'\n', pos)
+        if end == -1:
+            return NEED_MORE
+        ends.append(end)
+        pos = end + 1
+    if pos >= len(data):
+        return NEED_MORE
+    seq = data[ends[0] + 1:ends[1]].rstrip()
+    if (data[pos] != 64 or data[ends[1] + 1] != 43 or not seq or seq[0] == 43
+            or len(seq) != len(data[ends[2] + 1:ends[3]].rstrip())):
+        return None
+    record = (0, data[start:ends[0]].rstrip(), seq, b'+', seq)
+    try:
+        (name, member) = validate_record(record, '')
+    except SeqValidationError:
+        return None
+    return name, member, pos
+
+
+def find_record_start(data, fq_format, interleaved):
+    """
+    Finds the first line beginning a valid 4 line record (or first of a pair
+    when interleaved).  The start of data is never considered as it may be
+    part way through a line.
+
+    Args:
+        data - bytes to search
+        fq_format - FastqFormat of the file
+        interleaved - require a complete pair
+
+    Returns:
+        int - offset of the record
+        None - no record found
+        NEED_MORE - data ends before a candidate could be confirmed
+    """
+    validate_record = record_validator(fq_format)
+    pos = data.find(b'\n@')
+    while pos != -1:
+        start = pos + 1
+        first = _record_at(data, start, validate_record)
+        if first == NEED_MORE:
+            return NEED_MORE
+        if first is not None:
+            if not interleaved:
+                return start
+            if first[1] == b'1':
+                second = _record_at(data, first[2], validate_record)
+                if second == NEED_MORE:
+                    return NEED_MORE
+                if second is not None and second[0] == first[0] and second[1] == b'2':
+                    return start
+        pos = data.find(b'\n@', start)
+    return None
+
+
+def _lines(chunk, start, end):
+    """
+    Number of lines in chunk[start:end], counting an unterminated last line
+    """
+    lines = 0
+    for pos in range(start, end, COUNT_BYTES):
+        lines += chunk[pos:min(pos + COUNT_BYTES, end)].count(b'\n')
+    if end > start and chunk[end - 1] != 10:
+        lines += 1
+    return lines
+
+
+class MappedRange(object):
+    """
+    Read only handle over part of a memory mapped file, each read copies
+    just the bytes requested.
+    """
+    def __init__(self, mapped, start, end):
+        self.mapped = mapped
+        self.pos = start
+        self.end = end
+
+    def read(self, size):
+        data = self.mapped[self.pos:min(self.pos + size, self.end)]
+        self.pos += len(data)
+        return data
+
+
+def check_records(handles, lines, fq_format, interleaved, check_qual, collect_stats=False,
+                  strict=False):
+    """
+    Validates the records of a chunk, which should hold only complete 4 line
+    records, from one interleaved or two paired binary handles.
+
+    Args:
+        handles - one handle when interleaved, else the handles of read 1 and 2
+        lines - the number of lines available from each handle
+        fq_format - FastqFormat of the file
+        interleaved - records should be in pairs
+        check_qual - count the quality characters of all records
+        collect_stats - gather SeqStats of all records
+        strict - check the sequence and quality alphabets
+
+    Returns:
+        (pairs, quality, stats) - None if the chunk needs serial validation,
+                                  quality and stats as ChunkResult
+    """
+    readers = [FastqBlockReader(handle, interleaved=interleaved, line_no=0)
+               for handle in handles]
+    pairs = 0
+    quality = QualityHistogram()
+    stats = SeqStats() if collect_stats else None
+    while not readers[0].finished:
+        batches = [readers[0].read_records(BATCH_RECORDS)]
+        if interleaved:
+            batches = [batches[0][0::2], batches[0][1::2]]
+        else:
+            batches.append(readers[1].read_records(len(batches[0])))
+        count = len(batches[0])
+        if len(batches[1]) != count or not pairs_valid(batches[0], batches[1], fq_format):
+            return None
+        if strict and not all([alphabet_valid(batch) for batch in batches]):
+            return None
+        if check_qual and count:
+            quals = [record[4] for record in batches[0]] + [record[4] for record in batches[1]]
+            quality.add(b''.join(quals))
+        if collect_stats:
+            stats.add_records(batches[0])
+            stats.add_records(batches[1])
+        pairs += count
+    # multi-line records, an early end from an empty line or extra records in
+    # read 2 all leave lines unaccounted for
+    records = pairs * 2 if interleaved else pairs
+    if any(file_lines != records * 4 for file_lines in lines):
+        return None
+    return pairs, quality.counts if check_qual else None, stats
+
+
+def check_chunk(chunk, fq_format, interleaved, check_qual, collect_stats=False, strict=False):
+    """
+    Validates a chunk of interleaved or single end data held in memory
+
+    Returns:
+        (pairs, quality, stats) - None if the chunk needs serial validation
+    """
+    return check_records([io.BytesIO(chunk)], [_lines(chunk, 0, len(chunk))],
+                         fq_format, interleaved, check_qual, collect_stats, strict)
+
+
+def bgzf_chunk(filename, offsets, idx, fq_format, interleaved, check_qual, collect_stats=False,
+               strict=False):
+    """
+    Validates one chunk of a BGZF file, runs in a worker process.
+
+    Args:
+        filename - BGZF compressed fastq
+        offsets - from bgzf.chunk_offsets
+        idx - chunk to process, covers offsets[idx] to offsets[idx + 1]
+        fq_format - FastqFormat of the file
+        interleaved - records should be in pairs
+        check_qual - count the quality characters of all records
+        collect_stats - gather SeqStats of all records
+        strict - check the sequence and quality alphabets
+
+    Returns:
+        ChunkResult
+    """
+    try:
+        with open(filename, 'rb') as raw:
+            data = b''.join(bgzf.iter_blocks(raw, offsets[idx], offsets[idx + 1], filename))
+            start = 0
+            if idx:
+                start = find_record_start(data, fq_format, interleaved)
+                if start is None or start == NEED_MORE:
+                    return _failed()
+            next_start = None
+            if idx + 2 < len(offsets):
+                # only as much of the next chunk as needed, the forward search
+                # finds the same record as the worker with all of it
+                following = b''
+                for block in bgzf.iter_blocks(raw, offsets[idx + 1], offsets[idx + 2], filename):
+                    following += block
+                    next_start = find_record_start(following, fq_format, interleaved)
+                    if next_start is not None and next_start != NEED_MORE:
+                        break
+                if next_start is None or next_start == NEED_MORE:
+                    return _failed(start)
+                data += following[:next_start]
+    except SeqValidationError:
+        return _failed()
+    checked = check_chunk(data[start:], fq_format, interleaved, check_qual, collect_stats,
+                          strict)
+    if checked is None:
+        return _failed(start, next_start)
+    return ChunkResult(True, start, next_start, *checked)
+
+
+def range_starts(size, chunk_bytes):
+    """
+    Divides an uncompressed file into parts of roughly chunk_bytes
+
+    Returns:
+        list - offsets of each part followed by the file size
+    """
+    parts = max(1, size // chunk_bytes)
+    return [size * idx // parts for idx in range(parts)] + [size]
+
+
+def _map(raw):
+    if os.fstat(raw.fileno()).st_size == 0:
+        return b''  # empty files can't be mapped
+    return mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def count_newlines(filename, start, end):
+    """
+    Counts the newlines in part of an uncompressed file, runs in a worker process.
+    """
+    with open(filename, 'rb') as raw:
+        mapped = _map(raw)
+        lines = 0
+        for pos in range(start, end, COUNT_BYTES):
+            lines += mapped[pos:min(pos + COUNT_BYTES, end)].count(b'\n')
+        if mapped:
+            mapped.close()
+    return lines
+
+
+def line_bounds(starts, counts, targets):
+    """
+    Converts line numbers to a position that a worker can find without
+    reading the whole file.
+
+    Args:
+        starts - offsets of each part of the file, from range_starts
+        counts - newlines in each part, from count_newlines
+        targets - the number of lines before each position
+
+    Returns:
+        list - (part offset, newlines to skip from there) per target, None
+               when there are fewer lines than the target
+    """
+    prefix = [0]
+    for count in counts:
+        prefix.append(prefix[-1] + count)
+    bounds = []
+    for target in targets:
+        if target > prefix[-1]:
+            bounds.append(None)
+        elif target == 0:
+            bounds.append((starts[0], 0))
+        else:  # the part holding the newline ending line number target
+            idx = bisect_left(prefix, target) - 1
+            bounds.append((starts[idx], target - prefix[idx]))
+    return bounds
+
+
+def _line_offset(mapped, pos, lines):
+    """
+    Offset after the given number of newlines from pos
+    """
+    while lines:
+        piece = mapped[pos:pos + COUNT_BYTES]
+        count = piece.count(b'\n')
+        if count < lines:
+            if not piece:
+                break
+            lines -= count
+            pos += len(piece)
+            continue
+        idx = -1
+        for _ in range(lines):
+            idx = piece.index(b'\n', idx + 1)
+        return pos + idx + 1
+    return pos
+
+
+def mapped_chunk(filenames, starts, ends, fq_format, interleaved, check_qual,
+                 collect_stats=False, strict=False):
+    """
+    Validates the same records of one interleaved or two paired uncompressed
+    files, runs in a worker process.  The files are memory mapped so only
+    the blocks being parsed are copied.
+
+    Args:
+        filenames - the interleaved file or read 1 and read 2 files
+        starts - position of the first record in each file, from line_bounds
+        ends - position after the last record in each file
+               (None is the end of the file for both)
+        fq_format - FastqFormat of the file
+        interleaved - records should be in pairs
+        check_qual - count the quality characters of all records
+        collect_stats - gather SeqStats of all records
+        strict - check the sequence and quality alphabets
+
+    Returns:
+        ChunkResult
+    """
+    raws = []
+    maps = []
+    try:
+        offsets = []
+        handles = []
+        lines = []
+        for (filename, start, end) in zip(filenames, starts, ends):
+            raws.append(open(filename, 'rb'))
+            mapped = _map(raws[-1])
+            maps.append(mapped)
+            start = len(mapped) if start is None else _line_offset(mapped, *start)
+            end = len(mapped) if end is None else _line_offset(mapped, *end)
+            offsets.append(start)
+            handles.append(MappedRange(mapped, start, end))
+            lines.append(_lines(mapped, start, end))
+        checked = check_records(handles, lines, fq_format, interleaved, check_qual,
+                                collect_stats, strict)
+    finally:
+        for mapped in maps:
+            if mapped:
+                mapped.close()
+        for raw in raws:
+            raw.close()
+    if checked is None:
+        return _failed(tuple(offsets))
+    return ChunkResult(True, tuple(offsets), None, *checked)
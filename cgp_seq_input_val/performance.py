@@ -0,0 +1,159 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Low overhead timers and counters for the stages of a validation, each is
+entered once per block of records so the cost is independent of read count.
+"""
+
+import io
+import time
+
+# decode - waiting for decompressed data, excluding io when that is measured
+# io - reading the raw file, only measured when decompressed in this process
+STAGES = ('io', 'decode', 'parse', 'check_pair', 'qual_range', 'stats', 'output')
+COUNTERS = ('input_bytes', 'decompressed_bytes', 'output_bytes')
+
+
+class StageTimer(object):
+    """
+    Accumulates the time spent in each stage.  Stages nest, the time of a
+    stage excludes the stages entered within it, so the stage times add up
+    to the time covered.  Not thread safe, stages must be entered by one thread.
+    """
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._stack = []  # [stage, start, time in nested stages]
+        self._started = time.perf_counter()
+
+    def stage(self, name):
+        """
+        Context manager timing a stage
+        """
+        return _Stage(self, name)
+
+    def count(self, counter, value):
+        """
+        Adds to a counter
+        """
+        self.counters[counter] += value
+
+    def _enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self):
+        (name, start, nested) = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.seconds[name] += elapsed - nested
+        self.calls[name] += 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def report(self, records):
+        """
+        Summary of the stages for the json report
+
+        Args:
+            records - reads validated
+
+        Returns:
+            dict
+        """
+        wall = time.perf_counter() - self._started
+        report = {'wall_seconds': round(wall, 3),
+                  'records': records,
+                  'records_per_second': round(records / wall) if wall else 0,
+                  'stages': dict((name, {'seconds': round(self.seconds[name], 3),
+                                         'calls': self.calls[name]})
+                                 for name in STAGES if self.calls[name])}
+        report.update(self.counters)
+        return report
+
+
+class _Stage(object):
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer._enter(self.name)
+
+    def __exit__(self, *exc):
+        self.timer._exit()
+
+
+class _NullStage(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+# used in place of a stage when not timing
+NULL_STAGE = _NullStage()
+
+
+class TimedReader(io.RawIOBase):
+    """
+    Raw reader timing the reads from a binary handle as a stage and
+    optionally counting the bytes
+
+    Args:
+        raw - binary handle, closed with the reader
+        timer - StageTimer
+        stage - name from STAGES
+        counter - optional, name from COUNTERS
+    """
+    def __init__(self, raw, timer, stage, counter=None):
+        self.raw = raw
+        self.name = getattr(raw, 'name', None)
+        self.timer = timer
+        self.stage = stage
+        self.counter = counter
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        with self.timer.stage(self.stage):
+            count = self.raw.readinto(buffer)
+        if self.counter is not None:
+            self.timer.count(self.counter, count)
+        return count
+
+    def close(self):
+        if self.closed:
+            return
+        self.raw.close()
+        super().close()
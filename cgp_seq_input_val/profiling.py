@@ -0,0 +1,98 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+cProfile of a whole command or, sampled, of every Nth block of records read
+by SeqValidator so long runs can be profiled with little overhead.  Output
+is pstats data, view with 'python -m pstats FILE' or any pstats viewer.
+"""
+
+import cProfile
+
+
+class Profiler(object):
+    """
+    Profiles the thread that starts it, worker threads and processes are not
+    included.
+
+    Args:
+        every - optional, only profile every Nth block of records, 0 profiles
+                everything between start and stop [0]
+    """
+    def __init__(self, every=0):
+        if every < 0:
+            raise ValueError("every must be 0 or more")
+        self.every = every
+        self.blocks = 0  # blocks of records seen
+        self.profiled = 0  # blocks of records profiled
+        self._profile = cProfile.Profile()
+        self._enabled = False
+
+    def _enable(self):
+        if not self._enabled:
+            self._profile.enable()
+            self._enabled = True
+
+    def stop(self):
+        """
+        Stops profiling, what has been profiled is kept
+        """
+        if self._enabled:
+            self._profile.disable()
+            self._enabled = False
+
+    def start(self):
+        """
+        Profiles everything until stop, unless sampling blocks
+        """
+        if not self.every:
+            self._enable()
+
+    def block(self):
+        """
+        Marks the start of a block of records when sampling, the block is
+        profiled until the next call (or stop) when it is an Nth block
+        """
+        if not self.every:
+            return
+        if self.blocks % self.every == 0:
+            self.profiled += 1
+            self._enable()
+        else:
+            self.stop()
+        self.blocks += 1
+
+    def dump(self, filename):
+        """
+        Stops profiling and writes the pstats data
+        """
+        self.stop()
+        self._profile.dump_stats(filename)
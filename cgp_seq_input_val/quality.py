@@ -0,0 +1,190 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Histograms of byte values, used to assess the encoding and binning of
+quality scores and the composition of sequence.
+"""
+
+from importlib import import_module
+
+# optional, several times faster than the pure python counting of large data,
+# imported by _numpy() when first needed as it is slow to import
+_NOT_LOADED = object()
+numpy = _NOT_LOADED
+
+# bytes collected before they are counted
+FLUSH_BYTES = 1024 * 1024
+# numpy.bincount is fastest on pieces that stay in cache, smaller data is
+# counted without numpy
+NUMPY_PIECE = 65536
+
+PHRED_OFFSET = 33
+# phred scores emitted by instruments that bin quality, N calls are always 2
+BINNING_SCHEMES = (('Illumina 4-level (RTA3)', (2, 12, 23, 37)),
+                   ('Illumina 8-level', (2, 6, 15, 22, 27, 33, 37, 40)))
+MAX_BINNED_LEVELS = 8
+
+
+def _numpy():
+    """
+    The numpy module, None when it isn't installed
+    """
+    global numpy
+    if numpy is _NOT_LOADED:
+        try:
+            numpy = import_module('numpy')
+        except ImportError:
+            numpy = None
+    return numpy
+
+
+def count_bytes(data, counts):
+    """
+    Adds the number of each byte value in data to counts (list of 256)
+    """
+    if len(data) >= NUMPY_PIECE and _numpy() is not None:
+        values = numpy.frombuffer(data, dtype=numpy.uint8)
+        total = numpy.zeros(256, dtype=numpy.int64)
+        for pos in range(0, len(values), NUMPY_PIECE):
+            total += numpy.bincount(values[pos:pos + NUMPY_PIECE], minlength=256)
+        for (value, count) in enumerate(total.tolist()):
+            counts[value] += count
+        return
+    # delete one value at a time, most frequent first so the data shrinks quickly
+    known = sorted([value for value in range(256) if counts[value]],
+                   key=lambda value: -counts[value])
+    remaining = data
+    for value in known:
+        if not remaining:
+            return
+        shrunk = remaining.translate(None, bytes((value,)))
+        counts[value] += len(remaining) - len(shrunk)
+        remaining = shrunk
+    while remaining:  # values not seen before
+        value = remaining[0]
+        shrunk = remaining.translate(None, bytes((value,)))
+        counts[value] += len(remaining) - len(shrunk)
+        remaining = shrunk
+
+
+class ByteHistogram(object):
+    """
+    Counts of each byte value.  Data passed to add is collected and counted
+    in large pieces so many small reads are cheap.
+
+    Args:
+        counts - optional, initial counts (list of 256)
+    """
+    def __init__(self, counts=None):
+        self._counts = list(counts) if counts else [0] * 256
+        self._pending = []
+        self._pending_bytes = 0
+
+    def add(self, data):
+        """
+        Adds the bytes of one or more reads
+        """
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= FLUSH_BYTES:
+            self._flush()
+
+    def merge(self, counts):
+        """
+        Adds counts from another histogram (list of 256)
+        """
+        own = self.counts
+        for (value, count) in enumerate(counts):
+            own[value] += count
+
+    def _flush(self):
+        if self._pending:
+            count_bytes(b''.join(self._pending), self._counts)
+            self._pending = []
+            self._pending_bytes = 0
+
+    @property
+    def counts(self):
+        """
+        list of 256 counts, index is the byte value
+        """
+        self._flush()
+        return self._counts
+
+    def levels(self):
+        """
+        The byte values seen, ascending
+        """
+        return [value for (value, count) in enumerate(self.counts) if count]
+
+    def min(self):
+        """
+        Lowest value seen, 1000 when empty
+        """
+        levels = self.levels()
+        return levels[0] if levels else 1000
+
+    def max(self):
+        """
+        Highest value seen, -1 when empty
+        """
+        levels = self.levels()
+        return levels[-1] if levels else -1
+
+    def report(self):
+        """
+        Non-zero counts keyed by the ascii value as a string, for json
+        """
+        return dict([(str(value), count) for (value, count) in enumerate(self.counts) if count])
+
+
+class QualityHistogram(ByteHistogram):
+    """
+    Counts of each quality character, see ByteHistogram.
+    """
+
+    def binning(self):
+        """
+        Identifies binned quality scores from the values seen, assuming phred+33
+
+        Returns:
+            str - name from BINNING_SCHEMES, 'unknown' for a small set of other values
+            None - not binned (or too few values to tell)
+        """
+        levels = self.levels()
+        if not 1 < len(levels) <= MAX_BINNED_LEVELS:
+            return None
+        phred = set([value - PHRED_OFFSET for value in levels])
+        for (name, scheme) in BINNING_SCHEMES:
+            if phred.issubset(scheme):
+                return name
+        return 'unknown'
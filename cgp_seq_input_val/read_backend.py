@@ -0,0 +1,262 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Backends for reading (optionally compressed) sequence files
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import gzip
+import bz2
+from importlib import import_module
+
+from cgp_seq_input_val.constants import READ_BACKENDS
+from cgp_seq_input_val.error_classes import BackendError
+from cgp_seq_input_val.digest import DigestReader
+from cgp_seq_input_val.performance import TimedReader
+
+COMPRESSION_EXTNS = {'.gz': 'gzip', '.bz2': 'bz2'}
+
+# fastest first, 'auto' selects the first available
+BACKEND_ORDER = {'gzip': ('isal', 'igzip', 'pigz', 'python'),
+                 'bz2': ('lbzip2', 'pbzip2', 'python'),
+                 None: ('python',)}
+BACKENDS = READ_BACKENDS
+
+# command to decompress to stdout, the filename is appended
+PIPED_COMMANDS = {'igzip': ['igzip', '-d', '-c', '-T', '{threads}'],
+                  'pigz': ['pigz', '-d', '-c', '-p', '{threads}'],
+                  'lbzip2': ['lbzip2', '-d', '-c', '-n', '{threads}'],
+                  'pbzip2': ['pbzip2', '-d', '-c', '-p{threads}']}
+
+READ_BUFFER = 1024 * 1024
+
+
+def compression_type(filename):
+    """
+    Returns the compression implied by the file extension, None when uncompressed
+    """
+    return COMPRESSION_EXTNS.get(os.path.splitext(filename)[1])
+
+
+def backend_available(backend):
+    """
+    Checks the python module or executable required by a backend can be found
+    """
+    if backend == 'python':
+        return True
+    if backend == 'isal':
+        try:
+            import_module('isal.igzip_threaded')
+        except ImportError:
+            return False
+        return True
+    return shutil.which(backend) is not None
+
+
+def select_backend(compression, requested='auto'):
+    """
+    Resolves the backend to use for a compression type.  Uncompressed input
+    is always read by 'python'.
+
+    Raises:
+        BackendError - requested backend unavailable or unsuitable
+    """
+    if compression is None:
+        return 'python'
+    if requested == 'auto':
+        for backend in BACKEND_ORDER[compression]:
+            if backend_available(backend):
+                return backend
+    if requested not in BACKEND_ORDER[compression]:
+        raise BackendError("Backend '%s' can not read %s compressed input"
+                           % (requested, compression))
+    if not backend_available(requested):
+        raise BackendError("Backend '%s' is not available on this system" % requested)
+    return requested
+
+
+def open_input(filename, backend, threads=1, text=False, digester=None, timer=None):
+    """
+    Opens a sequence file for reading with the given backend (see select_backend)
+
+    Args:
+        filename - file to read
+        backend - resolved backend name
+        threads - decompression threads, only used by isal and piped backends
+        text - return a text handle instead of binary
+        digester - optional, digest.Digester given the raw (compressed) bytes as
+                   they are read, external programs then read from a pipe
+        timer - optional, performance.StageTimer, the time waiting for
+                decompressed data is the 'decode' stage, reading the file the
+                'io' stage when decompressed in this thread ('python' backend)
+
+    Returns:
+        file handle, only the 'python' backend without digester or timer is seekable
+    """
+    compression = compression_type(filename)
+    source = filename
+    if digester is not None or (timer is not None and backend == 'python'):
+        source = open(filename, 'rb')
+        if timer is not None and backend == 'python':
+            source = TimedReader(source, timer, 'io')
+        if digester is not None:
+            source = DigestReader(source, digester)
+        source = io.BufferedReader(source, READ_BUFFER)
+    if backend == 'python':
+        if compression is None:
+            handle = open(filename, 'rb') if source is filename else source
+        else:
+            handle = (gzip if compression == 'gzip' else bz2).open(source, 'rb')
+            if source is not filename:  # gzip and bz2 don't close a handle they were given
+                handle = io.BufferedReader(ClosingReader(handle, source), READ_BUFFER)
+    elif backend == 'isal':
+        igzip_threaded = import_module('isal.igzip_threaded')
+        handle = igzip_threaded.open(source, 'rb', threads=threads)
+    else:
+        command = [arg.format(threads=threads) for arg in PIPED_COMMANDS[backend]]
+        handle = io.BufferedReader(PipedReader(command, filename, None if digester is None
+                                               else source), READ_BUFFER)
+    if timer is not None:
+        handle = io.BufferedReader(TimedReader(handle, timer, 'decode', 'decompressed_bytes'),
+                                   READ_BUFFER)
+    if text:
+        return io.TextIOWrapper(handle)
+    return handle
+
+
+class ClosingReader(io.RawIOBase):
+    """
+    Raw reader over a binary handle, closing another handle with it
+
+    Args:
+        handle - binary handle to read
+        source - handle closed after handle
+    """
+    def __init__(self, handle, source):
+        self.handle = handle
+        self.name = getattr(source, 'name', None)
+        self.source = source
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.handle.readinto(buffer)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.handle.close()
+        finally:
+            self.source.close()
+            super().close()
+
+
+class PipedReader(io.RawIOBase):
+    """
+    Raw reader over the stdout of an external decompression program.
+
+    Raises BackendError at the end of the stream if the program failed.
+
+    Args:
+        command - program and arguments, the filename is appended unless source is given
+        filename - file to decompress
+        source - optional, binary handle of the file copied to the program's stdin
+                 on a thread, closed with the reader
+    """
+    def __init__(self, command, filename, source=None):
+        self.name = filename
+        self.command = command
+        self._stderr = tempfile.TemporaryFile()
+        self._feeder = None
+        if source is None:
+            self._proc = subprocess.Popen(command + [filename],
+                                          stdout=subprocess.PIPE,
+                                          stderr=self._stderr)
+        else:
+            self._proc = subprocess.Popen(command,
+                                          stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE,
+                                          stderr=self._stderr)
+            self._feeder = threading.Thread(target=self._feed, args=(source,), daemon=True)
+            self._feeder.start()
+
+    def _feed(self, source):
+        try:
+            data = source.read(READ_BUFFER)
+            while data:
+                self._proc.stdin.write(data)
+                data = source.read(READ_BUFFER)
+        except (BrokenPipeError, ValueError):
+            pass  # the program stopped or the reader was closed early
+        finally:
+            source.close()
+            try:
+                self._proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self._proc.stdout.readinto(buffer)
+        if count == 0:
+            self._check_exit()
+        return count
+
+    def _check_exit(self):
+        retcode = self._proc.wait()
+        if retcode != 0:
+            self._stderr.seek(0)
+            message = self._stderr.read().decode('utf-8', 'replace').strip()
+            raise BackendError("'%s' failed (exit %d) reading %s: %s"
+                               % (self.command[0], retcode, self.name, message))
+
+    def close(self):
+        if self.closed:
+            return
+        self._proc.stdout.close()
+        if self._proc.poll() is None:
+            # stopped reading early, most likely due to a validation error
+            self._proc.terminate()
+            self._proc.wait()
+        if self._feeder is not None:
+            self._feeder.join()
+        self._stderr.close()
+        super().close()
@@ -0,0 +1,411 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Columnar batches of fastq records, a decoded block of data with arrays of the
+offsets of each line so many records can be checked by array operations.
+"""
+
+from importlib import import_module
+from importlib.util import find_spec
+
+from cgp_seq_input_val import fastq_block
+
+# optional, the 'batch' engine is only available with numpy, imported by
+# BatchReader as it is slow to import
+numpy = None
+
+# fields of a record, the same positions as in FastqBlockReader record tuples
+HEADER = 1
+SEQ = 2
+QUAL_HEADER = 3
+QUAL = 4
+
+PLUS = 43  # ord('+')
+NEWLINE = 10  # ord('\n')
+SPACE = 32  # ord(' ')
+# all the whitespace removed by bytes.rstrip() other than space is below this value
+WHITESPACE_BELOW = 14
+# fields longer than this on average are sliced and joined rather than gathered by
+# numpy, the cost of a gather grows with the bytes and of a join with the records
+GATHER_MAX_LENGTH = 32
+
+
+def numpy_available():
+    """
+    True when numpy is installed, without importing it
+    """
+    return numpy is not None or find_spec('numpy') is not None
+
+
+def _load_numpy():
+    global numpy
+    if numpy is None:
+        numpy = import_module('numpy')
+
+
+class RecordBatch(object):
+    """
+    Many 4 line records held as one buffer plus offsets, no object is created
+    per record unless it is asked for.
+
+    Indexing with an int gives the FastqBlockReader record tuple, with a slice
+    a RecordBatch sharing the same buffer.
+
+    Args:
+        data - bytes containing the records, every line ends with a newline
+        offsets - numpy array (records, 5) of the start of the header, seq,
+                  qual_header and qual lines of each record and the end of
+                  the record (after its last newline)
+        line_nos - numpy array of the line number of each record, counted in
+                   the same way as FastqBlockReader
+    """
+    def __init__(self, data, offsets, line_nos):
+        _load_numpy()
+        self.data = data
+        self.offsets = offsets
+        self.line_nos = line_nos
+
+    def __len__(self):
+        return len(self.line_nos)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RecordBatch(self.data, self.offsets[index], self.line_nos[index])
+        bounds = self.offsets[index].tolist()
+        data = self.data
+        return ((int(self.line_nos[index]),)
+                + tuple([data[bounds[pos]:bounds[pos + 1] - 1] for pos in range(4)]))
+
+    def lengths(self, field):
+        """
+        Length of the given field (HEADER, SEQ, QUAL_HEADER or QUAL) of each record
+
+        Returns:
+            numpy array
+        """
+        return self.offsets[:, field] - self.offsets[:, field - 1] - 1
+
+    def column(self, field, newlines=False):
+        """
+        The given field of every record as one buffer, gathered from data
+        without slicing each record.
+
+        Args:
+            field - HEADER, SEQ, QUAL_HEADER or QUAL
+            newlines - keep the newline that ends each field
+
+        Returns:
+            bytes
+        """
+        begins = self.offsets[:, field - 1]
+        lengths = self.offsets[:, field] - begins
+        if not newlines:
+            lengths -= 1
+        total = int(lengths.sum())
+        if not total:
+            return b''
+        if total > GATHER_MAX_LENGTH * len(self):
+            data = self.data
+            return b''.join([data[begin:end] for (begin, end)
+                             in zip(begins.tolist(), (begins + lengths).tolist())])
+        index = numpy.repeat(begins - (numpy.cumsum(lengths) - lengths), lengths)
+        index += numpy.arange(total)
+        return numpy.frombuffer(self.data, dtype=numpy.uint8)[index].tobytes()
+
+    def fields(self, field):
+        """
+        The given field of every record
+
+        Returns:
+            list of bytes
+        """
+        data = self.data
+        return [data[begin:end - 1] for (begin, end)
+                in self.offsets[:, field - 1:field + 1].tolist()]
+
+    def chunks(self):
+        """
+        Each record as the bytes of its 4 lines
+
+        Returns:
+            list of bytes
+        """
+        data = self.data
+        return [data[begin:end] for (begin, end) in self.offsets[:, 0:5:4].tolist()]
+
+    def records(self):
+        """
+        The records as FastqBlockReader tuples, used when an error has to be
+        located
+
+        Returns:
+            list of record tuples
+        """
+        data = self.data
+        return [(line_no,) + tuple([data[bounds[pos]:bounds[pos + 1] - 1] for pos in range(4)])
+                for (line_no, bounds) in zip(self.line_nos.tolist(), self.offsets.tolist())]
+
+    def valid(self, fq_format, headers=None):
+        """
+        The equivalent of fastq_block.records_valid for the whole batch
+
+        Args:
+            fq_format - FastqFormat of the file
+            headers - optional, column(HEADER, newlines=True) when already available
+
+        Returns:
+            bool - True when every record would pass record_validator
+        """
+        if not numpy.array_equal(self.lengths(SEQ), self.lengths(QUAL)):
+            return False
+        if headers is None:
+            headers = self.column(HEADER, newlines=True)
+        return fastq_block.BATCH_HEADER_BYTES[fq_format].fullmatch(headers) is not None
+
+    def alphabet_valid(self):
+        """
+        The equivalent of fastq_block.alphabet_valid for the whole batch
+
+        Returns:
+            bool - False if any record has an invalid character
+        """
+        return not (self.column(SEQ).translate(None, fastq_block.SEQ_ALPHABET)
+                    or self.column(QUAL).translate(None, fastq_block.QUAL_ALPHABET))
+
+
+def pairs_valid(batch_1, batch_2, fq_format):
+    """
+    The equivalent of fastq_block.pairs_valid for two batches of the same length
+
+    Returns:
+        bool - True when all records are valid and all pairs match
+    """
+    headers_1 = batch_1.column(HEADER, newlines=True)
+    headers_2 = batch_2.column(HEADER, newlines=True)
+    return (batch_1.valid(fq_format, headers_1) and batch_2.valid(fq_format, headers_2)
+            and fastq_block.pairs_named(headers_1, headers_2, len(batch_1), fq_format))
+
+
+def as_records(records):
+    """
+    Converts a RecordBatch to a list of record tuples, anything else is
+    returned unchanged
+    """
+    if isinstance(records, RecordBatch):
+        return records.records()
+    return records
+
+
+class BatchReader(object):
+    """
+    Reads fastq records from a binary file handle as RecordBatch objects, line
+    boundaries are found for a whole block at a time with numpy.
+
+    Only 4 line records that need no whitespace stripping are held in batches,
+    from the first that is not (or the first line ending with whitespace) the
+    remainder of the file is read by a FastqBlockReader, see read_records.
+
+    Inputs:
+        fq_fh: file handle opened in binary mode
+        block_size: bytes to request from fq_fh on each read
+        interleaved: an empty line only ends the file after the second read
+                     of a pair
+        line_no: when fq_fh is positioned part way through a file, see
+                 FastqBlockReader
+    """
+    def __init__(self, fq_fh, block_size=fastq_block.BLOCK_SIZE, interleaved=False,
+                 line_no=None):
+        _load_numpy()
+        self.fq_fh = fq_fh
+        self.block_size = block_size
+        self.interleaved = interleaved
+        self._resumed = line_no is not None
+        self._line_no = line_no if self._resumed else 1
+        self._count = 0
+        self._finished = False
+        self._data = b''
+        # start of each line in _data, the last is the start of an incomplete line
+        self._starts = numpy.zeros(1, dtype=numpy.int64)
+        self._line = 0  # index in _starts of the next record
+        self._read_bytes = 0
+        self._switched = 0  # position when the FastqBlockReader took over
+        self._eof = False
+        self._irregular = False  # data needing the FastqBlockReader has been loaded
+        self._reader = None  # FastqBlockReader for the remainder of the file
+
+    @property
+    def line_no(self):
+        """
+        Line number of the next record, see FastqBlockReader
+        """
+        return self._reader.line_no if self._reader else self._line_no
+
+    @property
+    def count(self):
+        """
+        Records returned so far
+        """
+        return self._count + (self._reader.count if self._reader else 0)
+
+    @property
+    def finished(self):
+        """
+        True when no more records will be returned
+        """
+        return self._reader.finished if self._reader else self._finished
+
+    def tell(self):
+        """
+        Position of the next record, see FastqBlockReader.tell
+        """
+        if self._reader is None:
+            return self._read_bytes - (len(self._data) - int(self._starts[self._line]))
+        offset = self._reader.tell()
+        return None if offset is None else self._switched + offset
+
+    def _load(self):
+        """
+        Adds the next block to the buffer, discarding the records already
+        returned.  A final line without a newline is given one.
+
+        Returns:
+            False when the handle is exhausted
+        """
+        if self._eof:
+            return False
+        block = self.fq_fh.read(self.block_size)
+        self._read_bytes += len(block)
+        if not block:
+            self._eof = True
+            if self._starts[-1] == len(self._data):
+                return False
+            block = b'\n'
+            self._read_bytes += 1
+        cut = int(self._starts[self._line])
+        data = self._data[cut:] + block
+        added = len(data) - len(block)
+        values = numpy.frombuffer(data, dtype=numpy.uint8)
+        newlines = numpy.flatnonzero(values[added:] == NEWLINE) + added
+        self._starts = numpy.concatenate((self._starts[self._line:] - cut, newlines + 1))
+        self._data = data
+        self._line = 0
+        # any line needing rstrip, low values other than newline are rare so are
+        # treated as whitespace without checking which they are
+        if (numpy.count_nonzero(values[added:] < WHITESPACE_BELOW) != len(newlines)
+                or numpy.count_nonzero(values[newlines[newlines > 0] - 1] == SPACE)):
+            self._irregular = True
+        return True
+
+    def _switch(self):
+        """
+        Hands the remainder of the file to a FastqBlockReader
+        """
+        self._switched = self.tell()
+        self._reader = fastq_block.FastqBlockReader(
+            self.fq_fh, self.block_size, self.interleaved,
+            line_no=self._line_no if self._count or self._resumed else None,
+            data=self._data[int(self._starts[self._line]):])
+        self._data = b''
+
+    def read_records(self, count):
+        """
+        Read up to count records, fewer are only returned when the file is
+        finished.  Must be called with an even count for interleaved files.
+
+        Returns:
+            RecordBatch - when all the records are regular
+            list of record tuples - from the first irregular record onwards
+        """
+        if self._reader is None and not self._finished:
+            while len(self._starts) - self._line <= 4 * count + 1 and self._load():
+                pass
+            if not self._irregular:
+                batch = self._read_batch(count)
+                if batch is not None:
+                    return batch
+            self._switch()
+        if self._reader is not None:
+            return self._reader.read_records(count)
+        return self._read_batch(0)
+
+    def _read_batch(self, count):
+        """
+        Takes up to count regular records from the buffer
+
+        Returns:
+            RecordBatch - None when the records can't all be held in a batch
+        """
+        lines = len(self._starts) - 1 - self._line
+        records = min(count, lines // 4)
+        starts = self._starts[self._line:self._line + 4 * records + 2]
+        if records:
+            data = numpy.frombuffer(self._data, dtype=numpy.uint8)
+            firsts = starts[:4 * records].reshape(records, 4)
+            lengths = (starts[1:4 * records + 1].reshape(records, 4) - firsts) - 1
+            stop = ((lengths[:, 0] == 0) | (lengths[:, 1] == 0)
+                    | (data[firsts[:, 1]] == PLUS) | (data[firsts[:, 2]] != PLUS)
+                    | (lengths[:, 3] < lengths[:, 1]))
+            first_stop = numpy.flatnonzero(stop)
+            if first_stop.size:
+                records = int(first_stop[0])
+                if not self._ends_file(records, lengths[records, 0]):
+                    return None
+                self._finished = True
+        if not self._finished:
+            if lines > 4 * records:  # the header of the next record
+                length = int(starts[4 * records + 1] - starts[4 * records]) - 1
+                if self._ends_file(records, length):
+                    self._finished = True
+                elif records < count:  # truncated by the end of the file
+                    return None
+            elif self._eof:
+                self._finished = True
+
+        offsets = numpy.empty((records, 5), dtype=numpy.int64)
+        offsets[:, 0:4] = starts[:4 * records].reshape(records, 4)
+        offsets[:, 4] = starts[4:4 * records + 1:4]
+        batch = RecordBatch(self._data, offsets,
+                            self._line_no + 3 * numpy.arange(records, dtype=numpy.int64))
+        self._line += 4 * records
+        self._line_no += 3 * records
+        self._count += records
+        return batch
+
+    def _ends_file(self, index, header_length):
+        """
+        Whether a header of the given length at index in this batch ends the
+        file, the same rule as FastqBlockReader (which also handles an empty
+        first line)
+        """
+        if header_length or (self._count == 0 and index == 0 and not self._resumed):
+            return False
+        return not self.interleaved or (self._count + index) % 2 == 0
@@ -0,0 +1,102 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Resource use of the process and its finished children (external
+decompressors, worker processes), for sizing scheduler requests.
+"""
+
+import json
+import resource
+import sys
+import time
+
+PROC_IO = '/proc/self/io'
+# /proc/self/io fields reported, reaped children are included by the kernel
+IO_FIELDS = {'rchar': 'read_chars', 'wchar': 'write_chars',
+             'read_bytes': 'read_bytes', 'write_bytes': 'write_bytes'}
+# ru_maxrss is in KiB except on macOS
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def proc_io(path=PROC_IO):
+    """
+    Reads the I/O counters of this process
+
+    Returns:
+        dict - counters named as IO_FIELDS, None when not available (not Linux)
+    """
+    try:
+        with open(path, 'r') as fp:
+            lines = fp.read().splitlines()
+    except OSError:
+        return None
+    counters = {}
+    for line in lines:
+        (name, _, value) = line.partition(':')
+        if name in IO_FIELDS:
+            counters[IO_FIELDS[name]] = int(value)
+    return counters
+
+
+class ResourceUsage(object):
+    """
+    Resources used from creation, wall time, or in total, everything else as
+    the system only keeps totals.  Children are only included once they have
+    been waited for, which the backends and process pools do.
+    """
+    def __init__(self):
+        self._started = time.monotonic()
+
+    def report(self):
+        """
+        Returns:
+            dict - peak_rss_bytes (largest of this process and any child),
+                   user_seconds, system_seconds, wall_seconds and io (None
+                   when not available)
+        """
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return {'peak_rss_bytes': max(own.ru_maxrss, children.ru_maxrss) * RSS_UNIT,
+                'user_seconds': round(own.ru_utime + children.ru_utime, 3),
+                'system_seconds': round(own.ru_stime + children.ru_stime, 3),
+                'wall_seconds': round(time.monotonic() - self._started, 3),
+                'io': proc_io()}
+
+    def write(self, filename, command, exit_code=0):
+        """
+        Writes the report as json with the sub-command and its exit code
+        """
+        report = self.report()
+        report['command'] = command
+        report['exit_code'] = exit_code
+        with open(filename, 'w') as fp:
+            json.dump(report, fp, sort_keys=True, indent=4)
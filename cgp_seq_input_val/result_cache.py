@@ -0,0 +1,174 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Local cache of seq-valid results, a resubmitted file that hasn't changed is
+not validated again.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from cgp_seq_input_val.constants import CACHE_FILE, version
+# results not used for this long are removed
+CACHE_SECONDS = 30 * 24 * 3600
+# least recently used results are removed when all exceed this size
+CACHE_BYTES = 64 * 1024 * 1024
+# seconds to wait for another process writing to the cache
+LOCK_TIMEOUT = 60
+
+
+def file_identity(filename):
+    """
+    Details of an input file that change if it is replaced or modified
+
+    Returns:
+        list - resolved path, size, modification time (ns) and inode
+    """
+    stat = os.stat(filename)
+    return [os.path.realpath(filename), stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def cache_key(filenames, options):
+    """
+    Key of the result of validating files with the options affecting the report,
+    includes the version of this package
+
+    Args:
+        filenames - list of input files
+        options - dict, json compatible
+
+    Returns:
+        str
+    """
+    content = json.dumps({'files': [file_identity(filename) for filename in filenames],
+                          'options': options, 'version': version()}, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """
+    Results stored in a SQLite database, safe for use by several processes.
+    Old results are evicted when a result is stored.  A cache that can't be
+    created or used (read only or missing home, locking on NFS) is disabled
+    with a warning, validation carries on uncached.
+
+    Args:
+        filename - optional, database file, created with its directory [CACHE_FILE]
+        max_age - optional, seconds a result is kept after its last use [CACHE_SECONDS]
+        max_bytes - optional, total size of the results kept [CACHE_BYTES]
+    """
+    def __init__(self, filename=CACHE_FILE, max_age=CACHE_SECONDS, max_bytes=CACHE_BYTES):
+        self.filename = filename
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.disabled = False
+        try:
+            directory = os.path.dirname(os.path.abspath(filename))
+            os.makedirs(directory, exist_ok=True)
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, '
+                                 'result TEXT NOT NULL, used REAL NOT NULL)')
+            finally:
+                conn.close()
+        except (OSError, sqlite3.Error) as err:
+            self._disable(err)
+
+    def _connect(self):
+        return sqlite3.connect(self.filename, timeout=LOCK_TIMEOUT)
+
+    def _disable(self, err):
+        print("WARNING: result cache %s not used: %s" % (self.filename, err), file=sys.stderr)
+        self.disabled = True
+
+    def get(self, key):
+        """
+        Fetches a result, marking it as used
+
+        Returns:
+            dict - None when not cached, expired or the cache is disabled
+        """
+        if self.disabled:
+            return None
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    row = conn.execute('SELECT result FROM results WHERE key = ? AND used >= ?',
+                                       (key, now - self.max_age)).fetchone()
+                    if row is None:
+                        return None
+                    conn.execute('UPDATE results SET used = ? WHERE key = ?', (now, key))
+            finally:
+                conn.close()
+        except (OSError, sqlite3.Error) as err:
+            self._disable(err)
+            return None
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """
+        Stores a result and evicts expired and least recently used results
+
+        Args:
+            result - dict, json compatible
+        """
+        if self.disabled:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute('INSERT OR REPLACE INTO results (key, result, used) '
+                                 'VALUES (?, ?, ?)',
+                                 (key, json.dumps(result, sort_keys=True), now))
+                    self._evict(conn, now)
+            finally:
+                conn.close()
+        except (OSError, sqlite3.Error) as err:
+            self._disable(err)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM results WHERE used < ?', (now - self.max_age,))
+        total = 0
+        for (key, size) in conn.execute('SELECT key, LENGTH(result) FROM results '
+                                        'ORDER BY used DESC').fetchall():
+            total += size
+            if total > self.max_bytes:
+                conn.execute('DELETE FROM results WHERE key = ?', (key,))
@@ -0,0 +1,124 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Random access to sites within fastq files, used to triage large inputs by
+validating a sample of the records instead of all of them.
+"""
+
+import os
+import random
+
+from cgp_seq_input_val import bgzf
+from cgp_seq_input_val.fastq_block import FastqBlockReader
+
+# pairs validated at each site
+SAMPLE_PAIRS = 2000
+# sites are pseudo random but fixed so a triage can be repeated
+SAMPLE_SEED = 1
+# data searched for the start of a record from each site
+RESYNC_BYTES = 256 * 1024
+
+
+def site_fractions(sites, seed=SAMPLE_SEED):
+    """
+    Positions of the sites as fractions of the file size, the first site is
+    always the start of the file
+
+    Returns:
+        list of float - ascending
+    """
+    rnd = random.Random(seed)
+    return [0.0] + sorted([rnd.random() for _ in range(sites - 1)])
+
+
+def record_start(data):
+    """
+    Finds the first complete record in data that starts part way through a
+    file: a line starting '@' with the line two after it starting '+'.  A
+    quality line starting '@' is followed two lines later by sequence so it
+    can't be mistaken for a header.
+
+    Returns:
+        int - offset of the record, None when there isn't one
+    """
+    pos = data.find(b'\n@')
+    while pos != -1:
+        start = pos + 1
+        seq_end = data.find(b'\n', start)
+        plus_end = data.find(b'\n', seq_end + 1) if seq_end != -1 else -1
+        if plus_end == -1:
+            return None
+        if data[plus_end + 1:plus_end + 2] == b'+':
+            return start
+        pos = data.find(b'\n@', start)
+    return None
+
+
+def open_site(filename, fraction, compressed):
+    """
+    Opens a file at a fraction of its size, BGZF files at the start of the
+    next block
+
+    Args:
+        filename - uncompressed or BGZF fastq
+        fraction - position in the file
+        compressed - True for BGZF
+
+    Returns:
+        binary file handle - None when there is no BGZF block after the position
+    """
+    size = os.path.getsize(filename)
+    offset = int(size * fraction)
+    if compressed:
+        with open(filename, 'rb') as raw:
+            offset = bgzf.block_start(raw, offset, size)
+        if offset >= size:
+            return None
+        return bgzf.open_virtual(filename, offset << 16)
+    fq_fh = open(filename, 'rb')
+    fq_fh.seek(offset)
+    return fq_fh
+
+
+def site_reader(fq_fh, interleaved=False):
+    """
+    Creates a reader starting at the first record in the next RESYNC_BYTES of
+    a handle opened by open_site, line numbers are counted from the site
+
+    Returns:
+        FastqBlockReader - None when no record was found
+    """
+    data = fq_fh.read(RESYNC_BYTES)
+    start = record_start(data)
+    if start is None:
+        return None
+    return FastqBlockReader(fq_fh, interleaved=interleaved, line_no=1, data=data[start:])
@@ -0,0 +1,270 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Validation of the sequence files of every row of a manifest, as written in
+json by man-valid, through a pool of processes.
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from cgp_seq_input_val.constants import BATCH_ENGINES
+from cgp_seq_input_val.error_classes import SeqValidationError
+from cgp_seq_input_val.read_backend import compression_type
+from cgp_seq_input_val.result_cache import ResultCache
+from cgp_seq_input_val.seq_validator import SeqValidator
+
+
+def validate_manifest_files(args):
+    """
+    Top level entry point for validating the sequence files of a manifest.
+    """
+    try:
+        options = {'engine': args.engine, 'backend': args.backend, 'threads': args.threads,
+                   'stats': args.stats, 'strict': args.strict, 'sample_sites': args.sample,
+                   'digests': args.digests or ()}
+        validator = BatchValidator(args.input, args.qc, input_dir=args.input_dir,
+                                   processes=args.processes, decompressors=args.decompressors,
+                                   fail_fast=args.fail_fast,
+                                   cache=None if args.no_cache else args.cache, **options)
+        report = validator.validate()
+        json.dump(report, args.report, sort_keys=True, indent=4)
+    except SeqValidationError as ve:
+        sys.exit("ERROR: " + str(ve))
+    except (OSError, IOError) as err:
+        sys.exit("ERROR (%d): %s - %s" % (err.errno, err.strerror, err.filename))
+    if report['failed']:
+        sys.exit("ERROR: %d of %d manifest rows failed sequence validation"
+                 % (report['failed'], len(report['rows'])))
+
+
+def validate_row(files, qc_reads, options, cache_file=None):
+    """
+    Validates the files of one manifest row, run in a worker process
+
+    Args:
+        files - tuple of file and file_2 (None when interleaved)
+        qc_reads - see SeqValidator
+        options - other SeqValidator arguments
+        cache_file - optional, result_cache.ResultCache database
+
+    Returns:
+        dict - status 'passed' with the seq-valid report or 'failed' with the error
+    """
+    try:
+        cache = ResultCache(cache_file) if cache_file else None
+        validator = SeqValidator(files[0], qc_reads, file_b=files[1], progress_pairs=0,
+                                 cache=cache, **options)
+        validator.validate()
+    except SeqValidationError as ve:
+        return {'status': 'failed', 'error': str(ve)}
+    except (OSError, IOError) as err:
+        return {'status': 'failed',
+                'error': "(%d): %s - %s" % (err.errno, err.strerror, err.filename)}
+    return {'status': 'passed', 'report': validator.summary()}
+
+
+def terminate(executor):
+    """
+    Stops a ProcessPoolExecutor without waiting for the work it has started,
+    its worker processes are killed (concurrent.futures has no public way to
+    do so)
+
+    Args:
+        executor - concurrent.futures.ProcessPoolExecutor
+    """
+    workers = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for worker in workers:
+        worker.terminate()
+
+
+class BatchJob(object):
+    """
+    The files of one manifest row
+
+    Args:
+        row - position of the row in the manifest body, from 1
+        files - tuple of file and file_2 (None when interleaved), as in the manifest
+        input_dir - directory the files are relative to
+
+    Attributes:
+        fastq - False for other files a manifest may list (bam, cram), these
+                have no sequence validation
+    """
+    def __init__(self, row, files, input_dir):
+        self.row = row
+        self.files = files
+        (base, ext) = os.path.splitext(files[0])
+        if ext in ('.gz', '.bz2'):
+            (base, ext) = os.path.splitext(base)
+        # as the extensions accepted by SeqValidator
+        self.fastq = ext.lower() in ('.fastq', '.fq')
+        self.paths = tuple(None if item is None else os.path.join(input_dir, item)
+                           for item in files)
+        self.compressed = compression_type(self.paths[0]) is not None
+        self.size = 0
+        self.missing = None
+        for path in self.paths:
+            if path is None:
+                continue
+            if not os.path.isfile(path):
+                self.missing = self.missing or "'%s' is not a file" % path
+            else:
+                self.size += os.path.getsize(path)
+
+
+class BatchValidator(object):
+    """
+    Validates the sequence files of every row of a manifest json in a pool of
+    processes, one row per process.  The largest rows (by file size) are
+    started first so a big row doesn't run on its own at the end.  Rows that
+    aren't fastq (bam, cram) are reported as 'skipped'.
+
+    Args:
+        manifest - manifest json written by man-valid
+        qc_reads - see SeqValidator
+        input_dir - optional, directory the manifest files are relative to, the
+                    directory of the tsv given to man-valid (the json is
+                    written to its -o directory) [directory of manifest]
+        processes - optional, rows validated at the same time [all cpus]
+        decompressors - optional, rows of compressed files validated at the
+                        same time, the remaining processes take uncompressed
+                        rows [processes]
+        fail_fast - optional, stop at the first failure, rows not finished are
+                    stopped and reported as 'cancelled' [False]
+        cache - optional, result_cache.ResultCache database file shared by the
+                processes [None = no cache]
+        options - other SeqValidator arguments, engine must be one of BATCH_ENGINES
+    """
+    def __init__(self, manifest, qc_reads, input_dir=None, processes=None, decompressors=None,
+                 fail_fast=False, cache=None, **options):
+        if options.get('engine', 'line') not in BATCH_ENGINES:
+            raise ValueError("engine must be one of: %s" % ', '.join(BATCH_ENGINES))
+        self.manifest = manifest
+        self.qc_reads = qc_reads
+        self.input_dir = input_dir if input_dir is not None else os.path.dirname(manifest)
+        self.processes = processes or os.cpu_count()
+        self.decompressors = decompressors or self.processes
+        self.fail_fast = fail_fast
+        self.cache = cache
+        self.options = options
+
+    def jobs(self):
+        """
+        Reads the rows of the manifest
+
+        Returns:
+            list of BatchJob
+
+        Raises:
+            SeqValidationError - when the json is not a manifest
+        """
+        with open(self.manifest, 'r') as fp:
+            try:
+                body = json.load(fp)['body']
+                rows = [(row['File'], row.get('File_2', '.')) for row in body]
+            except (ValueError, KeyError, TypeError):
+                raise SeqValidationError("%s is not a manifest json file written by man-valid"
+                                         % self.manifest)
+        return [BatchJob(idx, (file_1, None if file_2 in (None, '.') else file_2),
+                         self.input_dir)
+                for (idx, (file_1, file_2)) in enumerate(rows, 1)]
+
+    def next_job(self, pending, decompressing):
+        """
+        Takes the largest pending job that doesn't exceed the decompressor limit
+
+        Returns:
+            BatchJob - None when all pending jobs need a decompressor
+        """
+        for (idx, job) in enumerate(pending):
+            if not job.compressed or decompressing < self.decompressors:
+                return pending.pop(idx)
+        return None
+
+    def validate(self):
+        """
+        Validates every row
+
+        Returns:
+            dict - the report, 'rows' keyed by manifest row number (as a string)
+                   and the number of rows 'passed', 'failed', 'cancelled' and
+                   'skipped'
+        """
+        jobs = self.jobs()
+        results = {}
+        stop = False
+        for job in jobs:
+            if not job.fastq:
+                results[job.row] = {'status': 'skipped'}
+            elif job.missing is not None:
+                results[job.row] = {'status': 'failed', 'error': job.missing}
+                stop = self.fail_fast
+        pending = sorted([job for job in jobs if job.row not in results],
+                         key=lambda job: job.size, reverse=True)
+        running = {}
+        executor = ProcessPoolExecutor(max_workers=self.processes)
+        try:
+            while running or (pending and not stop):
+                while not stop and len(running) < self.processes:
+                    decompressing = len([job for job in running.values() if job.compressed])
+                    job = self.next_job(pending, decompressing)
+                    if job is None:
+                        break
+                    running[executor.submit(validate_row, job.paths, self.qc_reads,
+                                            self.options, self.cache)] = job
+                (done, _) = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    results[job.row] = future.result()
+                    if results[job.row]['status'] == 'failed' and self.fail_fast:
+                        stop = True
+                if stop and running:
+                    terminate(executor)
+                    pending.extend(running.values())
+                    running = {}
+        finally:
+            executor.shutdown(cancel_futures=True)
+        for job in pending:
+            results[job.row] = {'status': 'cancelled'}
+
+        report = {'manifest': self.manifest, 'rows': {},
+                  'passed': 0, 'failed': 0, 'cancelled': 0, 'skipped': 0}
+        for job in jobs:
+            result = results[job.row]
+            result['files'] = list(job.files)
+            report['rows'][str(job.row)] = result
+            report[result['status']] += 1
+        return report
@@ -0,0 +1,187 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Extended QC statistics gathered while sequence files are validated.  All
+counters are bounded so memory does not grow with the number of reads.
+"""
+
+from collections import Counter
+
+from cgp_seq_input_val.quality import ByteHistogram
+
+# distinct flowcell/lane/tile combinations tracked, the remainder count as 'other'
+MAX_TILES = 10000
+BASES = 'ACGTN'
+
+
+class SeqStats(object):
+    """
+    Read length distribution, base composition and, for Casava headers,
+    reads per flowcell/lane/tile and by the filtered (Y/N) flag.
+
+    Collectors from separate workers can be combined with merge.
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self.lengths = Counter()
+        self.bases = ByteHistogram()
+        self.casava = None  # decided by the first header
+        self.tiles = Counter()
+        self.filtered = Counter()
+
+    def add_records(self, records):
+        """
+        Adds reads from FastqBlockReader records
+        """
+        self.add_reads([record[1] for record in records], [record[2] for record in records])
+
+    def add_reads(self, headers, seqs):
+        """
+        Adds reads from lists of the header and sequence of each (bytes)
+        """
+        if not seqs:
+            return
+        self.reads += len(seqs)
+        self.lengths.update(map(len, seqs))
+        self.bases.add(b''.join(seqs))
+        if self.casava is None:
+            # the Casava header is the only format with a comment
+            self.casava = len(headers[0].split(None, 1)) == 2
+        if not self.casava:
+            return
+        # '@instrument:run:flowcell:lane:tile:x:y read:filtered:control:index'
+        fields = [header.split(None, 1) for header in headers]
+        self.tiles.update([name[1:].rsplit(b':', 2)[0] for (name, _) in fields])
+        self.filtered.update([comment.split(b':', 2)[1] for (_, comment) in fields])
+        self._cap_tiles()
+
+    def _cap_tiles(self):
+        if len(self.tiles) <= MAX_TILES:
+            return
+        other = self.tiles.pop(b'', 0)
+        for (key, count) in self.tiles.most_common()[MAX_TILES - 1:]:
+            other += count
+            del self.tiles[key]
+        self.tiles[b''] = other
+
+    def merge(self, other):
+        """
+        Adds the counts of another SeqStats
+        """
+        self.reads += other.reads
+        self.lengths.update(other.lengths)
+        self.bases.merge(other.bases.counts)
+        if self.casava is None:
+            self.casava = other.casava
+        self.tiles.update(other.tiles)
+        self.filtered.update(other.filtered)
+        self._cap_tiles()
+
+    def state(self):
+        """
+        All counters as json compatible values, see from_state
+        """
+        return {'reads': self.reads,
+                'lengths': [[length, count] for (length, count) in self.lengths.items()],
+                'bases': self.bases.counts,
+                'casava': self.casava,
+                'tiles': [[key.decode('latin-1'), count] for (key, count) in self.tiles.items()],
+                'filtered': [[flag.decode('latin-1'), count]
+                             for (flag, count) in self.filtered.items()]}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Recreates a SeqStats from the output of state
+        """
+        stats = cls()
+        stats.reads = state['reads']
+        stats.lengths.update(dict(state['lengths']))
+        stats.bases = ByteHistogram(state['bases'])
+        stats.casava = state['casava']
+        stats.tiles.update(dict([(key.encode('latin-1'), count)
+                                 for (key, count) in state['tiles']]))
+        stats.filtered.update(dict([(flag.encode('latin-1'), count)
+                                    for (flag, count) in state['filtered']]))
+        return stats
+
+    def base_counts(self):
+        """
+        Counts of each base (either case) and of any other character
+
+        Returns:
+            dict - keyed by base, plus 'other'
+        """
+        counts = self.bases.counts
+        bases = dict([(base, counts[ord(base)] + counts[ord(base.lower())]) for base in BASES])
+        bases['other'] = sum(counts) - sum(bases.values())
+        return bases
+
+    def tile_counts(self):
+        """
+        Reads by flowcell, lane and tile, names without these fields are
+        counted under 'unknown' and any beyond MAX_TILES under 'other'
+
+        Returns:
+            dict - {flowcell: {lane: {tile: reads}}}
+        """
+        flowcells = {}
+        for (key, count) in self.tiles.items():
+            fields = key.decode('latin-1').split(':')
+            if not key:
+                fields = ['other'] * 3
+            elif len(fields) < 5:
+                fields = ['unknown'] * 3
+            (flowcell, lane, tile) = fields[-3:]
+            tiles = flowcells.setdefault(flowcell, {}).setdefault(lane, {})
+            tiles[tile] = tiles.get(tile, 0) + count
+        return flowcells
+
+    def report(self):
+        """
+        Statistics for the json report
+        """
+        bases = self.base_counts()
+        acgt = sum([bases[base] for base in 'ACGT'])
+        total = acgt + bases['N'] + bases['other']
+        stats = {'reads': self.reads,
+                 'read_length': dict([(str(length), count)
+                                      for (length, count) in sorted(self.lengths.items())]),
+                 'bases': bases,
+                 'gc_content': round((bases['G'] + bases['C']) / acgt, 4) if acgt else None,
+                 'n_content': round(bases['N'] / total, 4) if total else None}
+        if self.casava:
+            stats['tiles'] = self.tile_counts()
+            stats['filtered'] = dict([(flag.decode('latin-1'), count)
+                                      for (flag, count) in self.filtered.items()])
+        return stats
@@ -35,17 +35,32 @@ FileMeta object to handle file actions and conversion from tsv formats
 
 import os
 import sys
-import gzip  # only used for reading
-import bz2  # only used for reading
-from xopen import xopen  # only used for writing
+import gzip
+import shutil
+# ProcessPoolExecutor is imported by concurrent.futures on first use
+import concurrent.futures
+from importlib import import_module
 import json
 
-# progressbar2
-import progressbar
-
 # this package:
-from cgp_seq_input_val.error_classes import SeqValidationError
+from cgp_seq_input_val import constants
+from cgp_seq_input_val.error_classes import BackendError, SeqValidationError
 from cgp_seq_input_val.fastq_read import FastqRead, FastqFormat, CasavaFastqRead, IlluminaFastqRead
+from cgp_seq_input_val import fastq_block
+from cgp_seq_input_val import read_backend
+from cgp_seq_input_val import write_backend
+from cgp_seq_input_val import bgzf
+from cgp_seq_input_val import parallel
+from cgp_seq_input_val import record_batch
+from cgp_seq_input_val import sample
+from cgp_seq_input_val.result_cache import ResultCache, cache_key
+from cgp_seq_input_val.digest import DIGESTS, Digester
+from cgp_seq_input_val.performance import NULL_STAGE, StageTimer
+from cgp_seq_input_val.resources import ResourceUsage
+from cgp_seq_input_val.checkpoint import Checkpoint, CHECKPOINT_SECONDS, input_identity
+from cgp_seq_input_val.quality import QualityHistogram
+from cgp_seq_input_val.seq_stats import SeqStats
+from cgp_seq_input_val.threaded_reader import ThreadedRecordReader, BlockPrefetcher
 
 # From: https://en.wikipedia.org/wiki/FASTQ_format#Encoding
 Q_RANGES = {'Sanger': [33, 73],
@@ -56,22 +71,58 @@ Q_RANGES = {'Sanger': [33, 73],
 
 PROG_RECORDS = 100000
 
+# see constants.ENGINES
+ENGINES = constants.ENGINES
+# records processed together by the block engine, must be even for interleaved
+BATCH_RECORDS = 8192
+# engines able to save checkpoints
+CHECKPOINT_ENGINES = ('block', 'batch')
+# engines instrumented for the performance section of the report
+PERFORMANCE_ENGINES = ('block', 'batch')
+# engines marking blocks of records for a sampling profiling.Profiler
+PROFILE_ENGINES = ('line', 'block', 'batch')
+# pairs in a block of the line engine, for sampled profiling
+LINE_BLOCK_PAIRS = BATCH_RECORDS // 2
+
 
 def validate_seq_files(args):
     """
     Top level entry point for validating sequence files.
     """
+    usage = ResourceUsage()
     out_fh = None
+    out_digester = None
     try:
         file_2 = None
         if len(args.input) == 2:
             file_2 = args.input[1]
             if args.output:
-                out_fh = xopen(args.output, mode='wt')
+                if args.digests:
+                    out_digester = Digester(args.output, args.digests)
+                out_fh = write_backend.open_output(args.output, args.write_backend, args.threads,
+                                                   text=args.engine == 'line',
+                                                   digester=out_digester,
+                                                   level=args.compress_level)
 
-        validator = SeqValidator(args.input[0], args.qc, out_fh=out_fh, file_b=file_2)
+        validator = SeqValidator(args.input[0], args.qc, out_fh=out_fh, file_b=file_2,
+                                 engine=args.engine, backend=args.backend,
+                                 threads=args.threads, processes=args.processes,
+                                 stats=args.stats, strict=args.strict,
+                                 checkpoint=args.checkpoint,
+                                 checkpoint_interval=args.checkpoint_interval,
+                                 resume=args.resume, sample_sites=args.sample,
+                                 cache=None if args.no_cache or out_fh
+                                 else ResultCache(args.cache),
+                                 digests=args.digests or (), performance=args.performance,
+                                 profiler=args.profiler)
         validator.validate()
-        validator.report(args.report)
+        report = validator.summary()
+        if out_digester is not None:
+            out_fh.close()
+            report['checksums'][args.output] = out_digester.hexdigests()
+        if args.resources:
+            report['resources'] = usage.report()
+        json.dump(report, args.report, sort_keys=True, indent=4)
     except SeqValidationError as ve:  # runtime so no functions for message and errno
         sys.exit("ERROR: " + str(ve))
     # have to catch 2 classes works 3.0-3.3, above 3.3 all IO issues are captured under OSError
@@ -80,6 +131,8 @@ def validate_seq_files(args):
     finally:
         if out_fh:
             out_fh.close()
+        if out_digester is not None:
+            out_digester.close()
 
 
 class SeqValidator(object):
@@ -91,8 +144,56 @@ class SeqValidator(object):
         file_b - optional, second end of pair if paired fastq[.gz]
         progress_pairs - optional, how often to update progress bar [100,000]
                        - set to 0 to disable
+        engine - optional, parser to use, see ENGINES [line]
+               - out_fh must be opened in binary mode for all but 'line'
+        backend - optional, decompression backend, see read_backend.BACKENDS [auto]
+        threads - optional, threads available to the decompression backend [1]
+        processes - optional, worker processes for the 'parallel' engine [all cpus]
+        stats - optional, gather extended QC statistics (seq_stats.SeqStats) [False]
+        strict - optional, reject sequence outside IUPAC codes and quality outside
+                 printable ascii, see fastq_block.SEQ_ALPHABET/QUAL_ALPHABET [False]
+        checkpoint - optional, file to save progress to periodically, only for the
+                     CHECKPOINT_ENGINES and without out_fh
+        checkpoint_interval - optional, seconds between checkpoints [CHECKPOINT_SECONDS]
+        resume - optional, continue from the checkpoint when it exists [False]
+        sample_sites - optional, only validate sample.SAMPLE_PAIRS pairs at this many
+                       sites, see validate_sampled [0 = validate everything]
+        cache - optional, result_cache.ResultCache, the report (or error) of unchanged
+                input validated with the same options is taken from it, not with out_fh
+        digests - optional, checksums of the raw (compressed) input to report, names
+                  from digest.DIGESTS, computed on a thread as the input is read [()]
+        performance - optional, report the time in each stage (performance.STAGES) and
+                      byte counts, only for the PERFORMANCE_ENGINES [False]
+        profiler - optional, profiling.Profiler, when sampling it is told of each block
+                   of records, only for the PROFILE_ENGINES [None]
     """
-    def __init__(self, file_a, qc_reads, file_b=None, out_fh=None, progress_pairs=PROG_RECORDS):
+    def __init__(self, file_a, qc_reads, file_b=None, out_fh=None, progress_pairs=PROG_RECORDS,
+                 engine='line', backend='auto', threads=1, processes=None, stats=False,
+                 strict=False, checkpoint=None, checkpoint_interval=CHECKPOINT_SECONDS,
+                 resume=False, sample_sites=0, cache=None, digests=(), performance=False,
+                 profiler=None):
+        if engine not in ENGINES:
+            raise ValueError("engine must be one of: %s" % ', '.join(ENGINES))
+        if not set(digests).issubset(DIGESTS):
+            raise ValueError("digests must be from: %s" % ', '.join(DIGESTS))
+        if engine == 'batch' and not record_batch.numpy_available():
+            raise SeqValidationError("Engine 'batch' is not available, numpy is not installed")
+        if checkpoint and engine not in CHECKPOINT_ENGINES:
+            raise SeqValidationError("Checkpoints are only supported by the engines: %s"
+                                     % ', '.join(CHECKPOINT_ENGINES))
+        if checkpoint and out_fh:
+            raise SeqValidationError("Checkpoints can't be used when writing output")
+        if sample_sites and (checkpoint or out_fh):
+            raise SeqValidationError("Sampling can't be used with checkpoints or output")
+        if cache is not None and out_fh:
+            raise SeqValidationError("Cached results can't be used when writing output")
+        if performance and engine not in PERFORMANCE_ENGINES:
+            raise SeqValidationError("Performance is only reported by the engines: %s"
+                                     % ', '.join(PERFORMANCE_ENGINES))
+        if profiler is not None and profiler.every and engine not in PROFILE_ENGINES:
+            raise SeqValidationError("Sampled profiling is only supported by the engines: %s"
+                                     % ', '.join(PROFILE_ENGINES))
+        self.engine = engine
         self.progress_pairs = progress_pairs
         self.qc_reads = qc_reads
         self.file_a = file_a
@@ -103,11 +204,31 @@ class SeqValidator(object):
         self.is_gzip = False  # change open method for fastq
         self.is_bz2 = False  # change open method for fastq
         # sam is not supported
+        self.threads = threads
+        self.processes = processes or os.cpu_count()
+        self.read_backend = backend  # resolved by _prep
 
-        self.q_min = 1000
-        self.q_max = -1
+        self.quality = QualityHistogram()
+        self.qc_counted = 0  # leading pairs already in quality, by prefix_qual_range
+        self.stats = SeqStats() if stats else None
+        self.strict = strict
         self.encodings = []
         self.fq_format = None
+        self.checkpoint = Checkpoint(checkpoint, checkpoint_interval) if checkpoint else None
+        self.resume = resume
+        self._block_indexes = {}  # bgzf.BlockIndex of each BGZF input, for checkpoints
+        self.sample_sites = sample_sites
+        self.sampled = 0  # sites validated
+        self.pair_limit = None  # stop the block engine after this many pairs
+        self.truncated = False  # stopped by pair_limit before the end of the input
+        self.cache = cache
+        self.cached = None  # report taken from the cache
+        self.digests = tuple(digests)
+        self.digesters = {}  # Digester of each input file
+        self.checksums = {}  # digests of each input file once validated
+        self.performance = performance
+        self.timer = None  # performance.StageTimer while validating
+        self.profiler = profiler
         self._prep()
 
     def __str__(self):
@@ -116,11 +237,26 @@ class SeqValidator(object):
         ret.append('file_b: '+str(self.file_b))
         ret.append('is_gzip: '+str(self.is_gzip))
         ret.append('is_bz2: '+str(self.is_bz2))
+        ret.append('read_backend: '+self.read_backend)
         ret.append('q_min: '+str(self.q_min))
         ret.append('q_max: '+str(self.q_max))
         ret.append('encodings: '+str(self.encodings))
         return '\n'.join(ret)
 
+    @property
+    def q_min(self):
+        """
+        Lowest quality character (ascii value) seen, 1000 before any
+        """
+        return self.quality.min()
+
+    @property
+    def q_max(self):
+        """
+        Highest quality character (ascii value) seen, -1 before any
+        """
+        return self.quality.max()
+
     def _prep(self):
         full_ext = ''
         (base, ext) = os.path.splitext(self.file_a)
@@ -138,6 +274,8 @@ class SeqValidator(object):
             raise SeqValidationError("Input files must be fastq|fq[.gz]")
 
         full_ext = ext + full_ext
+        self.read_backend = read_backend.select_backend(
+            read_backend.compression_type(self.file_a), self.read_backend)
 
         if self.file_b is None:
             self.file_b = self.file_a  # use equality to indicate interleaved
@@ -151,7 +289,78 @@ class SeqValidator(object):
         Raises:
             SeqValidationError
         """
-        if self.file_a == self.file_b:
+        if self.cache is None:
+            self.validate_input()
+            return
+        files = [self.file_a] if self.file_a == self.file_b else [self.file_a, self.file_b]
+        key = cache_key(files, {'qc': self.qc_reads, 'stats': self.stats is not None,
+                                'strict': self.strict, 'sample': self.sample_sites,
+                                'digests': sorted(self.digests),
+                                'performance': self.performance, 'engine': self.engine,
+                                'read_backend': self.read_backend})
+        result = self.cache.get(key)
+        if result is not None:
+            if 'error' in result:
+                raise SeqValidationError(result['error'])
+            self.cached = result['report']
+            return
+        try:
+            self.validate_input()
+        except BackendError:  # not a problem with the input
+            raise
+        except SeqValidationError as ve:
+            if self.checkpoint is None:  # otherwise may be a problem with the checkpoint
+                self.cache.put(key, {'error': str(ve)})
+            raise
+        self.cache.put(key, {'report': self.summary()})
+
+    def validate_input(self):
+        """
+        Validates the sequence file(s) with the selected engine, completing
+        the checksums when requested
+
+        Raises:
+            SeqValidationError
+        """
+        if self.performance:
+            self.timer = StageTimer()
+            self.timer.count('input_bytes', sum([os.path.getsize(filename) for filename
+                                                 in set((self.file_a, self.file_b))]))
+        try:
+            self.validate_engine()
+            for filename in (self.file_a, self.file_b):
+                if self.digests:
+                    self.checksums[filename] = self.digester(filename).hexdigests()
+        finally:
+            if self.profiler is not None and self.profiler.every:
+                self.profiler.stop()
+            for digester in self.digesters.values():
+                digester.close()
+
+    def validate_engine(self):
+        """
+        Dispatches to the validation of the selected engine
+
+        Raises:
+            SeqValidationError
+        """
+        if self.sample_sites:
+            self.validate_sampled()
+        elif self.engine in ('block', 'batch'):
+            if self.file_a == self.file_b:
+                self.validate_interleaved_block()
+            else:
+                self.validate_paired_block()
+            if self.checkpoint is not None:
+                self.checkpoint.remove()
+        elif self.engine == 'parallel':
+            self.validate_parallel()
+        elif self.engine == 'threaded':
+            if self.file_a == self.file_b:
+                self.validate_interleaved_threaded()
+            else:
+                self.validate_paired_threaded()
+        elif self.file_a == self.file_b:
             self.validate_interleaved()
         else:
             self.validate_paired()
@@ -160,6 +369,7 @@ class SeqValidator(object):
         """
         Converts the ascii quality score range to something useful for debugging
         """
+        self.encodings = []
         for encoding in Q_RANGES:
             if(Q_RANGES[encoding][0] <= self.q_min <= Q_RANGES[encoding][1] and
                Q_RANGES[encoding][0] <= self.q_max <= Q_RANGES[encoding][1]):
@@ -172,14 +382,38 @@ class SeqValidator(object):
         Args:
             fp - file pointer
         """
+        json.dump(self.summary(), fp, sort_keys=True, indent=4)
+
+    def summary(self):
+        """
+        Content of the json report
+
+        Returns:
+            dict - with 'cached' true when taken from the cache
+        """
+        if self.cached is not None:
+            return dict(self.cached, cached=True, read_backend=self.read_backend)
         self.possible_encoding()
         report = {'pairs': self.pairs,
                   'valid_q': self.q_min >= 33 and self.q_max <= 74,
                   'interleaved': self.file_a == self.file_b,
                   'possible_encoding': self.encodings,
                   'quality_ascii_range': [self.q_min, self.q_max],
+                  'quality_histogram': self.quality.report(),
+                  'quality_binning': self.quality.binning(),
+                  'read_backend': self.read_backend,
                   'format': self.fq_format.value}
-        json.dump(report, fp, sort_keys=True, indent=4)
+        if self.stats is not None:
+            report['stats'] = self.stats.report()
+        if self.digests:
+            report['checksums'] = dict(self.checksums)
+        if self.timer is not None:
+            report['performance'] = self.timer.report(self.pairs * 2)
+        if self.sample_sites:
+            report['sampled'] = {'sites': self.sampled,
+                                 'pairs_per_site': sample.SAMPLE_PAIRS,
+                                 'complete': not self.truncated}
+        return report
 
     def validate_paired(self):
         """
@@ -194,16 +428,10 @@ class SeqValidator(object):
         file_b = self.file_b
         prog_indic = self.progress_pairs
         pairs = 0
+        out_reads = []
         try:
-            if self.is_gzip:
-                fq_fh_a = gzip.open(self.file_a, 'rt')
-                fq_fh_b = gzip.open(self.file_b, 'rt')
-            elif self.is_bz2:
-                fq_fh_a = bz2.open(self.file_a, 'rt')
-                fq_fh_b = bz2.open(self.file_b, 'rt')
-            else:
-                fq_fh_a = open(self.file_a, 'r')
-                fq_fh_b = open(self.file_b, 'r')
+            fq_fh_a = self.open_input(self.file_a, text=True)
+            fq_fh_b = self.open_input(self.file_b, text=True)
 
             curr_line_a = None
             curr_line_b = None
@@ -212,6 +440,9 @@ class SeqValidator(object):
             bar = self.setup_progress()
 
             self.fq_format = get_fq_format(fq_fh_a)
+            if not fq_fh_a.seekable():  # piped backends can't rewind
+                fq_fh_a.close()
+                fq_fh_a = self.open_input(self.file_a, text=True)
             FqClass = None
             if self.fq_format == FastqFormat.ILLUMINA:
                 FqClass = IlluminaFastqRead
@@ -219,6 +450,8 @@ class SeqValidator(object):
                 FqClass = CasavaFastqRead
 
             while True:
+                if pairs % LINE_BLOCK_PAIRS == 0:
+                    self.profile_block()
                 read_1 = FqClass(fq_fh_a, fqh_line_a, curr_line_a)
                 read_1.validate(file_a)
                 curr_line_a = read_1.last_line
@@ -232,8 +465,10 @@ class SeqValidator(object):
                 self.check_pair(read_1, read_2, self.qc_reads == 0 or pairs < self.qc_reads)
 
                 if self.out_fh:
-                    print(read_1, file=self.out_fh)
-                    print(read_2, file=self.out_fh)
+                    out_reads.append(str(read_1))
+                    out_reads.append(str(read_2))
+                    if len(out_reads) >= BATCH_RECORDS:
+                        self.write_reads(out_reads)
 
                 pairs += 1
 
@@ -248,12 +483,23 @@ class SeqValidator(object):
                     raise SeqValidationError("Read 2 file finished before read 1")
             self.pairs = pairs
         finally:
+            if out_reads:
+                self.write_reads(out_reads)
             print(file=sys.stderr)  # make sure we move to next line when progress finishes
             if fq_fh_a is not None and not fq_fh_a.closed:
                 fq_fh_a.close()
             if fq_fh_b is not None and not fq_fh_b.closed:
                 fq_fh_b.close()
 
+    def write_reads(self, reads):
+        """
+        Writes reads collected by the line engine to out_fh as a single
+        piece, reads is emptied.
+        """
+        reads.append('')
+        self.out_fh.write('\n'.join(reads))
+        del reads[:]
+
     def validate_interleaved(self):
         """
         Validates an interleaved fastq file
@@ -265,12 +511,7 @@ class SeqValidator(object):
         fq_fh = None
         file_a = self.file_a
         try:
-            if self.is_gzip:
-                fq_fh = gzip.open(self.file_a, 'rt')
-            elif self.is_bz2:
-                fq_fh = bz2.open(self.file_a, 'rt')
-            else:
-                fq_fh = open(self.file_a, 'r')
+            fq_fh = self.open_input(self.file_a, text=True)
 
             curr_line = None
             fqh_line = 0
@@ -278,6 +519,9 @@ class SeqValidator(object):
             pairs = 0
 
             self.fq_format = get_fq_format(fq_fh)
+            if not fq_fh.seekable():  # piped backends can't rewind
+                fq_fh.close()
+                fq_fh = self.open_input(self.file_a, text=True)
             FqClass = None
             if self.fq_format == FastqFormat.ILLUMINA:
                 FqClass = IlluminaFastqRead
@@ -285,6 +529,8 @@ class SeqValidator(object):
                 FqClass = CasavaFastqRead
 
             while True:
+                if pairs % LINE_BLOCK_PAIRS == 0:
+                    self.profile_block()
                 read_1 = FqClass(fq_fh, fqh_line, curr_line)
                 read_1.validate(file_a)
                 curr_line = read_1.last_line
@@ -310,17 +556,903 @@ class SeqValidator(object):
             if fq_fh is not None and not fq_fh.closed:
                 fq_fh.close()
 
-    def qual_range(self, read):
+    def open_input(self, filename, text=False):
+        """
+        Opens an input file using the selected read backend, passing the raw
+        data to the file's Digester
+        """
+        return read_backend.open_input(filename, self.read_backend, self.threads, text=text,
+                                       digester=self.digester(filename), timer=self.timer)
+
+    def stage(self, name):
+        """
+        Context manager timing a stage of validation when reporting performance
+        """
+        return NULL_STAGE if self.timer is None else self.timer.stage(name)
+
+    def profile_block(self):
+        """
+        Marks the start of a block of records for a sampling profiler
+        """
+        if self.profiler is not None:
+            self.profiler.block()
+
+    def digester(self, filename):
+        """
+        The Digester of an input file, None when checksums aren't requested
+        """
+        if not self.digests:
+            return None
+        if filename not in self.digesters:
+            self.digesters[filename] = Digester(filename, self.digests)
+        return self.digesters[filename]
+
+    def digest_in_background(self):
+        """
+        Hashes the input files on threads, for engines that stop reading
+        them as a stream
+        """
+        if self.digests:
+            for filename in set((self.file_a, self.file_b)):
+                self.digester(filename).start_reading()
+
+    def validate_paired_block(self):
+        """
+        Validates a paired set of fastq files using the block engine.
+
+        Raises:
+            SeqValidationError
+        """
+        fq_fh_a = None
+        fq_fh_b = None
+        try:
+            positions = self.restore_checkpoint()
+            if positions:
+                fq_fh_a = self.open_input_at(self.file_a, positions[0])
+                fq_fh_b = self.open_input_at(self.file_b, positions[1])
+                reader_a = self.block_reader(fq_fh_a, line_no=positions[0]['line_no'])
+                reader_b = self.block_reader(fq_fh_b, line_no=positions[1]['line_no'])
+            else:
+                fq_fh_a = self.open_input(self.file_a)
+                fq_fh_b = self.open_input(self.file_b)
+                reader_a = self.block_reader(fq_fh_a)
+                reader_b = self.block_reader(fq_fh_b)
+            bar = self.setup_progress()
+
+            with self.stage('parse'):
+                records_a = reader_a.read_records(self.batch_records(1))
+            if positions:
+                # the checkpoint was taken with file_a part read
+                if not records_a and reader_b.read_records(1):
+                    raise SeqValidationError("Read 1 file finished before read 2")
+            else:
+                self.fq_format = fastq_block.get_fq_format(records_a[0] if records_a else None)
+            self.paired_block_records(reader_a, reader_b, records_a, bar)
+        finally:
+            print(file=sys.stderr)  # make sure we move to next line when progress finishes
+            if fq_fh_a is not None and not fq_fh_a.closed:
+                fq_fh_a.close()
+            if fq_fh_b is not None and not fq_fh_b.closed:
+                fq_fh_b.close()
+
+    def validate_interleaved_block(self):
+        """
+        Validates an interleaved fastq file using the block engine.
+
+        Raises:
+            SeqValidationError
+        """
+        fq_fh = None
+        try:
+            positions = self.restore_checkpoint()
+            if positions:
+                fq_fh = self.open_input_at(self.file_a, positions[0])
+                reader = self.block_reader(fq_fh, interleaved=True,
+                                           line_no=positions[0]['line_no'])
+            else:
+                fq_fh = self.open_input(self.file_a)
+                reader = self.block_reader(fq_fh, interleaved=True)
+            bar = self.setup_progress()
+
+            with self.stage('parse'):
+                records = reader.read_records(self.batch_records(2))
+            if not positions:
+                self.fq_format = fastq_block.get_fq_format(records[0] if records else None)
+            self.interleaved_block_records(reader, records, bar)
+        finally:
+            print(file=sys.stderr)  # make sure we move to next line when progress finishes
+            if fq_fh is not None and not fq_fh.closed:
+                fq_fh.close()
+
+    def block_reader(self, fq_fh, interleaved=False, line_no=None):
+        """
+        Creates the reader for the block or batch engine, records are returned
+        as lists of tuples or, by the batch engine, as RecordBatches when possible
+        """
+        if self.engine == 'batch':
+            return record_batch.BatchReader(fq_fh, interleaved=interleaved, line_no=line_no)
+        return fastq_block.FastqBlockReader(fq_fh, interleaved=interleaved, line_no=line_no)
+
+    def open_input_at(self, filename, position):
+        """
+        Opens an input file positioned at a record saved in a checkpoint.
+        BGZF input starts from the block of the virtual offset, uncompressed
+        input is seeked and other compressed input is decompressed from the
+        start discarding the data before the record.
+
+        Args:
+            position - dict with the offset in the decompressed data, and
+                       virtual_offset for BGZF input
+
+        Returns:
+            binary file handle
+        """
+        if position.get('virtual_offset') is not None:
+            return bgzf.open_virtual(filename, position['virtual_offset'])
+        fq_fh = self.open_input(filename)
+        if fq_fh.seekable():
+            fq_fh.seek(position['offset'])
+            return fq_fh
+        skip = position['offset']
+        while skip:
+            read = len(fq_fh.read(min(skip, fastq_block.BLOCK_SIZE)))
+            if not read:
+                raise SeqValidationError("%s is shorter than the checkpoint" % filename)
+            skip -= read
+        return fq_fh
+
+    def save_checkpoint(self, readers):
+        """
+        Saves a checkpoint when one is due, readers (one per input file) must
+        be positioned at the start of the next pair.  Skipped when the position
+        of a reader is not known.
+        """
+        if not self.checkpoint.due():
+            return
+        offsets = [reader.tell() for reader in readers]
+        if None in offsets:
+            return
+        inputs = []
+        for (filename, reader, offset) in zip((self.file_a, self.file_b), readers, offsets):
+            position = input_identity(filename)
+            position.update({'offset': offset, 'line_no': reader.line_no,
+                             'virtual_offset': None})
+            if filename not in self._block_indexes and self.is_gzip and bgzf.is_bgzf(filename):
+                self._block_indexes[filename] = bgzf.BlockIndex(filename)
+            if filename in self._block_indexes:
+                position['virtual_offset'] = self._block_indexes[filename].virtual_offset(offset)
+            inputs.append(position)
+        state = {'inputs': inputs,
+                 'options': self.checkpoint_options(),
+                 'pairs': self.pairs,
+                 'format': self.fq_format.value,
+                 'quality_ascii_range': [self.q_min, self.q_max],
+                 'quality_histogram': self.quality.counts,
+                 'stats': self.stats.state() if self.stats is not None else None}
+        self.checkpoint.save(state)
+
+    def checkpoint_options(self):
+        """
+        Options that must be the same for a checkpoint to be resumed
+        """
+        return {'qc': self.qc_reads, 'stats': self.stats is not None, 'strict': self.strict,
+                'interleaved': self.file_a == self.file_b}
+
+    def restore_checkpoint(self):
+        """
+        Restores the state saved in the checkpoint when resuming
+
+        Returns:
+            list - position (dict) of the next record in each input, None when
+                   not resuming or there is no checkpoint
+
+        Raises:
+            SeqValidationError - when the input files or options have changed
+        """
+        if self.checkpoint is None or not self.resume:
+            return None
+        state = self.checkpoint.load()
+        if state is None:
+            return None
+        inputs = state['inputs']
+        filenames = (self.file_a,) if self.file_a == self.file_b else (self.file_a, self.file_b)
+        keys = ('path', 'size', 'mtime')
+        if (state['options'] != self.checkpoint_options() or len(inputs) != len(filenames)
+                or any([[position[key] for key in keys] != [identity[key] for key in keys]
+                        for (position, identity)
+                        in zip(inputs, map(input_identity, filenames))])):
+            raise SeqValidationError("Checkpoint %s does not match the input files and options"
+                                     % self.checkpoint.filename)
+        self.pairs = state['pairs']
+        self.fq_format = FastqFormat(state['format'])
+        self.quality = QualityHistogram(state['quality_histogram'])
+        if state['stats'] is not None:
+            self.stats = SeqStats.from_state(state['stats'])
+        return inputs
+
+    def paired_block_records(self, reader_a, reader_b, records_a, bar=None):
+        """
+        Validates the remaining records of a paired set of fastq files, the
+        first batch of reader_a has already been read.
+
+        Raises:
+            SeqValidationError
+        """
+        validate_record = fastq_block.record_validator(self.fq_format)
+        while records_a:
+            self.profile_block()
+            with self.stage('parse'):
+                records_b = reader_b.read_records(len(records_a))
+            with self.stage('check_pair'):
+                self.check_block_pairs(records_a, records_b, validate_record, bar)
+            if len(records_b) < len(records_a):
+                raise SeqValidationError("Read 2 file finished before read 1")
+            if reader_a.finished:
+                if not reader_b.finished:
+                    raise SeqValidationError("Read 1 file finished before read 2")
+                break  # if we get here both files are finished
+            if self.pair_limit is not None and self.pairs >= self.pair_limit:
+                self.truncated = True
+                break
+            if self.checkpoint is not None:
+                self.save_checkpoint((reader_a, reader_b))
+            with self.stage('parse'):
+                records_a = reader_a.read_records(self.batch_records(1))
+
+    def interleaved_block_records(self, reader, records, bar=None):
+        """
+        Validates the remaining records of an interleaved fastq file, the
+        first batch has already been read.
+
+        Raises:
+            SeqValidationError
+        """
+        validate_record = fastq_block.record_validator(self.fq_format)
+        while records:
+            self.profile_block()
+            with self.stage('check_pair'):
+                self.check_block_pairs(records[0::2], records[1::2], validate_record, bar)
+            if len(records) % 2:
+                validate_record(records[-1], self.file_a)
+                raise SeqValidationError("Fastq record at line %d of %s has no mate"
+                                         % (reader.line_no, self.file_a))
+            if self.pair_limit is not None and self.pairs >= self.pair_limit:
+                self.truncated = not reader.finished
+                break
+            if self.checkpoint is not None and not reader.finished:
+                self.save_checkpoint((reader,))
+            with self.stage('parse'):
+                records = reader.read_records(self.batch_records(2))
+
+    def batch_records(self, records_per_pair):
+        """
+        Records to read in the next batch of the block engine, fewer than
+        BATCH_RECORDS when close to pair_limit
+        """
+        if self.pair_limit is None:
+            return BATCH_RECORDS
+        return min(BATCH_RECORDS, (self.pair_limit - self.pairs) * records_per_pair)
+
+    def validate_sampled(self):
+        """
+        Triage of large inputs, validates the first sample.SAMPLE_PAIRS pairs
+        with the block (or batch) engine.  When the input continues and allows
+        random access (uncompressed or BGZF) the same number of pairs are then
+        validated at each of sample_sites - 1 pseudo random sites, otherwise
+        the first sample_sites * SAMPLE_PAIRS pairs are validated.
+
+        Raises:
+            SeqValidationError - line numbers at sites other than the first are
+                                 counted from the site
+        """
+        random_access = not self.is_bz2 and (
+            not self.is_gzip or (bgzf.is_bgzf(self.file_a) and bgzf.is_bgzf(self.file_b)))
+        self.pair_limit = sample.SAMPLE_PAIRS * (1 if random_access else self.sample_sites)
+        if self.file_a == self.file_b:
+            self.validate_interleaved_block()
+        else:
+            self.validate_paired_block()
+        self.sampled = 1
+        if not (random_access and self.truncated):
+            return
+        validate_record = fastq_block.record_validator(self.fq_format)
+        for fraction in sample.site_fractions(self.sample_sites)[1:]:
+            try:
+                self.validate_site(fraction, validate_record)
+            except SeqValidationError as err:
+                raise SeqValidationError("%s (sampled at %.1f%% of the input, line numbers are "
+                                         "counted from there)" % (err, fraction * 100))
+
+    def validate_site(self, fraction, validate_record):
+        """
+        Validates sample.SAMPLE_PAIRS pairs from the first record after a
+        fraction of the input.  For paired files the site in each file is at
+        the same fraction, the records are aligned by name.  A site with no
+        records is skipped.
+
+        Raises:
+            SeqValidationError
+        """
+        interleaved = self.file_a == self.file_b
+        handles = []
+        try:
+            readers = []
+            for filename in (self.file_a,) if interleaved else (self.file_a, self.file_b):
+                fq_fh = sample.open_site(filename, fraction, self.is_gzip)
+                if fq_fh is None:
+                    return
+                handles.append(fq_fh)
+                reader = sample.site_reader(fq_fh, interleaved)
+                if reader is None:
+                    return
+                readers.append(reader)
+
+            if interleaved:
+                records = readers[0].read_records(sample.SAMPLE_PAIRS * 2 + 1)
+                if records and validate_record(records[0], self.file_a)[1] == b'2':
+                    records = records[1:]  # started at the second read of a pair
+                records_1 = records[0:sample.SAMPLE_PAIRS * 2:2]
+                records_2 = records[1:sample.SAMPLE_PAIRS * 2:2]
+            else:
+                records_1 = readers[0].read_records(sample.SAMPLE_PAIRS)
+                records_2 = readers[1].read_records(sample.SAMPLE_PAIRS * 2)
+                (start_1, start_2) = self.align_mates(records_1, records_2, validate_record)
+                records_1 = records_1[start_1:]
+                records_2 = records_2[start_2:start_2 + len(records_1)]
+            if records_1 and records_2:
+                self.check_block_pairs(records_1, records_2, validate_record)
+                self.sampled += 1
+        finally:
+            for fq_fh in handles:
+                fq_fh.close()
+
+    def align_mates(self, records_1, records_2, validate_record):
+        """
+        Finds the first read name common to records from the same site of
+        each file of a pair
+
+        Returns:
+            (index in records_1, index in records_2)
+
+        Raises:
+            SeqValidationError - when no name is found in both
+        """
+        names_1 = [validate_record(record, self.file_a)[0] for record in records_1]
+        names_2 = [validate_record(record, self.file_b)[0] for record in records_2]
+        index_2 = dict([(name, idx) for (idx, name) in reversed(list(enumerate(names_2)))])
+        for (idx, name) in enumerate(names_1):
+            if name in index_2:
+                return (idx, index_2[name])
+        raise SeqValidationError("No read names in common between %s and %s, "
+                                 "the files may not be paired" % (self.file_a, self.file_b))
+
+    def is_bgzf(self):
+        """
+        Checks if file_a is BGZF compressed, allowing it to be split between processes
+        """
+        return self.is_gzip and bgzf.is_bgzf(self.file_a)
+
+    def validate_parallel(self):
+        """
+        Validates with a pool of processes when the input can be split,
+        interleaved BGZF or uncompressed fastq, otherwise as the threaded
+        engine.  Paired input written to out_fh also uses the threaded engine
+        as output must be in order.
+
+        Raises:
+            SeqValidationError
         """
-        Finds the min and max ascii values from each quality encoding
+        interleaved = self.file_a == self.file_b
+        if interleaved and self.is_bgzf():
+            self.validate_interleaved_parallel()
+        elif not (self.is_gzip or self.is_bz2) and self.out_fh is None:
+            self.validate_mapped_parallel()
+        elif interleaved:
+            self.validate_interleaved_threaded()
+        else:
+            self.validate_paired_threaded()
+
+    def validate_interleaved_parallel(self):
+        """
+        Validates an interleaved BGZF compressed fastq file by splitting it
+        into block aligned chunks validated in a pool of processes.
+
+        Chunks are combined in file order, at the first chunk a worker could
+        not fully validate the file is validated serially from the start of
+        that chunk so errors are reported exactly as the block engine would.
+
+        Raises:
+            SeqValidationError
+        """
+        fq_fh = None
+        futures = []
+        try:
+            fq_fh = self.open_input(self.file_a)
+            reader = fastq_block.FastqBlockReader(fq_fh, interleaved=True)
+            bar = self.setup_progress()
+
+            records = reader.read_records(BATCH_RECORDS)
+            self.fq_format = fastq_block.get_fq_format(records[0] if records else None)
+            offsets = bgzf.chunk_offsets(self.file_a, parallel.CHUNK_BYTES)
+            check_qual = self.qc_reads == 0
+
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.processes) as executor:
+                futures = [executor.submit(parallel.bgzf_chunk, self.file_a, offsets, idx,
+                                           self.fq_format, True, check_qual,
+                                           self.stats is not None, self.strict)
+                           for idx in range(len(offsets) - 1)]
+                if not check_qual:  # quality of the first pairs while the workers run
+                    self.prefix_qual_range(reader, records, self.qc_reads * 2)
+                    self.qc_counted = self.qc_reads
+                fq_fh.close()
+                self.digest_in_background()
+
+                failed = self.gather_chunks(futures, check_qual, bar)
+                if failed is not None:
+                    skip = futures[failed - 1].result().next_start if failed else 0
+                    self.resume_interleaved_bgzf(offsets[failed], skip, bar)
+        finally:
+            for future in futures:
+                future.cancel()
+            print(file=sys.stderr)  # make sure we move to next line when progress finishes
+            if fq_fh is not None and not fq_fh.closed:
+                fq_fh.close()
+
+    def validate_mapped_parallel(self):
+        """
+        Validates uncompressed interleaved or paired fastq files by memory
+        mapping them and validating chunks of records in a pool of processes.
+
+        The newlines in each part of the files are counted first so chunks
+        can be cut at the same record in both files of a pair.  Chunks are
+        combined in file order, at the first chunk a worker could not fully
+        validate the files are validated serially from the start of that
+        chunk so errors are reported exactly as the block engine would.
+
+        Raises:
+            SeqValidationError
+        """
+        interleaved = self.file_a == self.file_b
+        files = [self.file_a] if interleaved else [self.file_a, self.file_b]
+        step = 2 if interleaved else 1  # records per pair in each file
+        fq_fh = None
+        futures = []
+        try:
+            fq_fh = self.open_input(self.file_a)
+            reader = fastq_block.FastqBlockReader(fq_fh, interleaved=interleaved)
+            bar = self.setup_progress()
+
+            records = reader.read_records(BATCH_RECORDS)
+            self.fq_format = fastq_block.get_fq_format(records[0] if records else None)
+            check_qual = self.qc_reads == 0
+
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.processes) as executor:
+                starts = [parallel.range_starts(os.path.getsize(filename), parallel.CHUNK_BYTES)
+                          for filename in files]
+                counts = [list(executor.map(parallel.count_newlines, [filename] * (len(part) - 1),
+                                            part[:-1], part[1:]))
+                          for (filename, part) in zip(files, starts)]
+                # chunks divide the pairs in file_a, the last takes anything extra in file_b
+                pairs = sum(counts[0]) // (4 * step)
+                chunks = len(starts[0]) - 1
+                targets = [pairs * idx // chunks * step * 4 for idx in range(1, chunks)]
+                bounds = [[(0, 0)] + parallel.line_bounds(part, count, targets) + [None]
+                          for (part, count) in zip(starts, counts)]
+                futures = [executor.submit(parallel.mapped_chunk, files,
+                                           [bound[idx] for bound in bounds],
+                                           [bound[idx + 1] for bound in bounds],
+                                           self.fq_format, interleaved, check_qual,
+                                           self.stats is not None, self.strict)
+                           for idx in range(chunks)]
+                if not check_qual:  # quality of the first pairs while the workers run
+                    self.prefix_qual_range(reader, records, self.qc_reads * step)
+                    if not interleaved:
+                        with self.open_input(self.file_b) as fq_fh_b:
+                            reader_b = fastq_block.FastqBlockReader(fq_fh_b)
+                            self.prefix_qual_range(reader_b,
+                                                   reader_b.read_records(BATCH_RECORDS),
+                                                   self.qc_reads)
+                    self.qc_counted = self.qc_reads
+                fq_fh.close()
+                self.digest_in_background()
+
+                failed = self.gather_chunks(futures, check_qual, bar)
+                if failed is not None:
+                    self.resume_mapped(futures[failed].result().start, bar)
+        finally:
+            for future in futures:
+                future.cancel()
+            print(file=sys.stderr)  # make sure we move to next line when progress finishes
+            if fq_fh is not None and not fq_fh.closed:
+                fq_fh.close()
+
+    def gather_chunks(self, futures, check_qual, bar=None):
+        """
+        Combines the results of the chunks validated by worker processes in
+        file order, stopping at the first chunk that needs serial validation.
+
+        Returns:
+            int - index of the chunk needing serial validation, None when all passed
         """
-        sorted_qual = list(map(ord, read.qual))
-        sorted_qual.sort()  # faster than sorted(list(...))
-        if self.q_min > sorted_qual[0]:
-            self.q_min = sorted_qual[0]
+        for (idx, future) in enumerate(futures):
+            result = future.result()
+            if not result.ok:
+                for pending in futures[idx:]:
+                    pending.cancel()
+                return idx
+            if check_qual:
+                self.quality.merge(result.quality)
+            if self.stats is not None:
+                self.stats.merge(result.stats)
+            pairs = self.pairs + result.pairs
+            if bar and pairs // self.progress_pairs > self.pairs // self.progress_pairs:
+                bar.update(pairs // self.progress_pairs)
+            self.pairs = pairs
+        return None
+
+    def prefix_qual_range(self, reader, records, qc_records):
+        """
+        Assesses the quality of the first qc_records of a file without
+        validating them, records holds the first batch already read.
+        """
+        seen = 0
+        while records and seen < qc_records:
+            self.quality.add(b''.join([record[4] for record in records[:qc_records - seen]
+                                       if record[4] is not None]))
+            seen += len(records)
+            records = reader.read_records(BATCH_RECORDS)
+
+    def resume_line_no(self, records_per_pair):
+        """
+        The line FastqRead would give the record following self.pairs pairs
+        of 4 line records, None for the first record of a file.
+        """
+        if self.pairs == 0:
+            return None
+        return 1 + 3 * self.pairs * records_per_pair
+
+    def resume_interleaved_bgzf(self, offset, skip, bar=None):
+        """
+        Validates an interleaved BGZF file serially from the pair starting
+        skip bytes into the data of the block at offset, following the
+        self.pairs pairs already validated.
+
+        Raises:
+            SeqValidationError
+        """
+        with open(self.file_a, 'rb') as raw:
+            raw.seek(offset)
+            with gzip.GzipFile(fileobj=raw) as fq_fh:
+                while skip:
+                    skip -= len(fq_fh.read(min(skip, fastq_block.BLOCK_SIZE)))
+                reader = fastq_block.FastqBlockReader(fq_fh, interleaved=True,
+                                                      line_no=self.resume_line_no(2))
+                self.interleaved_block_records(reader, reader.read_records(BATCH_RECORDS), bar)
+
+    def resume_mapped(self, offsets, bar=None):
+        """
+        Validates uncompressed files serially from the given offset in each,
+        following the self.pairs pairs already validated.
+
+        Raises:
+            SeqValidationError
+        """
+        if self.file_a == self.file_b:
+            with open(self.file_a, 'rb') as fq_fh:
+                fq_fh.seek(offsets[0])
+                reader = fastq_block.FastqBlockReader(fq_fh, interleaved=True,
+                                                      line_no=self.resume_line_no(2))
+                self.interleaved_block_records(reader, reader.read_records(BATCH_RECORDS), bar)
+            return
+        with open(self.file_a, 'rb') as fq_fh_a, open(self.file_b, 'rb') as fq_fh_b:
+            fq_fh_a.seek(offsets[0])
+            fq_fh_b.seek(offsets[1])
+            line_no = self.resume_line_no(1)
+            reader_a = fastq_block.FastqBlockReader(fq_fh_a, line_no=line_no)
+            reader_b = fastq_block.FastqBlockReader(fq_fh_b, line_no=line_no)
+            records_a = reader_a.read_records(BATCH_RECORDS)
+            # the previous chunk ended with file_a
+            if not records_a and reader_b.read_records(1):
+                raise SeqValidationError("Read 1 file finished before read 2")
+            self.paired_block_records(reader_a, reader_b, records_a, bar)
+
+    def validate_paired_threaded(self):
+        """
+        Validates a paired set of fastq files.  Each file has a thread for
+        reading/decompression and another for parsing/validation leaving only
+        the pair checks here.
+
+        Raises:
+            SeqValidationError
+        """
+        fq_fh_a = None
+        fq_fh_b = None
+        workers = []
+        try:
+            fq_fh_a = self.open_input(self.file_a)
+            fq_fh_b = self.open_input(self.file_b)
+            prefetch_a = BlockPrefetcher(fq_fh_a, fastq_block.BLOCK_SIZE)
+            workers.append(prefetch_a)
+            prefetch_b = BlockPrefetcher(fq_fh_b, fastq_block.BLOCK_SIZE)
+            workers.append(prefetch_b)
+            reader_a = fastq_block.FastqBlockReader(prefetch_a)
+            bar = self.setup_progress()
 
-        if self.q_max < sorted_qual[-1]:
-            self.q_max = sorted_qual[-1]
+            records_a = reader_a.read_records(BATCH_RECORDS)
+            self.fq_format = fastq_block.get_fq_format(records_a[0] if records_a else None)
+
+            worker_a = ThreadedRecordReader(reader_a, self.fq_format, self.file_a,
+                                            BATCH_RECORDS, pending=records_a)
+            workers.insert(0, worker_a)
+            worker_b = ThreadedRecordReader(fastq_block.FastqBlockReader(prefetch_b),
+                                            self.fq_format, self.file_b, BATCH_RECORDS)
+            workers.insert(0, worker_b)
+            batch_a = worker_a.get()
+            batch_b = worker_b.get()
+            while True:
+                if not batch_a and not batch_a.terminal():
+                    batch_a = worker_a.get()
+                if not batch_b and not batch_b.terminal():
+                    batch_b = worker_b.get()
+                count = min(len(batch_a), len(batch_b))
+                if count:
+                    invalid = self.first_invalid_pair(batch_a.records[:count],
+                                                      batch_b.records[:count])
+                    if invalid is not None:
+                        count = invalid + 1
+                    self.check_names(batch_a.records[:count], batch_b.records[:count])
+                    if invalid is not None:
+                        self.alphabet_error(batch_a.records[invalid], batch_b.records[invalid])
+                    self.block_pairs_done(batch_a.records[:count], batch_b.records[:count], bar)
+                    batch_a.consume(count)
+                    batch_b.consume(count)
+                    continue
+                # at least one file has nothing more to give, order as validate_paired
+                end_a = not batch_a and batch_a.finished
+                end_b = not batch_b and batch_b.finished
+                if end_a and end_b:
+                    break
+                if end_a:
+                    raise SeqValidationError("Read 1 file finished before read 2")
+                if end_b:
+                    raise SeqValidationError("Read 2 file finished before read 1")
+                raise batch_a.error if not batch_a else batch_b.error
+        finally:
+            for worker in workers:
+                worker.stop()
+            print(file=sys.stderr)  # make sure we move to next line when progress finishes
+            if fq_fh_a is not None and not fq_fh_a.closed:
+                fq_fh_a.close()
+            if fq_fh_b is not None and not fq_fh_b.closed:
+                fq_fh_b.close()
+
+    def validate_interleaved_threaded(self):
+        """
+        Validates an interleaved fastq file.  Reading/decompression and
+        parsing/validation of records are handled by worker threads leaving
+        only the pair checks here.
+
+        Raises:
+            SeqValidationError
+        """
+        fq_fh = None
+        workers = []
+        try:
+            fq_fh = self.open_input(self.file_a)
+            prefetch = BlockPrefetcher(fq_fh, fastq_block.BLOCK_SIZE)
+            workers.append(prefetch)
+            reader = fastq_block.FastqBlockReader(prefetch, interleaved=True)
+            bar = self.setup_progress()
+
+            records = reader.read_records(BATCH_RECORDS)
+            self.fq_format = fastq_block.get_fq_format(records[0] if records else None)
+
+            worker = ThreadedRecordReader(reader, self.fq_format, self.file_a,
+                                          BATCH_RECORDS, pending=records)
+            workers.insert(0, worker)
+            while True:
+                batch = worker.get()
+                count = len(batch) // 2 * 2
+                invalid = self.first_invalid_pair(batch.records[0:count:2],
+                                                  batch.records[1:count:2])
+                if invalid is not None:
+                    count = invalid * 2 + 2
+                self.check_names(batch.records[0:count:2], batch.records[1:count:2])
+                if invalid is not None:
+                    self.alphabet_error(batch.records[invalid * 2], batch.records[invalid * 2 + 1])
+                self.block_pairs_done(batch.records[0:count:2], batch.records[1:count:2], bar)
+                if batch.error is not None:
+                    raise batch.error
+                if batch.finished:
+                    if count < len(batch):
+                        raise SeqValidationError("Fastq record at line %d of %s has no mate"
+                                                 % (reader.line_no, self.file_a))
+                    break
+        finally:
+            for worker in workers:
+                worker.stop()
+            print(file=sys.stderr)  # make sure we move to next line when progress finishes
+            if fq_fh is not None and not fq_fh.closed:
+                fq_fh.close()
+
+    def check_block_pairs(self, records_1, records_2, validate_record, bar=None):
+        """
+        Validates and compares pairs of records from the block engine, the
+        equivalent of FqClass.validate and check_pair for many pairs at once.
+        Writes the pairs to out_fh when set.
+
+        Only the pairs with a partner in records_2 are processed.  Two
+        RecordBatches are checked as whole batches, the records are only
+        extracted to find an error.
+
+        Raises:
+            SeqValidationError
+        """
+        pairs = min(len(records_1), len(records_2))
+        if (isinstance(records_1, record_batch.RecordBatch)
+                and isinstance(records_2, record_batch.RecordBatch)):
+            batch_1 = records_1[:pairs]
+            batch_2 = records_2[:pairs]
+            if (record_batch.pairs_valid(batch_1, batch_2, self.fq_format)
+                    and (not self.strict
+                         or (batch_1.alphabet_valid() and batch_2.alphabet_valid()))):
+                self.batch_pairs_done(batch_1, batch_2, bar)
+                return
+        records_1 = record_batch.as_records(records_1)
+        records_2 = record_batch.as_records(records_2)
+        invalid = self.first_invalid_pair(records_1, records_2)
+        if invalid is not None:  # errors in earlier pairs take precedence
+            pairs = invalid + 1
+        records_1 = records_1[:pairs]
+        records_2 = records_2[:pairs]
+        if not fastq_block.pairs_valid(records_1, records_2, self.fq_format):
+            self.check_record_pairs(records_1, records_2, validate_record)
+        if invalid is not None:
+            self.alphabet_error(records_1[invalid], records_2[invalid])
+        self.block_pairs_done(records_1, records_2, bar)
+
+    def check_record_pairs(self, records_1, records_2, validate_record):
+        """
+        Validates and compares pairs of records one at a time, used to find
+        the error in a batch that failed the bulk checks.
+
+        Raises:
+            SeqValidationError
+        """
+        file_a = self.file_a
+        file_b = self.file_b
+        for (record_1, record_2) in zip(records_1, records_2):
+            (name_1, member_1) = validate_record(record_1, file_a)
+            (name_2, member_2) = validate_record(record_2, file_b)
+            if name_1 != name_2 or member_1 != b'1' or member_2 != b'2':
+                self.pair_error(name_1.decode('utf-8', 'replace'),
+                                name_2.decode('utf-8', 'replace'),
+                                member_1.decode(), member_2.decode(),
+                                record_1[0], record_2[0])
+
+    def first_invalid_pair(self, records_1, records_2):
+        """
+        Finds the first pair with a character outside the strict alphabet
+
+        Returns:
+            int - index of the pair, None when all are valid or not strict
+        """
+        if not self.strict or (fastq_block.alphabet_valid(records_1)
+                               and fastq_block.alphabet_valid(records_2)):
+            return None
+        for (idx, pair) in enumerate(zip(records_1, records_2)):
+            if not fastq_block.alphabet_valid(pair):
+                return idx
+        return None
+
+    def alphabet_error(self, record_1, record_2):
+        """
+        Reports the first character outside the strict alphabet in a pair
+
+        Raises:
+            SeqValidationError
+        """
+        fastq_block.alphabet_error(record_1, self.file_a)
+        fastq_block.alphabet_error(record_2, self.file_b)
+
+    def check_names(self, records_1, records_2):
+        """
+        Compares the names and pair members of records already validated by
+        the worker threads, both lists must be the same length.
+
+        Raises:
+            SeqValidationError
+        """
+        if not fastq_block.pairs_named(fastq_block.joined_headers(records_1),
+                                       fastq_block.joined_headers(records_2),
+                                       len(records_1), self.fq_format):
+            self.check_record_pairs(records_1, records_2,
+                                    fastq_block.record_validator(self.fq_format))
+
+    def block_pairs_done(self, records_1, records_2, bar=None):
+        """
+        Handles pairs of records that have passed validation, assesses quality
+        range, writes to out_fh when set and updates the progress indicator.
+
+        Only the pairs with a partner in records_2 are processed.
+        """
+        pairs = min(len(records_1), len(records_2))
+        (counted, qc_pairs) = self.qc_window(pairs)
+        if qc_pairs > counted:
+            with self.stage('qual_range'):
+                self.quality.add(b''.join([record[4] for record in records_1[counted:qc_pairs]] +
+                                          [record[4] for record in records_2[counted:qc_pairs]]))
+        if self.stats is not None:
+            with self.stage('stats'):
+                self.stats.add_records(records_1[:pairs])
+                self.stats.add_records(records_2[:pairs])
+
+        if self.out_fh:
+            with self.stage('output'):
+                chunk = []
+                for (record_1, record_2) in zip(records_1, records_2):
+                    chunk.extend(record_1[1:])
+                    chunk.extend(record_2[1:])
+                chunk.append(b'')
+                self.write_output(b'\n'.join(chunk))
+        self.pairs_done(pairs, bar)
+
+    def batch_pairs_done(self, batch_1, batch_2, bar=None):
+        """
+        The equivalent of block_pairs_done for RecordBatches of the same length
+        """
+        pairs = len(batch_1)
+        (counted, qc_pairs) = self.qc_window(pairs)
+        if qc_pairs > counted:
+            with self.stage('qual_range'):
+                self.quality.add(batch_1[counted:qc_pairs].column(record_batch.QUAL)
+                                 + batch_2[counted:qc_pairs].column(record_batch.QUAL))
+        if self.stats is not None:
+            with self.stage('stats'):
+                for batch in (batch_1, batch_2):
+                    self.stats.add_reads(batch.fields(record_batch.HEADER),
+                                         batch.fields(record_batch.SEQ))
+
+        if self.out_fh:
+            with self.stage('output'):
+                self.write_output(b''.join([chunk for pair
+                                            in zip(batch_1.chunks(), batch_2.chunks())
+                                            for chunk in pair]))
+        self.pairs_done(pairs, bar)
+
+    def write_output(self, data):
+        """
+        Writes validated records to out_fh
+        """
+        if self.timer is not None:
+            self.timer.count('output_bytes', len(data))
+        self.out_fh.write(data)
+
+    def qc_window(self, pairs):
+        """
+        Which of the next pairs should be added to the quality histogram
+
+        Returns:
+            (counted, qc_pairs) - pairs from counted up to qc_pairs are needed
+        """
+        qc_pairs = pairs
+        if self.qc_reads != 0:
+            qc_pairs = min(max(self.qc_reads - self.pairs, 0), pairs)
+        return (min(max(self.qc_counted - self.pairs, 0), qc_pairs), qc_pairs)
+
+    def pairs_done(self, pairs, bar=None):
+        """
+        Counts validated pairs and updates the progress indicator
+        """
+        if bar and (self.pairs + pairs) // self.progress_pairs > self.pairs // self.progress_pairs:
+            bar.update((self.pairs + pairs) // self.progress_pairs)
+        self.pairs += pairs
+
+    def qual_range(self, read):
+        """
+        Adds the quality characters of a read to the histogram
+        """
+        self.quality.add(read.qual.encode('latin-1', 'replace'))
 
     def check_pair(self, read_1, read_2, check_qual):
         """
@@ -333,22 +1465,44 @@ class SeqValidator(object):
             self.qual_range(read_1)
             self.qual_range(read_2)
 
-        if read_1.name != read_2.name:
+        if read_1.name != read_2.name or read_1.pair_member != '1' or read_2.pair_member != '2':
+            self.pair_error(read_1.name, read_2.name, read_1.pair_member, read_2.pair_member,
+                            read_1.file_pos[0], read_2.file_pos[0])
+        if self.strict:
+            for (read, filename) in ((read_1, self.file_a), (read_2, self.file_b)):
+                fastq_block.alphabet_error((read.file_pos[0], None,
+                                            read.seq.encode('latin-1', 'replace'), None,
+                                            read.qual.encode('latin-1', 'replace')), filename)
+        if self.stats is not None:
+            self.stats.add_reads([read.seq_header.encode('latin-1', 'replace')
+                                  for read in (read_1, read_2)],
+                                 [read.seq.encode('latin-1', 'replace')
+                                  for read in (read_1, read_2)])
+
+    def pair_error(self, name_1, name_2, member_1, member_2, line_1, line_2):
+        """
+        Raises the error for the first check of a pair to fail, shared by all
+        engines so messages are identical.
+
+        Raises:
+            SeqValidationError
+        """
+        if name_1 != name_2:
             raise SeqValidationError("Fastq record name at line %d should be a \
                                      match to paired file line %s:\
                                      \n\t%s (%s)\n\t%s (%s)"
-                                     % (read_1.file_pos[0], read_2.file_pos[0],
-                                        read_1.name, self.file_a,
-                                        read_2.name, self.file_b))
-        if read_1.pair_member != '1':
+                                     % (line_1, line_2,
+                                        name_1, self.file_a,
+                                        name_2, self.file_b))
+        if member_1 != '1':
             raise SeqValidationError("Fastq record at line %d of %s should be \
                                      for first in pair, got '%s'"
-                                     % (read_1.file_pos[0], self.file_a, read_1.pair_member))
+                                     % (line_1, self.file_a, member_1))
 
-        if read_2.pair_member != '2':
+        if member_2 != '2':
             raise SeqValidationError("Fastq record at line %d of %s should be \
                                      for second in pair, got '%s'"
-                                     % (read_2.file_pos[0], self.file_b, read_2.pair_member))
+                                     % (line_2, self.file_b, member_2))
 
     def setup_progress(self):
         """
@@ -356,7 +1510,10 @@ class SeqValidator(object):
         """
         if self.progress_pairs == 0:
             return None
-        bar = progressbar.ProgressBar(max_value=progressbar.UnknownLength)
+        progressbar = import_module('progressbar')  # progressbar2, only when showing progress
+        # the width progressbar2 detects itself can cost an import of IPython
+        bar = progressbar.ProgressBar(max_value=progressbar.UnknownLength,
+                                      term_width=shutil.get_terminal_size().columns)
         print("Progress is %d's of record pairs" % (self.progress_pairs), file=sys.stderr)
         bar.update(0)
         return bar
@@ -364,5 +1521,6 @@ class SeqValidator(object):
 
 def get_fq_format(file_h):
     read = FastqRead(file_h, 0, None)
-    file_h.seek(0)  # reset file pointer to the begaining
+    if file_h.seekable():
+        file_h.seek(0)  # reset file pointer to the begaining
     return read.get_fq_format()
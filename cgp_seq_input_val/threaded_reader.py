@@ -0,0 +1,212 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Reading, parsing and validation of fastq records on worker threads
+"""
+
+import queue
+import threading
+
+from cgp_seq_input_val.fastq_block import record_validator, records_valid
+
+# batches buffered between each worker and the consumer, bounds memory use
+QUEUE_BATCHES = 4
+# seconds between checks for a stop request while the queue is full
+PUT_WAIT = 0.1
+
+
+def _put(work_queue, stop, item):
+    """
+    Puts item on a bounded queue, returns False if stop was set while waiting
+    for space
+    """
+    while not stop.is_set():
+        try:
+            work_queue.put(item, timeout=PUT_WAIT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _stop_worker(thread, work_queue, stop):
+    """
+    Signals a worker to stop, draining its queue so it can't block on put
+    """
+    stop.set()
+    while thread.is_alive():
+        try:
+            work_queue.get(timeout=PUT_WAIT)
+        except queue.Empty:
+            pass
+    thread.join()
+
+
+class ValidatedBatch(object):
+    """
+    Validated records passed from a worker to the consumer.
+
+    Attributes:
+        records - record tuples from FastqBlockReader
+        error - exception raised by the record following the last in records
+        finished - no records follow those in records
+    """
+    __slots__ = ('records', 'error', 'finished')
+
+    def __init__(self, records, error=None, finished=False):
+        self.records = records
+        self.error = error
+        self.finished = finished
+
+    def __len__(self):
+        return len(self.records)
+
+    def terminal(self):
+        """True when no further batches will follow this one"""
+        return self.finished or self.error is not None
+
+    def consume(self, count):
+        """Drops the first count records"""
+        self.records = self.records[count:]
+
+
+class BlockPrefetcher(object):
+    """
+    Reads blocks from a file handle on a worker thread so that I/O and
+    decompression (which release the GIL) overlap with parsing.  Provides the
+    read() used by FastqBlockReader.
+
+    Inputs:
+        handle: binary file handle
+        block_size: bytes requested from handle on each read
+    """
+    def __init__(self, handle, block_size):
+        self.handle = handle
+        self.block_size = block_size
+        self._queue = queue.Queue(QUEUE_BATCHES)
+        self._stop = threading.Event()
+        self._done = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                block = self.handle.read(self.block_size)
+                if not _put(self._queue, self._stop, block) or not block:
+                    return
+        except Exception as error:  # raised by read() in the consuming thread
+            _put(self._queue, self._stop, error)
+
+    def read(self, size=-1):
+        """
+        Returns the next block regardless of size, b'' at end of file
+        """
+        if self._done:
+            return b''
+        block = self._queue.get()
+        if isinstance(block, Exception):
+            self._done = True
+            raise block
+        if not block:
+            self._done = True
+        return block
+
+    def stop(self):
+        """
+        Stops the worker and waits for it to exit, safe to call at any time
+        """
+        _stop_worker(self._thread, self._queue, self._stop)
+
+
+class ThreadedRecordReader(object):
+    """
+    Reads records from a FastqBlockReader and validates them on a worker
+    thread, the results are returned by get() in order via a bounded queue.
+
+    The worker stops at the first error, which is returned in place of the
+    record that caused it so the consumer can report errors in file order.
+    Batches are checked in bulk (fastq_block.records_valid), only a failing
+    batch is validated record by record.
+
+    Inputs:
+        reader: FastqBlockReader, only accessed by the worker once started
+        fq_format: FastqFormat of the file
+        filename: used in error messages
+        batch_records: records per batch, must be even for interleaved data
+        pending: records already read from reader (e.g. for format detection)
+    """
+    def __init__(self, reader, fq_format, filename, batch_records, pending=None):
+        self.reader = reader
+        self.fq_format = fq_format
+        self.filename = filename
+        self.batch_records = batch_records
+        self._pending = pending
+        self._queue = queue.Queue(QUEUE_BATCHES)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        validate_record = record_validator(self.fq_format)
+        records = self._pending
+        self._pending = None
+        valid = 0
+        try:
+            while not self._stop.is_set():
+                valid = 0
+                if records is None:
+                    records = []  # nothing to return if the read fails
+                    records = self.reader.read_records(self.batch_records)
+                if not records_valid(records, self.fq_format):
+                    for record in records:
+                        validate_record(record, self.filename)
+                        valid += 1
+                batch = ValidatedBatch(records, finished=self.reader.finished)
+                if not _put(self._queue, self._stop, batch) or batch.finished:
+                    return
+                records = None
+        except Exception as error:  # passed to the consumer to raise in order
+            batch = ValidatedBatch(records[:valid], error=error)
+            _put(self._queue, self._stop, batch)
+
+    def get(self):
+        """
+        Returns the next ValidatedBatch, blocks until available
+        """
+        return self._queue.get()
+
+    def stop(self):
+        """
+        Stops the worker and waits for it to exit, safe to call at any time
+        """
+        _stop_worker(self._thread, self._queue, self._stop)
@@ -0,0 +1,203 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Backends for writing (optionally compressed) sequence files
+"""
+
+import bz2
+import io
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from importlib import import_module
+
+from cgp_seq_input_val import bgzf
+from cgp_seq_input_val.constants import COMPRESS_LEVEL, WRITE_BACKENDS
+from cgp_seq_input_val.error_classes import BackendError
+from cgp_seq_input_val.read_backend import compression_type
+from cgp_seq_input_val.digest import DigestWriter
+
+# fastest first, 'auto' selects the first available, 'python' is a threaded BGZF writer
+BACKEND_ORDER = {'gzip': ('bgzip', 'python'),
+                 'bz2': ('python',),
+                 None: ('python',)}
+BACKENDS = WRITE_BACKENDS
+
+# command to compress stdin to stdout
+PIPED_COMMANDS = {'bgzip': ['bgzip', '-c', '-l', '{level}', '-@', '{threads}'],
+                  'pigz': ['pigz', '-c', '-{level}', '-p', '{threads}']}
+
+WRITE_BUFFER = 4 * 1024 * 1024
+
+
+def backend_available(backend):
+    """
+    Checks the executable required by a backend can be found
+    """
+    return backend == 'python' or shutil.which(backend) is not None
+
+
+def select_backend(compression, requested='auto'):
+    """
+    Resolves the backend to use for a compression type.  Uncompressed output
+    is always written by 'python'.
+
+    Raises:
+        BackendError - requested backend unavailable or unsuitable
+    """
+    if compression is None:
+        return 'python'
+    if requested == 'auto':
+        for backend in BACKEND_ORDER[compression]:
+            if backend_available(backend):
+                return backend
+    if requested != 'python' and compression != 'gzip':
+        raise BackendError("Backend '%s' can not write %s compressed output"
+                           % (requested, compression))
+    if not backend_available(requested):
+        raise BackendError("Backend '%s' is not available on this system" % requested)
+    return requested
+
+
+def open_output(filename, backend='auto', threads=1, text=False, digester=None,
+                level=COMPRESS_LEVEL):
+    """
+    Opens a sequence file for writing, compressed according to the file
+    extension.  Data is buffered in large pieces and compression runs on
+    other threads or in an external program.
+
+    Args:
+        filename - file to write
+        backend - see BACKENDS
+        threads - compression threads
+        text - return a text handle instead of binary
+        digester - optional, digest.Digester given the bytes written to the file
+        level - optional, gzip compression level 1-9 [COMPRESS_LEVEL]
+
+    Returns:
+        file handle
+
+    Raises:
+        BackendError - requested backend unavailable or unsuitable
+    """
+    compression = compression_type(filename)
+    backend = select_backend(compression, backend)
+    raw = None  # file handle, passing what is written to digester
+    if digester is not None and backend not in PIPED_COMMANDS:
+        raw = DigestWriter(open(filename, 'wb'), digester)
+    if compression is None:
+        if raw is None:
+            handle = open(filename, 'wb', buffering=WRITE_BUFFER)
+        else:
+            handle = io.BufferedWriter(raw, WRITE_BUFFER)
+    elif backend in PIPED_COMMANDS:
+        command = [arg.format(threads=threads, level=level)
+                   for arg in PIPED_COMMANDS[backend]]
+        handle = io.BufferedWriter(PipedWriter(command, filename, digester), WRITE_BUFFER)
+    elif compression == 'gzip':
+        handle = io.BufferedWriter(bgzf.BgzfWriter(raw or open(filename, 'wb'), level, threads),
+                                   WRITE_BUFFER)
+    elif raw is not None:
+        handle = bz2.BZ2File(raw, 'wb')
+    else:
+        xopen = import_module('xopen')  # only needed here, slow to import
+        handle = xopen.xopen(filename, 'wb', threads=threads)
+    if text:
+        return io.TextIOWrapper(handle)
+    return handle
+
+
+class PipedWriter(io.RawIOBase):
+    """
+    Raw writer to the stdin of an external compression program, its stdout
+    goes to the file.
+
+    Raises BackendError on close if the program failed.
+
+    Args:
+        command - program and arguments
+        filename - file to write
+        digester - optional, digest.Digester, the program's stdout is then
+                   copied to the file on a thread
+    """
+    def __init__(self, command, filename, digester=None):
+        self.name = filename
+        self.command = command
+        self._stderr = tempfile.TemporaryFile()
+        self._drain = None
+        if digester is None:
+            with open(filename, 'wb') as out_fh:
+                self._proc = subprocess.Popen(command,
+                                              stdin=subprocess.PIPE,
+                                              stdout=out_fh,
+                                              stderr=self._stderr)
+        else:
+            self._proc = subprocess.Popen(command,
+                                          stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE,
+                                          stderr=self._stderr)
+            self._drain = threading.Thread(target=self._copy,
+                                           args=(DigestWriter(open(filename, 'wb'), digester),),
+                                           daemon=True)
+            self._drain.start()
+
+    def _copy(self, out_fh):
+        with out_fh:
+            data = self._proc.stdout.read(WRITE_BUFFER)
+            while data:
+                out_fh.write(data)
+                data = self._proc.stdout.read(WRITE_BUFFER)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._proc.stdin.write(data)
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self._proc.stdin.close()
+        if self._drain is not None:
+            self._drain.join()
+            self._proc.stdout.close()
+        retcode = self._proc.wait()
+        self._stderr.seek(0)
+        message = self._stderr.read().decode('utf-8', 'replace').strip()
+        self._stderr.close()
+        if retcode != 0:
+            raise BackendError("'%s' failed (exit %d) writing %s: %s"
+                               % (self.command[0], retcode, self.name, message))
@@ -9,8 +9,8 @@ config = {
     'url': 'https://github.com/cancerit/cgp_seq_input_val',
     'download_url': '',
     'author_email': 'cgphelp@sanger.ac.uk',
-    'version': '1.5.5',
-    'python_requires': '>= 3.6',
+    'version': '1.6.0',
+    'python_requires': '>= 3.9',
     'setup_requires': ['pytest'],
     'install_requires': ['progressbar2', 'xlrd', 'xopen'],
     'packages': ['cgp_seq_input_val'],
@@ -0,0 +1,191 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Benchmarks of man-valid over synthetic manifests (manifest_generator) of
+increasing size, timing each stage of Manifest.validate, --checkfiles and
+writing the output, each size in a fresh process so its peak memory is its
+own:
+
+    python -m tests.benchmarks.bench_manifest -o new.json
+    python -m tests.benchmarks.bench_manifest -o new.json --compare old.json
+
+Manifests (and their files) are generated once into the data directory.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from cgp_seq_input_val.file_meta import FileValidationError
+from cgp_seq_input_val.manifest import Body, Header, Manifest, ManifestReader, ValidationError
+from tests.benchmarks import manifest_generator
+from tests.benchmarks.common import THRESHOLD, environment, run_in_process, write_results
+
+ROWS = (1000, 10000, 100000, 1000000)
+# --checkfiles needs every file to exist, not created for larger manifests
+CHECK_FILES_ROWS = 100000
+REPEATS = 1
+
+
+def manifest_file(data_dir, rows, create_files=False, problem=None):
+    """
+    Generates (or reuses) a manifest
+
+    Returns:
+        str - the manifest tsv
+    """
+    name = 'rows_%d%s%s' % (rows, '_files' if create_files else '',
+                            '_' + problem if problem else '')
+    filename = os.path.join(data_dir, name, 'manifest.tsv')
+    if not os.path.exists(filename):
+        # renamed once complete so an interrupted run is never reused
+        manifest_generator.write_manifest(filename + '.tmp', rows, problem=problem,
+                                          create_files=create_files)
+        os.replace(filename + '.tmp', filename)
+    return filename
+
+
+def _validate(filename, check_files, outdir):
+    stages = {}
+    result = {'stages': stages}
+    clock = time.perf_counter()
+
+    def lap(stage):
+        nonlocal clock
+        now = time.perf_counter()
+        stages[stage] = now - clock
+        clock = now
+
+    try:
+        reader = ManifestReader(filename)
+        header = Header(reader)
+        lap('header_parse')
+        config = header.get_config()
+        lap('config')
+        header.validate(config['header'])
+        lap('header_validate')
+        body = Body(reader, config['body'])
+        lap('body_parse')
+        body.validate(config['body'])
+        lap('body_validate')
+        if check_files:
+            body.file_tests()
+            lap('check_files')
+        manifest = Manifest(filename)
+        (manifest.header, manifest.config, manifest.body) = (header, config, body)
+        manifest.write(outdir)
+        lap('write')
+    except (ValidationError, FileValidationError) as err:
+        result['invalid'] = ' '.join(str(err).split())
+    result['seconds'] = sum(stages.values())
+    return result
+
+
+def run_size(data_dir, rows, check_files_rows=CHECK_FILES_ROWS, repeats=REPEATS, problem=None):
+    """
+    Benchmarks validation of a manifest, stage times are those of the fastest repeat
+
+    Args:
+        data_dir - directory for generated manifests
+        rows - body rows
+        check_files_rows - optional, largest manifest to also run --checkfiles on
+        repeats - optional, runs of the size
+        problem - optional, from manifest_generator.PROBLEMS, on the last row
+
+    Returns:
+        dict - the result for the json report
+    """
+    check_files = rows <= check_files_rows
+    filename = manifest_file(data_dir, rows, check_files, problem)
+    name = 'rows_%d%s' % (rows, '_' + problem if problem else '')
+    result = {'name': name, 'rows': rows, 'problem': problem, 'check_files': check_files,
+              'input_bytes': os.path.getsize(filename)}
+    runs = []
+    with tempfile.TemporaryDirectory() as outdir:
+        for _ in range(repeats):
+            run = run_in_process(_validate, filename, check_files, outdir)
+            if 'error' in run:
+                result['error'] = run['error']
+                return result
+            runs.append(run)
+    fastest = min(runs, key=lambda run: run['seconds'])
+    result.update({'seconds': [round(run['seconds'], 3) for run in runs],
+                   'best_seconds': round(fastest['seconds'], 3),
+                   'rows_per_second': round(rows / fastest['seconds']),
+                   'stages': dict((stage, round(seconds, 3))
+                                  for (stage, seconds) in fastest['stages'].items()),
+                   'peak_rss_bytes': max(run['peak_rss_bytes'] for run in runs)})
+    if 'invalid' in fastest:
+        result['invalid'] = fastest['invalid']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark manifest validation')
+    parser.add_argument('-o', '--output', required=True, help='Write results json here')
+    parser.add_argument('-d', '--data-dir',
+                        default=os.path.join(tempfile.gettempdir(),
+                                             'cgp_seq_input_val_bench_manifest'),
+                        help='Directory for generated manifests, reused between runs')
+    parser.add_argument('-r', '--rows', type=int, action='append',
+                        help='Body rows, can be repeated [%s]' % ', '.join(map(str, ROWS)))
+    parser.add_argument('-c', '--check-files-rows', type=int, default=CHECK_FILES_ROWS,
+                        help='Largest manifest to time --checkfiles on [%d]' % CHECK_FILES_ROWS)
+    parser.add_argument('-n', '--repeats', type=int, default=REPEATS,
+                        help='Runs of each size [%d]' % REPEATS)
+    parser.add_argument('-p', '--problem', action='append', default=[],
+                        choices=manifest_generator.PROBLEMS,
+                        help='Also time manifests failing with this problem on the last row')
+    parser.add_argument('--compare', help='Results json of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='Fraction slower than --compare reported as a regression [%.2f]'
+                        % THRESHOLD)
+    args = parser.parse_args()
+
+    results = dict(environment(), repeats=args.repeats, results=[])
+    for rows in args.rows or ROWS:
+        for problem in [None] + args.problem:
+            result = run_size(args.data_dir, rows, args.check_files_rows, args.repeats, problem)
+            results['results'].append(result)
+            if 'error' in result:
+                print('%-32s ERROR %s' % (result['name'], result['error']), file=sys.stderr)
+            else:
+                print('%-32s %8.3fs %10d rows/s %6d MB' % (
+                    result['name'], result['best_seconds'], result['rows_per_second'],
+                    result['peak_rss_bytes'] >> 20), file=sys.stderr)
+    write_results(results, args.output, args.compare, args.threshold)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Benchmarks of SeqValidator over synthetic fastq (fastq_generator), each
+case runs in a fresh process so its peak memory is its own.  Results are
+written as json and can be compared with those of another version:
+
+    python -m tests.benchmarks.bench_seq_validator -o new.json
+    python -m tests.benchmarks.bench_seq_validator -o new.json --compare old.json
+
+Files are generated once into the data directory and reused.
+"""
+
+import argparse
+import fnmatch
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from cgp_seq_input_val.seq_validator import PERFORMANCE_ENGINES, SeqValidator
+from tests.benchmarks import fastq_generator
+from tests.benchmarks.common import THRESHOLD, environment, run_in_process, write_results
+
+# data - fastq_generator.generate arguments, options - SeqValidator arguments,
+# scale - fraction of the suite's pairs to generate
+Case = namedtuple('Case', 'name data options scale')
+
+CASES = (
+    Case('paired_plain_block', {}, {'engine': 'block'}, 1),
+    Case('paired_gzip_block', {'compression': 'gzip'}, {'engine': 'block'}, 1),
+    Case('paired_bgzip_block', {'compression': 'bgzip'}, {'engine': 'block'}, 1),
+    Case('paired_bz2_block', {'compression': 'bz2'}, {'engine': 'block'}, 0.25),
+    Case('paired_gzip_line', {'compression': 'gzip'}, {'engine': 'line'}, 0.25),
+    Case('paired_gzip_batch', {'compression': 'gzip'}, {'engine': 'batch'}, 1),
+    Case('paired_gzip_threaded', {'compression': 'gzip'}, {'engine': 'threaded'}, 1),
+    Case('paired_gzip_stats_strict', {'compression': 'gzip'},
+         {'engine': 'block', 'stats': True, 'strict': True}, 1),
+    Case('interleaved_bgzip_parallel', {'layout': 'interleaved', 'compression': 'bgzip'},
+         {'engine': 'parallel'}, 1),
+    Case('casava_interleaved_gzip_block',
+         {'fmt': 'casava', 'layout': 'interleaved', 'compression': 'gzip'},
+         {'engine': 'block'}, 1),
+    Case('binned_gzip_block', {'compression': 'gzip', 'quality': 'binned'},
+         {'engine': 'block'}, 1),
+    Case('long_multiline_gzip_block',
+         {'compression': 'gzip', 'read_length': 20000, 'min_length': 2000, 'wrap': 80},
+         {'engine': 'block'}, 0.01),
+)
+PAIRS = 200000
+REPEATS = 3
+
+
+def select_cases(patterns):
+    """
+    Cases with names matching any of the patterns (fnmatch), all without patterns
+    """
+    if not patterns:
+        return list(CASES)
+    return [case for case in CASES
+            if any(fnmatch.fnmatchcase(case.name, pattern) for pattern in patterns)]
+
+
+def case_files(case, data_dir, pairs):
+    """
+    Generates (or reuses) the input of a case
+
+    Returns:
+        list - the fastq files
+    """
+    return fastq_generator.generate(data_dir, max(1, int(pairs * case.scale)), reuse=True,
+                                    **case.data)
+
+
+def _validate(files, options):
+    options = dict(options, performance=options.get('engine') in PERFORMANCE_ENGINES)
+    start = time.perf_counter()
+    validator = SeqValidator(files[0], 0, file_b=files[1] if len(files) > 1 else None,
+                             progress_pairs=0, **options)
+    validator.validate()
+    seconds = time.perf_counter() - start
+    summary = validator.summary()
+    return {'seconds': seconds, 'pairs': summary['pairs'],
+            'read_backend': summary['read_backend'],
+            'performance': summary.get('performance')}
+
+
+def run_case(case, data_dir, pairs=PAIRS, repeats=REPEATS):
+    """
+    Benchmarks a case, the stage times are those of the fastest repeat
+
+    Returns:
+        dict - the result of the case for the json report
+    """
+    files = case_files(case, data_dir, pairs)
+    input_bytes = sum(os.path.getsize(filename) for filename in files)
+    result = {'name': case.name, 'data': dict(case.data, pairs=max(1, int(pairs * case.scale))),
+              'options': case.options, 'input_bytes': input_bytes}
+    runs = []
+    for _ in range(repeats):
+        run = run_in_process(_validate, files, case.options)
+        if 'error' in run:
+            result['error'] = run['error']
+            return result
+        runs.append(run)
+    fastest = min(runs, key=lambda run: run['seconds'])
+    seconds = fastest['seconds']
+    result.update({'seconds': [round(run['seconds'], 3) for run in runs],
+                   'best_seconds': round(seconds, 3),
+                   'median_seconds': round(statistics.median(run['seconds'] for run in runs), 3),
+                   'pairs': fastest['pairs'],
+                   'pairs_per_second': round(fastest['pairs'] / seconds),
+                   'input_mb_per_second': round(input_bytes / seconds / 1e6, 2),
+                   'peak_rss_bytes': max(run['peak_rss_bytes'] for run in runs),
+                   'read_backend': fastest['read_backend'],
+                   'performance': fastest['performance']})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sequence validation')
+    parser.add_argument('-o', '--output', required=True, help='Write results json here')
+    parser.add_argument('-d', '--data-dir',
+                        default=os.path.join(tempfile.gettempdir(), 'cgp_seq_input_val_bench'),
+                        help='Directory for generated fastq, reused between runs')
+    parser.add_argument('-p', '--pairs', type=int, default=PAIRS,
+                        help='Read pairs of a full size case [%d]' % PAIRS)
+    parser.add_argument('-r', '--repeats', type=int, default=REPEATS,
+                        help='Runs of each case [%d]' % REPEATS)
+    parser.add_argument('-c', '--case', action='append',
+                        help='Only run cases matching (fnmatch), can be repeated: %s'
+                        % ', '.join(case.name for case in CASES))
+    parser.add_argument('--compare', help='Results json of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='Fraction slower than --compare reported as a regression [%.2f]'
+                        % THRESHOLD)
+    args = parser.parse_args()
+
+    results = dict(environment(), pairs=args.pairs, repeats=args.repeats, results=[])
+    for case in select_cases(args.case):
+        result = run_case(case, args.data_dir, args.pairs, args.repeats)
+        results['results'].append(result)
+        if 'error' in result:
+            print('%-32s ERROR %s' % (case.name, result['error']), file=sys.stderr)
+        else:
+            print('%-32s %8.3fs %10d pairs/s %8.1f MB/s %6d MB' % (
+                case.name, result['best_seconds'], result['pairs_per_second'],
+                result['input_mb_per_second'], result['peak_rss_bytes'] >> 20), file=sys.stderr)
+    write_results(results, args.output, args.compare, args.threshold)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Benchmarks of the start up time of cgpSeqInputVal, each case is a new
+interpreter running the command line on little or no input so the time is
+dominated by imports:
+
+    python -m tests.benchmarks.bench_startup -o new.json --compare old.json
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.benchmarks.common import THRESHOLD, environment, write_results
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data')
+# runs the command line with the arguments that follow
+MAIN = ['-c', 'import sys; from cgp_seq_input_val.command_line import main; sys.exit(main())']
+# name, interpreter arguments, '{tmp}' is replaced by a temporary directory
+CASES = (
+    ('interpreter', ['-c', 'pass']),
+    ('import', ['-c', 'import cgp_seq_input_val.command_line']),
+    ('version', MAIN + ['--version']),
+    ('help', MAIN + ['seq-valid', '--help']),
+    ('man_valid', MAIN + ['man-valid', '-i',
+                          os.path.join(DATA, 'file_set_good', 'files_good.tsv'), '-o', '{tmp}']),
+    ('seq_valid', MAIN + ['seq-valid', '-i',
+                          os.path.join(DATA, 'fastq_read', 'good_read_i.fq.gz'),
+                          '--no-cache', '-r', os.devnull]),
+)
+REPEATS = 20
+
+
+def run_case(name, arguments, repeats=REPEATS):
+    """
+    Times a case, raises CalledProcessError when the command fails
+
+    Returns:
+        dict - the result of the case for the json report
+    """
+    seconds = []
+    for _ in range(repeats):
+        tmp = tempfile.mkdtemp()
+        try:
+            command = [sys.executable] + [arg.replace('{tmp}', tmp) for arg in arguments]
+            start = time.perf_counter()
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+            seconds.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(tmp)
+    return {'name': name,
+            'seconds': [round(value, 4) for value in seconds],
+            'best_seconds': round(min(seconds), 4),
+            'median_seconds': round(statistics.median(seconds), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark command line start up')
+    parser.add_argument('-o', '--output', required=True, help='Write results json here')
+    parser.add_argument('-r', '--repeats', type=int, default=REPEATS,
+                        help='Runs of each case [%d]' % REPEATS)
+    parser.add_argument('--compare', help='Results json of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='Fraction slower than --compare reported as a regression [%.2f]'
+                        % THRESHOLD)
+    args = parser.parse_args()
+
+    results = dict(environment(), repeats=args.repeats, results=[])
+    for (name, arguments) in CASES:
+        try:
+            result = run_case(name, arguments, args.repeats)
+        except subprocess.CalledProcessError as err:
+            result = {'name': name, 'error': str(err)}
+            print('%-32s ERROR %s' % (name, result['error']), file=sys.stderr)
+        else:
+            print('%-32s %8.3fs %8.3fs' % (name, result['best_seconds'],
+                                           result['median_seconds']), file=sys.stderr)
+        results['results'].append(result)
+    write_results(results, args.output, args.compare, args.threshold)
+
+
+if __name__ == '__main__':
+    main()
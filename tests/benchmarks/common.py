@@ -0,0 +1,146 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Shared parts of the benchmark suites, running a function in a fresh
+process, describing the environment and comparing result sets.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+from cgp_seq_input_val.constants import version
+from cgp_seq_input_val.resources import ResourceUsage
+
+# slower by more than this fraction is reported as a regression
+THRESHOLD = 0.1
+
+
+def _call(function, args, conn):
+    usage = ResourceUsage()
+    sys.stderr = open(os.devnull, 'w')  # the end of progress is printed even when disabled
+    try:
+        result = function(*args)
+        result['peak_rss_bytes'] = usage.report()['peak_rss_bytes']
+        conn.send(result)
+    except Exception as err:
+        conn.send({'error': '%s: %s' % (type(err).__name__, err)})
+    finally:
+        conn.close()
+
+
+def run_in_process(function, *args):
+    """
+    Calls a function in a new (spawned) process so the peak memory is that
+    of the call alone
+
+    Args:
+        function - module level function returning a dict
+        args - arguments to pass
+
+    Returns:
+        dict - result of the function with peak_rss_bytes of the process, or
+               error when it raised
+    """
+    context = multiprocessing.get_context('spawn')
+    (receiver, sender) = context.Pipe(duplex=False)
+    process = context.Process(target=_call, args=(function, args, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {'error': 'benchmark process died'}
+    process.join()
+    return result
+
+
+def environment():
+    """
+    Describes the version and machine the results were taken on
+    """
+    return {'version': version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """
+    Compares the best time of the cases in two result sets
+
+    Args:
+        baseline - results (as written by a suite) of the reference version
+        current - results to check
+        threshold - optional, fraction slower reported as a regression [THRESHOLD]
+
+    Returns:
+        list - (name, baseline seconds, current seconds, ratio, regressed) for
+               each case present and without error in both
+    """
+    before = dict((result['name'], result) for result in baseline['results'])
+    rows = []
+    for result in current['results']:
+        previous = before.get(result['name'])
+        if previous is None or 'error' in result or 'error' in previous:
+            continue
+        ratio = result['best_seconds'] / previous['best_seconds']
+        rows.append((result['name'], previous['best_seconds'], result['best_seconds'],
+                     round(ratio, 3), ratio > 1 + threshold))
+    return rows
+
+
+def write_results(results, output, baseline_file=None, threshold=THRESHOLD):
+    """
+    Writes results as json and, given a previous result set, prints the
+    comparison exiting with an error when any case regressed
+    """
+    with open(output, 'w') as fp:
+        json.dump(results, fp, sort_keys=True, indent=4)
+    if baseline_file is None:
+        return
+    with open(baseline_file, 'r') as fp:
+        baseline = json.load(fp)
+    print('\nCompared with %s (%s)' % (baseline_file, baseline['version']), file=sys.stderr)
+    regressions = 0
+    for (name, before, after, ratio, regressed) in compare(baseline, results, threshold):
+        regressions += regressed
+        flag = '  REGRESSION' if regressed else ''
+        print('%-32s %8.3fs %8.3fs %6.2fx%s' % (name, before, after, ratio, flag),
+              file=sys.stderr)
+    if regressions:
+        sys.exit('%d case(s) slower than %s' % (regressions, baseline_file))
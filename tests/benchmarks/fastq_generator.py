@@ -0,0 +1,248 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Deterministic synthetic fastq for benchmarks and tests.  The same arguments
+always produce the same bytes, the records are built from pools of random
+bases and qualities drawn once per file set so generation is cheap.
+
+Run as a script to write a file set:
+
+    python -m tests.benchmarks.fastq_generator -o /tmp/synthetic -p 1000000 -c gzip
+"""
+
+import argparse
+import bz2
+import gzip
+import os
+import random
+
+from cgp_seq_input_val.bgzf import BgzfWriter
+from cgp_seq_input_val.quality import BINNING_SCHEMES
+
+FORMATS = ('illumina', 'casava')
+LAYOUTS = ('paired', 'interleaved')
+COMPRESSIONS = ('none', 'gzip', 'bgzip', 'bz2')
+EXTENSIONS = {'none': '', 'gzip': '.gz', 'bgzip': '.gz', 'bz2': '.bz2'}
+# full - Illumina 1.8+ range, binned - the 4 level NovaSeq (RTA3) scheme
+QUALITIES = {'full': bytes(range(ord('#'), ord('J') + 1)),
+             'binned': bytes(phred + 33 for phred in BINNING_SCHEMES[0][1])}
+POOL_BYTES = 1 << 20  # random bases/qualities each record is sliced from
+CHUNK_PAIRS = 10000  # pairs joined before each write
+TILE_READS = 100000
+
+
+def read_name(fmt, idx, mate):
+    """
+    Header line of a read, Illumina ('@name/1') or Casava 1.8 ('@name 1:N:0:index')
+
+    Args:
+        fmt - from FORMATS
+        idx - read pair number, makes the name unique
+        mate - 1 or 2
+    """
+    tile = 1101 + idx // TILE_READS
+    (x_pos, y_pos) = divmod(idx % TILE_READS, 1000)
+    if fmt == 'illumina':
+        return b'@SYN_1:1:%d:%d:%d#0/%d' % (tile, x_pos, y_pos, mate)
+    flag = b'Y' if idx % 97 == 0 else b'N'
+    return b'@SYN:1:FC0001:1:%d:%d:%d %d:%s:0:ACGTAC' % (tile, x_pos, y_pos, mate, flag)
+
+
+def _wrapped(data, wrap):
+    if not wrap:
+        return data + b'\n'
+    return b''.join(data[i:i + wrap] + b'\n' for i in range(0, len(data), wrap))
+
+
+class RecordSource(object):
+    """
+    Generates the records of each pair
+
+    Args:
+        read_length - longest read
+        min_length - optional, read lengths are uniform between this and
+                     read_length [read_length]
+        fmt - optional, from FORMATS [illumina]
+        wrap - optional, bases per sequence/quality line, 0 for single line records [0]
+        quality - optional, from QUALITIES [full]
+        seed - optional, random seed [1]
+    """
+    def __init__(self, read_length, min_length=None, fmt='illumina', wrap=0, quality='full',
+                 seed=1):
+        if fmt not in FORMATS:
+            raise ValueError("fmt must be one of: %s" % ', '.join(FORMATS))
+        if quality not in QUALITIES:
+            raise ValueError("quality must be one of: %s" % ', '.join(QUALITIES))
+        self.read_length = read_length
+        self.min_length = read_length if min_length is None else min_length
+        self.fmt = fmt
+        self.wrap = wrap
+        self._rng = random.Random(seed)
+        pool = max(POOL_BYTES, read_length * 2)
+        bases = bytearray(self._rng.choices(b'ACGT', k=pool))
+        bases[::1009] = b'N' * len(bases[::1009])  # a sprinkling of uncalled bases
+        self._bases = bytes(bases)
+        self._quals = bytes(self._rng.choices(QUALITIES[quality], k=pool))
+
+    def record(self, idx, mate):
+        """
+        Returns:
+            bytes - a complete record
+        """
+        rng = self._rng
+        length = rng.randint(self.min_length, self.read_length)
+        start = rng.randrange(len(self._bases) - length)
+        qstart = rng.randrange(len(self._quals) - length)
+        return b''.join((read_name(self.fmt, idx, mate), b'\n',
+                         _wrapped(self._bases[start:start + length], self.wrap), b'+\n',
+                         _wrapped(self._quals[qstart:qstart + length], self.wrap)))
+
+    def pairs(self, count):
+        """
+        Yields:
+            tuple - (read 1 record, read 2 record) for each pair
+        """
+        for idx in range(count):
+            yield (self.record(idx, 1), self.record(idx, 2))
+
+
+def open_compressed(raw, compression, name=''):
+    """
+    Wraps a binary handle to write with a compression from COMPRESSIONS,
+    the handle must be closed after the returned one
+
+    Args:
+        raw - binary handle to write to
+        compression - from COMPRESSIONS
+        name - optional, file name recorded in a gzip header ['']
+    """
+    if compression == 'gzip':  # no timestamp so the output is reproducible
+        return gzip.GzipFile(name, 'wb', compresslevel=6, fileobj=raw, mtime=0)
+    if compression == 'bgzip':
+        return BgzfWriter(raw, threads=os.cpu_count())
+    if compression == 'bz2':
+        return bz2.BZ2File(raw, 'wb')
+    return raw
+
+
+def file_names(directory, pairs, read_length, min_length=None, fmt='illumina', layout='paired',
+               compression='none', wrap=0, quality='full', seed=1):
+    """
+    Names of the files generate writes, these describe every argument so a
+    file set can be reused
+
+    Returns:
+        list - one file when interleaved, otherwise read 1 and read 2
+    """
+    if layout not in LAYOUTS:
+        raise ValueError("layout must be one of: %s" % ', '.join(LAYOUTS))
+    if compression not in COMPRESSIONS:
+        raise ValueError("compression must be one of: %s" % ', '.join(COMPRESSIONS))
+    lengths = str(read_length) if min_length is None else '%d-%d' % (min_length, read_length)
+    base = '%s_%s_%dx%s_w%d_%s_s%d' % (fmt, compression, pairs, lengths, wrap, quality, seed)
+    ext = '.fq' + EXTENSIONS[compression]
+    if layout == 'interleaved':
+        return [os.path.join(directory, base + '_i' + ext)]
+    return [os.path.join(directory, base + '_%d' % mate + ext) for mate in (1, 2)]
+
+
+def generate(directory, pairs, read_length=150, min_length=None, fmt='illumina',
+             layout='paired', compression='none', wrap=0, quality='full', seed=1,
+             reuse=False):
+    """
+    Writes a synthetic file set, arguments as RecordSource and file_names
+
+    Args:
+        reuse - optional, don't rewrite files that already exist [False]
+
+    Returns:
+        list - the files written, as file_names
+    """
+    filenames = file_names(directory, pairs, read_length, min_length, fmt, layout, compression,
+                           wrap, quality, seed)
+    if reuse and all(os.path.exists(filename) for filename in filenames):
+        return filenames
+    os.makedirs(directory, exist_ok=True)
+    source = RecordSource(read_length, min_length, fmt, wrap, quality, seed)
+    # written to a temporary name so an interrupted run is never reused
+    raws = [open(filename + '.tmp', 'wb') for filename in filenames]
+    try:
+        handles = [open_compressed(raw, compression, os.path.basename(filename[:-3]))
+                   for (raw, filename) in zip(raws, filenames)]
+        chunk = []
+        for pair in source.pairs(pairs):
+            chunk.append(pair)
+            if len(chunk) == CHUNK_PAIRS:
+                _write_chunk(handles, chunk)
+                chunk = []
+        _write_chunk(handles, chunk)
+        for handle in handles:
+            handle.close()
+    finally:
+        for raw in raws:
+            raw.close()
+    for filename in filenames:
+        os.replace(filename + '.tmp', filename)
+    return filenames
+
+
+def _write_chunk(handles, chunk):
+    if len(handles) == 1:
+        handles[0].write(b''.join(r1 + r2 for (r1, r2) in chunk))
+    else:
+        handles[0].write(b''.join(r1 for (r1, _) in chunk))
+        handles[1].write(b''.join(r2 for (_, r2) in chunk))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write deterministic synthetic fastq')
+    parser.add_argument('-o', '--output-dir', required=True, help='Directory for the files')
+    parser.add_argument('-p', '--pairs', type=int, default=100000, help='Read pairs')
+    parser.add_argument('-l', '--read-length', type=int, default=150, help='Longest read')
+    parser.add_argument('-m', '--min-length', type=int, default=None,
+                        help='Shortest read [read length]')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='illumina')
+    parser.add_argument('-y', '--layout', choices=LAYOUTS, default='paired')
+    parser.add_argument('-c', '--compression', choices=COMPRESSIONS, default='none')
+    parser.add_argument('-w', '--wrap', type=int, default=0,
+                        help='Bases per line, 0 for single line records')
+    parser.add_argument('-q', '--quality', choices=sorted(QUALITIES), default='full')
+    parser.add_argument('-s', '--seed', type=int, default=1)
+    args = parser.parse_args()
+    for filename in generate(args.output_dir, args.pairs, args.read_length, args.min_length,
+                             args.format, args.layout, args.compression, args.wrap,
+                             args.quality, args.seed):
+        print(filename)
+
+
+if __name__ == '__main__':
+    main()
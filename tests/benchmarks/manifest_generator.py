@@ -0,0 +1,214 @@
+########## LICENCE ##########
+# Copyright (c) 2017-2019 Genome Research Ltd.
+#
+# Author: CASM/Cancer IT <cgphelp@sanger.ac.uk>
+#
+# This file is part of cgp_seq_input_val.
+#
+# cgp_seq_input_val is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Affero General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# 1. The usage of a range of years within a copyright statement contained within
+# this distribution should be interpreted as being equivalent to a list of years
+# including the first and last year specified and all consecutive years between
+# them. For example, a copyright statement that reads ‘Copyright (c) 2005, 2007-
+# 2009, 2011-2012’ should be interpreted as being identical to a statement that
+# reads ‘Copyright (c) 2005, 2007, 2008, 2009, 2011, 2012’ and a copyright
+# statement that reads ‘Copyright (c) 2005-2012’ should be interpreted as being
+# identical to a statement that reads ‘Copyright (c) 2005, 2006, 2007, 2008,
+# 2009, 2010, 2011, 2012’."
+########## LICENCE ##########
+
+"""
+Deterministic synthetic import manifests (tsv) built from a manifest config,
+valid or with one deliberate problem at a chosen row, for benchmarks and
+tests of man-valid at scale.
+
+Run as a script to write a manifest:
+
+    python -m tests.benchmarks.manifest_generator -o /tmp/manifest.tsv -r 100000 --files
+"""
+
+import argparse
+import json
+import os
+import random
+import uuid
+from importlib import resources
+
+CONFIG = 'IMPORT-1.0.json'  # in the package config directory
+# deliberate problems, each is caught by a different check of Body (or FileMeta)
+PROBLEMS = ('invalid_value', 'missing_value', 'duplicate_file', 'bad_extension',
+            'mixed_extension', 'cwl_name', 'control_limit', 'missing_file')
+SAMPLES_PER_GROUP = 2  # a normal (the group control) and a tumour
+LANES = 2  # rows per sample
+
+
+def load_config(config_file=None):
+    """
+    Manifest config, that of IMPORT 1.0 in the package by default
+    """
+    if config_file is None:
+        config = resources.files('cgp_seq_input_val').joinpath('config').joinpath(CONFIG)
+        return json.loads(config.read_text(encoding='utf-8'))
+    with open(config_file, 'r') as fp:
+        return json.load(fp)
+
+
+def header_rows(config, seed=1):
+    """
+    Header rows with the first allowed value of each restricted item and a
+    uuid derived from the seed
+
+    Returns:
+        list - (item, value) tuples
+    """
+    rules = config['header']
+    rows = []
+    for item in rules['expected']:
+        if item == 'Form type:':
+            value = config['type']
+        elif item == 'Form version:':
+            value = config['version']
+        elif item == 'Our Ref:':
+            value = str(uuid.UUID(int=random.Random(seed).getrandbits(128), version=4))
+        elif item in rules['validate']:
+            value = rules['validate'][item][0]
+        else:
+            value = 'synthetic'
+        rows.append((item, value))
+    return rows
+
+
+def body_row(config, idx, paired=True):
+    """
+    Attributes of a valid body row, rows are grouped as SAMPLES_PER_GROUP
+    samples of LANES rows
+
+    Returns:
+        dict - value of each column in config body.ordered
+    """
+    (sample_idx, lane) = divmod(idx, LANES)
+    (group, member) = divmod(sample_idx, SAMPLES_PER_GROUP)
+    name = 'G%d_S%d_L%d' % (group, sample_idx, lane)
+    ext = config['body']['validate_ext']['File_2'][0]
+    row = {'Group_ID': 'G%d' % group,
+           'Sample': 'S%d' % sample_idx,
+           'Normal_Tissue': 'Y' if member == 0 else 'N',
+           'Group_Control': 'Y' if member == 0 else 'N',
+           'Library': 'LIB%d' % sample_idx,
+           'File': name + '_1' + ext,
+           'File_2': name + '_2' + ext if paired else '.'}
+    return dict((column, row.get(column, '.')) for column in config['body']['ordered'])
+
+
+def add_problem(row, problem, previous):
+    """
+    Alters a row to have a problem from PROBLEMS, 'missing_file' only changes
+    which files are created
+
+    Args:
+        row - attributes of the row, changed in place
+        problem - from PROBLEMS
+        previous - attributes of the row before
+    """
+    if problem == 'invalid_value':
+        row['Normal_Tissue'] = 'X'
+    elif problem == 'missing_value':
+        row['Sample'] = ''
+    elif problem == 'duplicate_file':
+        row['File'] = previous['File']
+    elif problem == 'bad_extension':
+        row['File'] = os.path.splitext(os.path.splitext(row['File'])[0])[0] + '.txt'
+    elif problem == 'mixed_extension':
+        row['File_2'] = row['File_2'].replace('.gz', '.bz2')
+    elif problem == 'cwl_name':
+        row['File'] = row['File'].replace('_L', '+L')
+    elif problem == 'control_limit':  # a second sample as control of the group
+        row['Group_ID'] = previous['Group_ID']
+        row['Group_Control'] = 'Y'
+        row['Sample'] = row['Sample'] + '_extra'
+
+
+def write_manifest(filename, rows, config=None, paired=True, problem=None, problem_row=None,
+                   create_files=False, seed=1):
+    """
+    Writes a manifest tsv
+
+    Args:
+        filename - manifest to write
+        rows - body rows
+        config - optional, manifest config [load_config()]
+        paired - optional, rows have File_2 [True]
+        problem - optional, from PROBLEMS [None]
+        problem_row - optional, 0 based body row with the problem [last]
+        create_files - optional, create the (non-empty) files of each row next
+                       to the manifest, for --checkfiles [False]
+        seed - optional, seeds the uuid [1]
+
+    Returns:
+        int - line of the manifest with the problem, None without
+    """
+    if problem is not None and problem not in PROBLEMS:
+        raise ValueError("problem must be one of: %s" % ', '.join(PROBLEMS))
+    if config is None:
+        config = load_config()
+    if problem_row is None:
+        problem_row = rows - 1
+    header = header_rows(config, seed)
+    ordered = config['body']['ordered']
+    directory = os.path.dirname(os.path.abspath(filename))
+    previous = None
+    os.makedirs(directory, exist_ok=True)
+    with open(filename, 'w') as fp:
+        for (item, value) in header:
+            fp.write('%s\t%s\n' % (item, value))
+        fp.write('\t'.join(ordered) + '\n')
+        for idx in range(rows):
+            row = body_row(config, idx, paired)
+            if idx == problem_row and problem is not None:
+                add_problem(row, problem, previous)
+            if create_files and not (idx == problem_row and problem == 'missing_file'):
+                for f_type in ('File', 'File_2'):
+                    if row[f_type] != '.':
+                        with open(os.path.join(directory, row[f_type]), 'wb') as data:
+                            data.write(b'@')
+            fp.write('\t'.join(row[column] for column in ordered) + '\n')
+            previous = row
+    if problem is None:
+        return None
+    # header rows, body headings, then 1 based body row
+    return len(header) + 1 + problem_row + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a deterministic synthetic manifest')
+    parser.add_argument('-o', '--output', required=True, help='Manifest tsv to write')
+    parser.add_argument('-r', '--rows', type=int, default=1000, help='Body rows')
+    parser.add_argument('-c', '--config', help='Manifest config json [IMPORT-1.0]')
+    parser.add_argument('-u', '--unpaired', action='store_true', help='No File_2')
+    parser.add_argument('-p', '--problem', choices=PROBLEMS, help='Add a problem')
+    parser.add_argument('-l', '--problem-row', type=int,
+                        help='Body row (0 based) with the problem [last]')
+    parser.add_argument('-f', '--files', action='store_true',
+                        help='Create the files of each row next to the manifest')
+    parser.add_argument('-s', '--seed', type=int, default=1)
+    args = parser.parse_args()
+    line = write_manifest(args.output, args.rows, load_config(args.config), not args.unpaired,
+                          args.problem, args.problem_row, args.files, args.seed)
+    if line is not None:
+        print('Problem on line %d' % line)
+
+
+if __name__ == '__main__':
+    main()
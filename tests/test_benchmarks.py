@@ -0,0 +1,155 @@
+import pytest
+import filecmp, os
+
+from cgp_seq_input_val.file_meta import FileValidationError
+from cgp_seq_input_val.manifest import Manifest, ValidationError
+from cgp_seq_input_val.seq_validator import SeqValidator
+from tests.benchmarks import bench_manifest, bench_startup, fastq_generator, manifest_generator
+from tests.benchmarks.bench_seq_validator import Case, run_case, select_cases
+from tests.benchmarks.common import compare
+
+def _validate(files, engine='block'):
+    validator = SeqValidator(files[0], 0, file_b=files[1] if len(files) > 1 else None,
+                             progress_pairs=0, engine=engine)
+    validator.validate()
+    return validator.summary()
+
+@pytest.mark.parametrize('compression', fastq_generator.COMPRESSIONS)
+def test_generate_deterministic(tmp_path, compression):
+    first = fastq_generator.generate(str(tmp_path / 'a'), 50, compression=compression)
+    second = fastq_generator.generate(str(tmp_path / 'b'), 50, compression=compression)
+    assert list(map(os.path.basename, first)) == list(map(os.path.basename, second))
+    for (name_a, name_b) in zip(first, second):
+        assert filecmp.cmp(name_a, name_b, shallow=False)
+    third = fastq_generator.generate(str(tmp_path / 'c'), 50, compression=compression, seed=2)
+    assert not filecmp.cmp(first[0], third[0], shallow=False)
+
+@pytest.mark.parametrize('fmt', fastq_generator.FORMATS)
+@pytest.mark.parametrize('layout', fastq_generator.LAYOUTS)
+@pytest.mark.parametrize('compression', fastq_generator.COMPRESSIONS)
+def test_generate_valid(tmp_path, fmt, layout, compression):
+    files = fastq_generator.generate(str(tmp_path), 120, 100, fmt=fmt, layout=layout,
+                                     compression=compression)
+    assert len(files) == (1 if layout == 'interleaved' else 2)
+    report = _validate(files)
+    assert report['pairs'] == 120
+    assert report['valid_q'] is True
+    expected = 'Illumina' if fmt == 'illumina' else 'Casava_1.8'
+    assert report['format'] == expected
+
+@pytest.mark.parametrize('engine', ['line', 'block'])
+def test_generate_multi_line(tmp_path, engine):
+    files = fastq_generator.generate(str(tmp_path), 20, 1000, min_length=100, wrap=60)
+    with open(files[0], 'rb') as fp:
+        lines = fp.read().splitlines()
+    assert max(len(line) for line in lines if not line.startswith(b'@')) == 60
+    assert _validate(files, engine)['pairs'] == 20
+
+def test_generate_binned(tmp_path):
+    files = fastq_generator.generate(str(tmp_path), 100, 50, quality='binned')
+    report = _validate(files)
+    assert sorted(report['quality_histogram']) == ['35', '45', '56', '70']
+    assert report['quality_binning'] == 'Illumina 4-level (RTA3)'
+
+def test_generate_reuse(tmp_path):
+    files = fastq_generator.generate(str(tmp_path), 10)
+    mtime = os.stat(files[0]).st_mtime_ns
+    assert fastq_generator.generate(str(tmp_path), 10, reuse=True) == files
+    assert os.stat(files[0]).st_mtime_ns == mtime
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith('.tmp')]
+
+def test_generate_bad_args(tmp_path):
+    with pytest.raises(ValueError):
+        fastq_generator.generate(str(tmp_path), 10, layout='single')
+    with pytest.raises(ValueError):
+        fastq_generator.generate(str(tmp_path), 10, compression='xz')
+    with pytest.raises(ValueError):
+        fastq_generator.generate(str(tmp_path), 10, fmt='solexa')
+
+def test_select_cases():
+    assert [case.name for case in select_cases(['paired_*_block'])] == [
+        'paired_plain_block', 'paired_gzip_block', 'paired_bgzip_block', 'paired_bz2_block']
+    assert len(select_cases(None)) == len(select_cases(['*']))
+
+def test_run_case(tmp_path):
+    case = Case('tiny', {'compression': 'gzip'}, {'engine': 'block'}, 0.5)
+    result = run_case(case, str(tmp_path), pairs=200, repeats=2)
+    assert result['pairs'] == 100
+    assert result['data'] == {'compression': 'gzip', 'pairs': 100}
+    assert len(result['seconds']) == 2
+    assert result['best_seconds'] == min(result['seconds'])
+    assert result['peak_rss_bytes'] > 0
+    assert result['performance']['records'] == 200
+
+def test_run_case_error(tmp_path):
+    case = Case('tiny', {}, {'engine': 'block', 'checkpoint': str(tmp_path / 'ck'),
+                             'sample_sites': 2}, 1)
+    result = run_case(case, str(tmp_path), pairs=10, repeats=1)
+    assert result['error'].startswith('SeqValidationError')
+
+def test_compare():
+    baseline = {'results': [{'name': 'a', 'best_seconds': 1.0}, {'name': 'b', 'best_seconds': 1.0},
+                            {'name': 'c', 'error': 'broken'}]}
+    current = {'results': [{'name': 'a', 'best_seconds': 1.05}, {'name': 'b', 'best_seconds': 1.5},
+                           {'name': 'c', 'best_seconds': 1.0}, {'name': 'd', 'best_seconds': 1.0}]}
+    assert compare(baseline, current) == [('a', 1.0, 1.05, 1.05, False),
+                                          ('b', 1.0, 1.5, 1.5, True)]
+    assert compare(baseline, current, threshold=0.01)[0][4] is True
+
+@pytest.mark.parametrize('problem', manifest_generator.PROBLEMS)
+def test_manifest_problems(tmp_path, problem):
+    filename = str(tmp_path / 'manifest.tsv')
+    line = manifest_generator.write_manifest(filename, 9, problem=problem, problem_row=5,
+                                             create_files=True)
+    assert line == 14
+    manifest = Manifest(filename)
+    with pytest.raises((ValidationError, FileValidationError)) as e_info:
+        manifest.validate(checkFiles=True)
+    if problem != 'control_limit':  # reported for the group, not a line
+        assert 'line 14' in str(e_info.value)
+
+def test_manifest_valid(tmp_path):
+    filename = str(tmp_path / 'manifest.tsv')
+    assert manifest_generator.write_manifest(filename, 10, create_files=True) is None
+    manifest = Manifest(filename)
+    manifest.validate(checkFiles=True)
+    rows = manifest.for_json()['body']
+    assert len(rows) == 10
+    assert sum(row['Group_Control'] == 'Y' for row in rows) == 6  # samples 0, 2 and 4
+
+def test_manifest_unpaired(tmp_path):
+    filename = str(tmp_path / 'manifest.tsv')
+    manifest_generator.write_manifest(filename, 4, paired=False, create_files=True)
+    manifest = Manifest(filename)
+    manifest.validate(checkFiles=True)
+    assert [row['File_2'] for row in manifest.for_json()['body']] == ['.'] * 4
+    assert sorted(os.listdir(str(tmp_path)))[0] == 'G0_S0_L0_1.fastq.gz'
+
+def test_manifest_scale(tmp_path):
+    # quadratic checks take many seconds at this size
+    filename = str(tmp_path / 'manifest.tsv')
+    manifest_generator.write_manifest(filename, 30000, problem='duplicate_file')
+    manifest = Manifest(filename)
+    with pytest.raises(ValidationError) as e_info:
+        manifest.validate()
+    assert 'line 30008' in str(e_info.value)
+
+def test_bench_manifest_run_size(tmp_path):
+    result = bench_manifest.run_size(str(tmp_path), 20, check_files_rows=20)
+    assert result['check_files'] is True
+    assert set(result['stages']) == {'header_parse', 'config', 'header_validate', 'body_parse',
+                                     'body_validate', 'check_files', 'write'}
+    assert 'invalid' not in result
+    assert result['peak_rss_bytes'] > 0
+    result = bench_manifest.run_size(str(tmp_path), 20, check_files_rows=10,
+                                     problem='missing_value')
+    assert result['name'] == 'rows_20_missing_value'
+    assert result['check_files'] is False
+    assert 'line 28' in result['invalid']
+    assert 'write' not in result['stages']
+
+def test_bench_startup_cases():
+    for (name, arguments) in bench_startup.CASES:
+        result = bench_startup.run_case(name, arguments, repeats=1)
+        assert result['name'] == name
+        assert result['best_seconds'] == result['median_seconds'] > 0
@@ -0,0 +1,90 @@
+import pytest
+import gzip, os
+
+from cgp_seq_input_val import bgzf
+from cgp_seq_input_val.error_classes import SeqValidationError
+
+test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
+
+with open(os.path.join(test_dir, 'good_read_i.fq'), 'rb') as fp:
+    expected = fp.read() * 50
+
+
+def write_bgzf(path, data, monkeypatch):
+    monkeypatch.setattr(bgzf, 'BLOCK_DATA', 500)
+    with bgzf.BgzfWriter(open(path, 'wb')) as writer:
+        writer.write(data)
+
+
+def test_writer_readable_by_gzip(tmp_path, monkeypatch):
+    path = str(tmp_path / 'out.fq.gz')
+    write_bgzf(path, expected, monkeypatch)
+    with gzip.open(path, 'rb') as fp:
+        assert fp.read() == expected
+    with open(path, 'rb') as fp:
+        assert fp.read().endswith(bgzf.EOF_BLOCK)
+
+
+@pytest.mark.parametrize('level', [1, 6])
+def test_writer_threads(tmp_path, monkeypatch, level):
+    monkeypatch.setattr(bgzf, 'BLOCK_DATA', 500)
+    outputs = []
+    for threads in (0, 3):
+        path = str(tmp_path / ('out_%d.fq.gz' % threads))
+        with bgzf.BgzfWriter(open(path, 'wb'), level, threads) as writer:
+            for pos in range(0, len(expected), 777):
+                writer.write(expected[pos:pos + 777])
+        with open(path, 'rb') as fp:
+            outputs.append(fp.read())
+    # blocks are written in order whichever thread compressed them
+    assert outputs[0] == outputs[1]
+    assert gzip.decompress(outputs[1]) == expected
+
+
+def test_is_bgzf(tmp_path, monkeypatch):
+    path = str(tmp_path / 'out.fq.gz')
+    write_bgzf(path, expected, monkeypatch)
+    assert bgzf.is_bgzf(path)
+    assert not bgzf.is_bgzf(os.path.join(test_dir, 'good_read_i.fq.gz'))
+    assert not bgzf.is_bgzf(os.path.join(test_dir, 'good_read_i.fq'))
+
+
+def test_chunk_offsets_on_blocks(tmp_path, monkeypatch):
+    path = str(tmp_path / 'out.fq.gz')
+    write_bgzf(path, expected, monkeypatch)
+    offsets = bgzf.chunk_offsets(path, 1000)
+    assert len(offsets) > 3
+    assert offsets[0] == 0 and offsets[-1] == os.path.getsize(path)
+    data = b''
+    with open(path, 'rb') as raw:
+        for (start, end) in zip(offsets, offsets[1:]):
+            raw.seek(start)
+            assert bgzf.BGZF_HEADER.match(raw.read(bgzf.HEADER_SIZE))
+            data += b''.join(bgzf.iter_blocks(raw, start, end, path))
+    assert data == expected
+
+
+def test_single_chunk(tmp_path, monkeypatch):
+    path = str(tmp_path / 'out.fq.gz')
+    write_bgzf(path, expected, monkeypatch)
+    assert bgzf.chunk_offsets(path, 1000000) == [0, os.path.getsize(path)]
+
+
+def test_iter_blocks_not_on_block(tmp_path, monkeypatch):
+    path = str(tmp_path / 'out.fq.gz')
+    write_bgzf(path, expected, monkeypatch)
+    with pytest.raises(SeqValidationError) as e_info:
+        with open(path, 'rb') as raw:
+            list(bgzf.iter_blocks(raw, 1, os.path.getsize(path), path))
+    assert 'Invalid BGZF block at offset 1' in str(e_info.value)
+
+
+def test_block_index_virtual_offsets(tmp_path, monkeypatch):
+    path = str(tmp_path / 'out.fq.gz')
+    write_bgzf(path, expected, monkeypatch)
+    index = bgzf.BlockIndex(path)
+    for offset in (0, 10, 499, 500, 501, 7777, len(expected) - 1, len(expected)):
+        virtual_offset = index.virtual_offset(offset)
+        assert virtual_offset & 0xffff < 500
+        with bgzf.open_virtual(path, virtual_offset) as fq_fh:
+            assert fq_fh.read() == expected[offset:]
@@ -0,0 +1,39 @@
+import pytest
+import json, os
+
+from cgp_seq_input_val import checkpoint
+from cgp_seq_input_val.checkpoint import Checkpoint, input_identity
+from cgp_seq_input_val.error_classes import SeqValidationError
+
+
+def test_checkpoint_save_load_remove(tmp_path):
+    path = str(tmp_path / 'progress.json')
+    saved = Checkpoint(path, interval=0)
+    assert saved.due()
+    assert saved.load() is None
+    saved.save({'pairs': 10})
+    assert Checkpoint(path).load() == {'pairs': 10, 'version': checkpoint.CHECKPOINT_VERSION}
+    assert not os.path.exists(path + '.tmp')
+    saved.remove()
+    assert not os.path.exists(path)
+    saved.remove()  # nothing to remove
+
+
+def test_checkpoint_due():
+    assert not Checkpoint('x.json', interval=3600).due()
+
+
+def test_checkpoint_version(tmp_path):
+    path = str(tmp_path / 'progress.json')
+    with open(path, 'w') as fp:
+        json.dump({'pairs': 10, 'version': 0}, fp)
+    with pytest.raises(SeqValidationError):
+        Checkpoint(path).load()
+
+
+def test_input_identity(tmp_path):
+    path = tmp_path / 'in.fq'
+    path.write_bytes(b'@r/1\nA\n+\nI\n')
+    identity = input_identity(str(path))
+    assert identity['size'] == 11
+    assert os.path.isabs(identity['path'])
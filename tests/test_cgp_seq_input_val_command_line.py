@@ -0,0 +1,33 @@
+import pytest
+import os, sys, subprocess
+
+from cgp_seq_input_val import constants
+
+# modules only the sub commands need, not loaded by the command line itself
+HEAVY = ('numpy', 'progressbar', 'xopen', 'xlrd', 'pkg_resources', 'importlib.metadata',
+         'concurrent.futures.process', 'cgp_seq_input_val.seq_validator',
+         'cgp_seq_input_val.manifest', 'cgp_seq_input_val.seq_batch')
+
+def _python(code, *args):
+    return subprocess.run([sys.executable, '-c', code] + list(args), check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+
+def test_import_is_light():
+    code = ('import sys, cgp_seq_input_val.command_line\n'
+            'print(" ".join(m for m in %r if m in sys.modules))' % (HEAVY,))
+    assert _python(code).stdout.strip() == ''
+
+def test_help_is_light():
+    code = ('import sys\n'
+            'from cgp_seq_input_val import command_line\n'
+            'try:\n'
+            '    command_line.main()\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            'print(" ".join(m for m in %r if m in sys.modules), file=sys.stderr)' % (HEAVY,))
+    assert _python(code, 'seq-valid', '--help').stderr.strip() == ''
+
+def test_version():
+    code = 'import sys; from cgp_seq_input_val.command_line import main; sys.exit(main())'
+    assert _python(code, '--version').stdout.strip().endswith(' ' + constants.version())
@@ -0,0 +1,51 @@
+import pytest
+import hashlib, io, os
+
+from cgp_seq_input_val.digest import Digester, DigestReader, DigestWriter
+
+test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
+fq_gz = os.path.join(test_dir, 'good_read_1.fq.gz')
+
+with open(fq_gz, 'rb') as fp:
+    raw_data = fp.read()
+expected = {'md5': hashlib.md5(raw_data).hexdigest(),
+            'sha256': hashlib.sha256(raw_data).hexdigest()}
+
+def test_digest_reader():
+    digester = Digester(fq_gz, ['md5', 'sha256'])
+    with io.BufferedReader(DigestReader(open(fq_gz, 'rb'), digester), 16) as fp:
+        assert fp.read() == raw_data
+    assert digester.position == len(raw_data)
+    assert digester.hexdigests() == expected
+
+def test_digest_reread():
+    digester = Digester(fq_gz, ['md5'])
+    with DigestReader(open(fq_gz, 'rb'), digester) as fp:
+        fp.read(50)
+    with DigestReader(open(fq_gz, 'rb'), digester) as fp:
+        fp.read(20)
+        assert digester.position == 50
+        fp.read(40)
+        assert digester.position == 60
+    # the rest is read from the file
+    assert digester.hexdigests() == {'md5': expected['md5']}
+
+def test_digest_unread():
+    digester = Digester(fq_gz, ['sha256'])
+    digester.start_reading()
+    assert digester.hexdigests() == {'sha256': expected['sha256']}
+
+def test_digest_writer(tmp_path):
+    path = str(tmp_path / 'out.gz')
+    digester = Digester(path, ['md5', 'sha256'])
+    writer = io.BufferedWriter(DigestWriter(open(path, 'wb'), digester), 10)
+    writer.write(raw_data)
+    writer.close()
+    assert digester.hexdigests() == expected
+
+def test_digest_close():
+    digester = Digester(fq_gz, ['md5'])
+    reader = DigestReader(open(fq_gz, 'rb'), digester)
+    digester.close()
+    assert reader.closed
+    digester.close()
@@ -0,0 +1,196 @@
+import pytest
+import io, os
+
+from cgp_seq_input_val.fastq_block import (FastqBlockReader, get_fq_format, record_validator,
+                                           alphabet_valid, alphabet_error, joined_headers,
+                                           records_valid, pairs_named, pairs_valid)
+from cgp_seq_input_val.fastq_read import FastqFormat, CasavaFastqRead, IlluminaFastqRead
+from cgp_seq_input_val.error_classes import SeqValidationError
+
+test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
+
+
+def legacy_records(fq_file):
+    reads = []
+    with open(fq_file, 'r') as fp:
+        line_no = 0
+        curr_line = None
+        while True:
+            read = IlluminaFastqRead(fp, line_no, curr_line)
+            reads.append((read.file_pos[0], read.seq_header, read.seq, read.qual_header, read.qual))
+            curr_line = read.last_line
+            line_no = read.file_pos[1]
+            if curr_line == '':
+                break
+    return reads
+
+
+@pytest.mark.parametrize('block_size', [1, 5, 64, 1024 * 1024])
+@pytest.mark.parametrize('file_name', ['2_reads_1.fq', 'good_read_i.fq', 'casava_dual_1.fq'])
+def test_block_matches_fastq_read(file_name, block_size):
+    fqi = os.path.join(test_dir, file_name)
+    expected = legacy_records(fqi)
+    with open(fqi, 'rb') as fp:
+        reader = FastqBlockReader(fp, block_size=block_size)
+        records = reader.read_records(1) + reader.read_records(1000)
+    assert reader.finished
+    assert [(r[0], r[1].decode(), r[2].decode(), r[3].decode(), r[4].decode())
+            for r in records] == expected
+
+
+@pytest.mark.parametrize('skip', [1, 2, 3])
+def test_block_resumed_line_numbers(skip):
+    fqi = os.path.join(test_dir, 'good_read_i.fq')
+    expected = legacy_records(fqi) * 3
+    with open(fqi, 'rb') as fp:
+        data = fp.read() * 3
+    start = 0
+    for _ in range(skip * 4):
+        start = data.index(b'\n', start) + 1
+    # the line FastqRead gives a record after skip 4 line records
+    reader = FastqBlockReader(io.BytesIO(data[start:]), line_no=1 + 3 * skip)
+    records = reader.read_records(1000)
+    assert [r[0] for r in records] == [1 + 3 * idx for idx in range(skip, len(expected))]
+    assert [r[1].decode() for r in records] == [r[1] for r in expected[skip:]]
+
+
+def test_block_multi_line_and_crlf():
+    data = b'@a/1\r\nAC\r\nGT\r\n+\r\nII\r\nII \r\n@a/2\nACGT\n+\nIIII\n\n@b/1\nA\n+\nI\n'
+    reader = FastqBlockReader(io.BytesIO(data), block_size=3)
+    records = reader.read_records(10)
+    assert [r[2] for r in records] == [b'ACGT', b'ACGT']
+    assert [r[4] for r in records] == [b'IIII', b'IIII']
+    assert [r[0] for r in records] == [1, 6]  # same counting as FastqRead
+    assert reader.finished  # empty line ends the file
+
+
+def test_block_interleaved_empty_line_after_read_1():
+    data = b'@a/1\nA\n+\nI\n\nA\n+\nI\n'
+    reader = FastqBlockReader(io.BytesIO(data), interleaved=True)
+    records = reader.read_records(10)
+    assert len(records) == 2
+    assert records[1][1] == b''
+
+
+def test_block_truncated_record():
+    reader = FastqBlockReader(io.BytesIO(b'@a/1\nACGT\n'))
+    records = reader.read_records(10)
+    with pytest.raises(SeqValidationError) as e_info:
+        record_validator(FastqFormat.ILLUMINA)(records[0], 'x')
+    assert 'appears to be corrupt' in str(e_info.value)
+
+
+@pytest.mark.parametrize('file_format',
+    [
+        ('good_read_1.fq', FastqFormat.ILLUMINA),
+        ('casava_1_8_reads.fq', FastqFormat.CASAVA)
+    ])
+def test_block_determine_format(file_format):
+    file_name, fq_format = file_format
+    with open(os.path.join(test_dir, file_name), 'rb') as fp:
+        assert get_fq_format(FastqBlockReader(fp).read_records(1)[0]) == fq_format
+
+
+@pytest.mark.parametrize('file_name', ['bad_header_1.fq', 'bad_header_2.fq'])
+def test_block_header_no_at(file_name):
+    with pytest.raises(SeqValidationError) as e_info:
+        with open(os.path.join(test_dir, file_name), 'rb') as fp:
+            get_fq_format(FastqBlockReader(fp).read_records(1)[0])
+    assert 'Unsupported FastQ header format' in str(e_info.value)
+
+
+@pytest.mark.parametrize('file_name_format',
+    [
+        ('seq-shorter_1.fq', FastqFormat.ILLUMINA),
+        ('qual-shorter_1.fq', FastqFormat.ILLUMINA),
+        ('seq-shorter_1_casava_1_8.fq', FastqFormat.CASAVA),
+        ('qual-shorter_1_casava_1_8.fq', FastqFormat.CASAVA)
+    ])
+def test_block_seq_qual_length(file_name_format):
+    file_name, fq_format = file_name_format
+    with pytest.raises(SeqValidationError) as e_info:
+        with open(os.path.join(test_dir, file_name), 'rb') as fp:
+            record = FastqBlockReader(fp).read_records(1)[0]
+            record_validator(fq_format)(record, 'x')
+    assert 'appears to be corrupt' in str(e_info.value)
+
+
+def test_block_casava_name():
+    with open(os.path.join(test_dir, 'casava_dual_1.fq'), 'rb') as fp:
+        record = FastqBlockReader(fp).read_records(1)[0]
+    (name, member) = record_validator(FastqFormat.CASAVA)(record, 'x')
+    assert name == b'A00471:89:HMTWVDMXX:1:1101:2871:1016 :N:0:TTGGACGT+AGCACTTC'
+    assert member == b'1'
+
+@pytest.mark.parametrize('record, message',
+    [
+        ((5, b'@r/1', b'ACGTNryk', b'+', b'!II~IIII'), None),
+        ((5, b'@r/1', b'ACG\x00TN', b'+', b'IIIIII'),
+         "line 5 of f.fq has invalid sequence character '\\x00' at position 4"),
+        ((5, b'@r/1', b'ACGT.N', b'+', b'IIII I'),
+         "line 5 of f.fq has invalid sequence character '.' at position 5"),
+        ((5, b'@r/1', b'ACGTN', b'+', b'III\x7fI'),
+         "line 5 of f.fq has invalid quality character '\\x7f' at position 4"),
+    ])
+def test_block_alphabet(record, message):
+    assert alphabet_valid([record]) == (message is None)
+    if message is None:
+        alphabet_error(record, 'f.fq')
+        return
+    with pytest.raises(SeqValidationError) as e_info:
+        alphabet_error(record, 'f.fq')
+    assert str(e_info.value).endswith(message)
+
+def casava_pair(idx, sep=b' '):
+    return [(1, b'@A:1:FC:1:1101:%d:1%s%s:N:0:ACGT' % (idx, sep, member), b'ACGT', b'+', b'IIII')
+            for member in (b'1', b'2')]
+
+@pytest.mark.parametrize('fq_format, records, valid',
+    [
+        (FastqFormat.CASAVA, [], True),
+        (FastqFormat.CASAVA, [casava_pair(i)[0] for i in range(3)], True),
+        (FastqFormat.CASAVA, [casava_pair(0, b'\t')[0]], True),
+        (FastqFormat.CASAVA, [casava_pair(0, b'  ')[0]], False),
+        (FastqFormat.CASAVA, [(1, b'@r', b'A', b'+', b'I'), (5, b'@x 1:N:0:A', b'A', b'+', b'I')],
+         False),
+        (FastqFormat.CASAVA, [(1, casava_pair(0)[0][1], b'ACGT', b'+', b'III')], False),
+        (FastqFormat.CASAVA, [(1, casava_pair(0)[0][1], b'ACGT', None, None)], False),
+        (FastqFormat.ILLUMINA, [(1, b'@r/1/2', b'A', b'+', b'I')], True),
+        (FastqFormat.ILLUMINA, [(1, b'@r/3', b'A', b'+', b'I')], False),
+    ])
+def test_block_records_valid(fq_format, records, valid):
+    # bulk checks agree with the record validator
+    assert records_valid(records, fq_format) == valid
+    validate = record_validator(fq_format)
+    try:
+        for record in records:
+            validate(record, 'x')
+        assert valid
+    except SeqValidationError:
+        assert not valid
+
+@pytest.mark.parametrize('fq_format, mutate, named',
+    [
+        (FastqFormat.CASAVA, None, True),
+        (FastqFormat.CASAVA, lambda h: h.replace(b':1 ', b':9 '), False),
+        (FastqFormat.CASAVA, lambda h: h.replace(b' 2:', b' 1:'), False),
+        (FastqFormat.CASAVA, lambda h: h.replace(b'ACGT', b'ACGA'), False),
+        (FastqFormat.CASAVA, lambda h: h.replace(b' ', b'\t'), False),  # left to the validator
+        (FastqFormat.ILLUMINA, None, True),
+        (FastqFormat.ILLUMINA, lambda h: h.replace(b'/2', b'/1'), False),
+        (FastqFormat.ILLUMINA, lambda h: h.replace(b'@r0', b'@r9'), False),
+    ])
+def test_block_pairs_named(fq_format, mutate, named):
+    if fq_format == FastqFormat.CASAVA:
+        pairs = [casava_pair(i) for i in range(3)]
+    else:
+        pairs = [[(1, b'@r%d/%d' % (i, member), b'A', b'+', b'I') for member in (1, 2)]
+                 for i in range(3)]
+    records_1 = [pair[0] for pair in pairs]
+    records_2 = [pair[1] for pair in pairs]
+    if mutate:
+        records_2[0] = (1, mutate(records_2[0][1])) + records_2[0][2:]
+    headers_1 = joined_headers(records_1)
+    headers_2 = joined_headers(records_2)
+    assert pairs_named(headers_1, headers_2, 3, fq_format) == named
+    assert pairs_valid(records_1, records_2, fq_format) == named
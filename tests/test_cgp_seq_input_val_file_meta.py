@@ -44,3 +44,11 @@ def test_file_meta_dot_file2():
         assert True
     else:
         assert False
+
+def test_filemeta_missing_file_2():
+    fm = FileMeta(['Sample', 'File', 'File_2'], ['a', 'a.fq.gz'], '/')
+    assert fm.attributes == {'Sample': 'a', 'File': 'a.fq.gz', 'File_2': '.'}
+    with pytest.raises(IndexError):
+        FileMeta(['Sample', 'File', 'File_2'], ['a'], '/')
+    with pytest.raises(IndexError):
+        FileMeta(['Sample', 'File_2', 'File'], ['a', 'a.fq.gz'], '/')
@@ -1,6 +1,6 @@
 import pytest
-import sys, os, tempfile, shutil, json
-from cgp_seq_input_val.manifest import Manifest, Header, Body, ConfigError, ParsingError, ValidationError
+import sys, os, io, subprocess, tempfile, shutil, json
+from cgp_seq_input_val.manifest import Manifest, ManifestReader, Header, Body, BodyRules, ConfigError, ParsingError, ValidationError, full_extension, packaged_config, validate_manifests, wrapped_validate
 from argparse import Namespace
 
 data_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'data')
@@ -239,3 +239,164 @@ def test_manifest_file_set_good():
     manifest = Manifest(infile)
     manifest.validate(True)
     as_json = json.dumps(manifest.for_json())
+
+### ManifestReader tests
+
+def test_manifest_reader_single_parse():
+    infile = os.path.join(test_data, 'file_set_good', 'files_good.tsv')
+    reader = ManifestReader(infile)
+    header = Header(reader)
+    cfg = header.get_config()
+    header.validate(cfg['header'])
+    body = Body(reader, cfg['body'])
+    body.validate(cfg['body'])
+    # same as parsing the file for each
+    body_from_file = Body(infile, cfg['body'])
+    assert reader._handle.closed
+    assert body.offset == body_from_file.offset
+    assert [fd.attributes for fd in body.file_detail] == \
+        [fd.attributes for fd in body_from_file.file_detail]
+    assert body.file_detail[0].rel_path == os.path.dirname(infile)
+
+def test_manifest_reader_buffer():
+    infile = os.path.join(test_data, 'file_set_good', 'files_good.tsv')
+    with open(infile) as ifh:
+        buffer = io.StringIO(ifh.read())
+    manifest = Manifest(buffer)
+    manifest.validate()
+    expected = Manifest(infile)
+    expected.validate()
+    assert not buffer.closed
+    assert manifest.for_json()['body'] == expected.for_json()['body']
+    assert manifest.body.file_detail[0].rel_path == ''
+
+def test_manifest_reader_stream_error_line():
+    infile = os.path.join(test_data, 'file_name_incompatible_with_cwl.tsv')
+    with open(infile) as ifh:
+        buffer = io.StringIO(ifh.read())
+    with pytest.raises(ValidationError) as from_file:
+        Manifest(infile).validate()
+    with pytest.raises(ValidationError) as from_buffer:
+        Manifest(buffer).validate()
+    assert str(from_file.value) == str(from_buffer.value)
+
+def test_manifest_reader_pipe(tmpdir):
+    infile = os.path.join(test_data, 'file_set_good', 'files_good.tsv')
+    with open(infile) as ifh:
+        result = subprocess.run([sys.executable, '-c',
+                                 'import sys; from cgp_seq_input_val.command_line import main; '
+                                 'sys.exit(main())', 'man-valid', '-i', '-', '-o', str(tmpdir)],
+                                stdin=ifh, cwd=os.path.dirname(infile), check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True)
+    assert 'Created files:' in result.stdout
+    assert len(tmpdir.listdir()) == 2
+
+### BodyRules tests
+
+def _body_error(rows, config_file=None):
+    '''
+    Error from validating the body of files_good.tsv with rows replaced
+    '''
+    infile = os.path.join(test_data, 'file_set_good', 'files_good.tsv')
+    with open(infile) as ifh:
+        lines = ifh.read().splitlines()
+    heading = [idx for idx, line in enumerate(lines) if line.startswith('Group_ID')][0]
+    text = '\n'.join(lines[:heading + 1] + ['\t'.join(row) for row in rows]) + '\n'
+    reader = ManifestReader(io.StringIO(text))
+    header = Header(reader)
+    cfg = header.get_config(config_file)
+    body = Body(reader, cfg['body'])
+    with pytest.raises(ValidationError) as e_info:
+        body.validate(cfg['body'])
+    return ' '.join(str(e_info.value).split())
+
+def test_body_rules_earliest_check():
+    # each check used to be a pass over all rows, the earliest check still wins
+    rows = [['1', 'Bob', 'N', 'N', '1', 'a.fq.gz', 'a.fq.gz'],
+            ['1', 'Stuart', 'X', 'N', '1', 'b.fq.gz', 'c.txt'],
+            ['1', 'Kevin', 'Y', 'Y', '1', 'd.fq.gz', '.']]
+    assert _body_error(rows) == \
+        "Metadata item 'Normal_Tissue' has an invalid value of 'X' on line 10"
+    rows[2][1] = '.'
+    assert _body_error(rows) == \
+        "Required metadata value absent for 'Sample' on line 11 ('.' not acceptable)"
+    rows[2][1] = 'Kevin'
+    rows[1][2] = 'Y'
+    assert _body_error(rows) == \
+        "Metadata item 'File_2' has a duplicate value of 'a.fq.gz' on line 9"
+    rows[0][6] = 'e.fq.gz'
+    assert _body_error(rows).startswith("File extension of '.txt' is not valid")
+    rows[1][6] = 'c+.fq.gz'
+    assert _body_error(rows).startswith(
+        "File has CWL imcompatible character(s) in the name: 'c+.fq.gz' on line 10.")
+
+def test_body_rules_limit_before_later_field():
+    config = os.path.join(configs, 'limit_to_exceed', 'IMPORT-1.0.json')
+    rows = [['1', 'Bob', 'N', 'N', '1', 'a.fq.gz', 'b.fq.gz'],
+            ['1', 'Stuart', 'Y', 'N', '1', 'c.fq.gz', '.'],
+            ['1', 'Kevin', 'Y', 'X', '1', 'd.fq.gz', 'e.fq.gz']]
+    # invalid values of a field are reported before its limits
+    assert _body_error(rows, config) == \
+        "Metadata item 'Group_Control' has an invalid value of 'X' on line 11"
+    rows[2][3] = 'Y'
+    assert _body_error(rows, config) == \
+        "Only 1 sample(s) with a value of 'N' is allowed in column 'Group_Control' when rows " \
+        "grouped by 'Group_ID'"
+
+def test_body_rules_config_error():
+    with open(os.path.join(configs, 'limit_no_limit_by', 'IMPORT-1.0.json')) as cfg:
+        body = json.load(cfg)['body']
+    with pytest.raises(ConfigError):
+        BodyRules(body)
+
+@pytest.mark.parametrize('filename', ['a.fq.gz', 'a.FQ.GZ', 'a.bam', 'a', 'a.gz', 'a.b.c.bz2',
+                                      '.fq.gz', '..fq.gz', 'a..gz', 'a.', 'dir.x/a', 'd/.bam',
+                                      'd/x.fastq.gz', 'a.gz.gz', '.', ''])
+def test_full_extension(filename):
+    (base, ext) = os.path.splitext(filename)
+    if ext in ('.gz', '.bz2'):
+        ext = os.path.splitext(base)[1] + ext
+    assert full_extension(filename) == ext
+
+### Config cache and multiple manifest tests
+
+def test_packaged_config_memoised():
+    header = Header(os.path.join(test_data, 'file_set_good', 'files_good.tsv'))
+    packaged = packaged_config('IMPORT', '1.0')
+    assert header.get_config() is packaged.config
+    assert isinstance(packaged.rules, BodyRules)
+    assert packaged_config('IMPORT', '1.0') is packaged
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_validate_manifests(tmpdir, processes):
+    infiles = [os.path.join(test_data, 'file_set_good', 'files_good.tsv'),
+               os.path.join(test_data, 'with_bad_uuid.tsv'),
+               os.path.join(test_data, 'with_uuid.tsv')]
+    results = validate_manifests(infiles, str(tmpdir), processes=processes)
+    assert [infile for (infile, _, _) in results] == infiles
+    assert results[1][1] is None and "not a valid" in results[1][2]
+    assert results[2][1] == (os.path.join(str(tmpdir), '05218fd0-79e5-4214-92d5-e133cd16a798.tsv'),
+                             os.path.join(str(tmpdir), '05218fd0-79e5-4214-92d5-e133cd16a798.json'))
+    assert results[0][2] is None and results[2][2] is None
+    assert len(tmpdir.listdir()) == 4
+
+def test_wrapped_validate_many(tmpdir, capsys):
+    infiles = [os.path.join(test_data, 'file_set_good', 'files_good.tsv'),
+               os.path.join(test_data, 'with_uuid.tsv')]
+    args = Namespace(input=infiles, output=str(tmpdir), checkfiles=False, processes=1)
+    wrapped_validate(args)
+    assert capsys.readouterr().out.count('Created files for') == 2
+    args.input.append(os.path.join(test_data, 'with_bad_uuid.tsv'))
+    with pytest.raises(SystemExit) as e_info:
+        wrapped_validate(args)
+    assert str(e_info.value) == 'ERROR: 1 of 3 manifests failed validation'
+
+def test_wrapped_validate_checkfiles(tmpdir):
+    # files of with_uuid.tsv are not alongside it
+    args = Namespace(input=[os.path.join(test_data, 'with_uuid.tsv')], output=str(tmpdir),
+                     checkfiles=False, processes=None)
+    wrapped_validate(args)
+    args.checkfiles = True
+    with pytest.raises(SystemExit) as e_info:
+        wrapped_validate(args)
+    assert str(e_info.value) == "ERROR: 'banana.fastq.gz' is not a file ('File' - line 9)."
@@ -0,0 +1,109 @@
+import pytest
+
+from cgp_seq_input_val import parallel
+from cgp_seq_input_val.fastq_read import FastqFormat
+
+PAIR = (b'@r%d/1\nACGT\n+\n@III\n'
+        b'@r%d/2\nTTGA\n+\nIIII\n')
+
+
+def pairs(start, count):
+    return b''.join([PAIR % (idx, idx) for idx in range(start, start + count)])
+
+
+def test_find_record_start():
+    data = b'III\n' + pairs(0, 2)
+    assert parallel.find_record_start(data, FastqFormat.ILLUMINA, False) == 4
+
+
+def test_find_record_start_skips_quality():
+    # the quality line starting '@' is not followed by a '+' line 2 lines on
+    data = b'ACGT\n+\n' + pairs(0, 2)
+    start = parallel.find_record_start(data, FastqFormat.ILLUMINA, False)
+    assert data[start:].startswith(b'@r0/1')
+
+
+def test_find_record_start_interleaved_pair():
+    data = pairs(0, 3)
+    # skip into the first pair so the first record found is read 2
+    data = data[data.index(b'@r0/2') - 1:]
+    start = parallel.find_record_start(data, FastqFormat.ILLUMINA, True)
+    assert data[start:].startswith(b'@r1/1')
+    start = parallel.find_record_start(data, FastqFormat.ILLUMINA, False)
+    assert data[start:].startswith(b'@r0/2')
+
+
+def test_find_record_start_need_more():
+    data = b'\n' + pairs(0, 1)
+    assert parallel.find_record_start(data, FastqFormat.ILLUMINA, True) == parallel.NEED_MORE
+
+
+def test_find_record_start_none():
+    assert parallel.find_record_start(b'\nACGT\n+\nIIII\n', FastqFormat.ILLUMINA, True) is None
+
+
+def test_check_chunk():
+    (count, quality, stats) = parallel.check_chunk(pairs(0, 3), FastqFormat.ILLUMINA, True, True)
+    assert count == 3
+    assert quality[ord('@')] == 3 and quality[ord('I')] == 21 and sum(quality) == 24
+    assert stats is None
+    assert parallel.check_chunk(pairs(0, 3), FastqFormat.ILLUMINA, True, False) == (3, None, None)
+    (_, _, stats) = parallel.check_chunk(pairs(0, 3), FastqFormat.ILLUMINA, True, False, True)
+    assert stats.reads == 6
+
+
+@pytest.mark.parametrize('chunk',
+    [
+        pairs(0, 3).replace(b'ACGT\n', b'AC\nGT\n', 1),  # multi-line record
+        pairs(0, 3).replace(b'@r1/2', b'@r1/1'),  # pair member
+        pairs(0, 3).replace(b'@r1/2', b'@r9/2'),  # name mismatch
+        pairs(0, 3) + b'\n' + pairs(3, 1),  # empty line ends the file
+        pairs(0, 3) + PAIR.split(b'@r%d/2')[0] % 3,  # no mate
+    ])
+def test_check_chunk_for_serial(chunk):
+    assert parallel.check_chunk(chunk, FastqFormat.ILLUMINA, True, True) is None
+
+
+def test_range_starts():
+    assert parallel.range_starts(10, 3) == [0, 3, 6, 10]
+    assert parallel.range_starts(2, 3) == [0, 2]
+    assert parallel.range_starts(0, 3) == [0, 0]
+
+
+def test_line_bounds():
+    starts = [0, 10, 20]
+    counts = [3, 0, 2]
+    # a target equal to the lines before a part is still found in the earlier part
+    assert parallel.line_bounds(starts, counts, [0, 2, 3, 4, 5, 6]) == \
+        [(0, 0), (0, 2), (0, 3), (20, 1), (20, 2), None]
+
+
+def test_count_and_locate(tmp_path):
+    data = pairs(0, 10)
+    path = tmp_path / 'interleaved.fq'
+    path.write_bytes(data)
+    starts = parallel.range_starts(len(data), 70)
+    counts = [parallel.count_newlines(str(path), start, end)
+              for (start, end) in zip(starts, starts[1:])]
+    assert sum(counts) == data.count(b'\n')
+    (bound,) = parallel.line_bounds(starts, counts, [24])
+    result = parallel.mapped_chunk([str(path)], [bound], [None], FastqFormat.ILLUMINA,
+                                   True, True)
+    assert result.ok and result.pairs == 7
+    assert data[result.start[0]:].startswith(b'@r3/1\n')
+
+
+def test_mapped_chunk_paired(tmp_path):
+    read_1 = b''.join([PAIR.split(b'@r%d/2')[0] % idx for idx in range(4)])
+    read_2 = b''.join([b'@r%d/2' % idx + PAIR.split(b'@r%d/2')[1] for idx in range(4)])
+    (tmp_path / 'r1.fq').write_bytes(read_1)
+    (tmp_path / 'r2.fq').write_bytes(read_2)
+    files = [str(tmp_path / 'r1.fq'), str(tmp_path / 'r2.fq')]
+    result = parallel.mapped_chunk(files, [(0, 0), (0, 0)], [None, None],
+                                   FastqFormat.ILLUMINA, False, True)
+    assert result.ok and result.pairs == 4 and result.start == (0, 0)
+    # read 2 has an extra record
+    (tmp_path / 'r2.fq').write_bytes(read_2 + read_2[:read_2.index(b'@r1/2')])
+    result = parallel.mapped_chunk(files, [(0, 0), (0, 0)], [None, None],
+                                   FastqFormat.ILLUMINA, False, True)
+    assert not result.ok
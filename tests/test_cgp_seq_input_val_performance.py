@@ -0,0 +1,35 @@
+import pytest
+import io
+
+from cgp_seq_input_val import performance
+from cgp_seq_input_val.performance import StageTimer, TimedReader
+
+def test_stage_nesting(monkeypatch):
+    clock = iter([0.0, 1.0, 3.0, 4.0, 8.0, 10.0, 11.0, 12.0])
+    monkeypatch.setattr(performance.time, 'perf_counter', lambda: next(clock))
+    timer = StageTimer()  # 0
+    with timer.stage('check_pair'):  # 1 - 11
+        with timer.stage('qual_range'):  # 3 - 4
+            pass
+        with timer.stage('output'):  # 8 - 10
+            pass
+    assert timer.seconds['qual_range'] == 1.0
+    assert timer.seconds['output'] == 2.0
+    assert timer.seconds['check_pair'] == 10.0 - 1.0 - 2.0
+    assert timer.calls['check_pair'] == 1
+    report = timer.report(24)  # 12
+    assert report['wall_seconds'] == 12.0
+    assert report['records_per_second'] == 2
+    assert sorted(report['stages']) == ['check_pair', 'output', 'qual_range']
+
+def test_timed_reader():
+    timer = StageTimer()
+    with io.BufferedReader(TimedReader(io.BytesIO(b'x' * 100), timer, 'decode',
+                                       'decompressed_bytes'), 16) as fp:
+        assert fp.read() == b'x' * 100
+    assert timer.counters['decompressed_bytes'] == 100
+    assert timer.calls['decode'] > 1
+
+def test_null_stage():
+    with performance.NULL_STAGE:
+        pass
@@ -0,0 +1,73 @@
+import pytest
+import os, pstats
+
+from cgp_seq_input_val import seq_validator
+from cgp_seq_input_val.error_classes import SeqValidationError
+from cgp_seq_input_val.profiling import Profiler
+from cgp_seq_input_val.seq_validator import SeqValidator
+from tests.benchmarks import fastq_generator
+
+test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
+
+def _work():
+    return sum(range(100))
+
+def _functions(filename):
+    return set(name for (_, _, name) in pstats.Stats(filename).stats)
+
+def test_profiler_whole(tmp_path):
+    profiler = Profiler()
+    profiler.start()
+    _work()
+    profiler.block()  # not sampling, no effect
+    filename = str(tmp_path / 'whole.pstats')
+    profiler.dump(filename)
+    assert '_work' in _functions(filename)
+    assert profiler.blocks == 0
+
+def test_profiler_sampled(tmp_path):
+    profiler = Profiler(every=3)
+    profiler.start()  # nothing until a profiled block
+    _work()
+    for _ in range(7):
+        profiler.block()
+    assert (profiler.blocks, profiler.profiled) == (7, 3)  # blocks 0, 3 and 6
+    profiler.stop()
+    filename = str(tmp_path / 'sampled.pstats')
+    profiler.dump(filename)
+    assert '_work' not in _functions(filename)
+
+def test_profiler_bad_every():
+    with pytest.raises(ValueError):
+        Profiler(every=-1)
+
+@pytest.mark.parametrize('engine', seq_validator.PROFILE_ENGINES)
+def test_seq_validator_sampled(tmp_path, monkeypatch, engine):
+    if engine == 'batch' and not seq_validator.record_batch.numpy_available():
+        pytest.skip('numpy not installed')
+    monkeypatch.setattr(seq_validator, 'BATCH_RECORDS', 4)
+    monkeypatch.setattr(seq_validator, 'LINE_BLOCK_PAIRS', 2)
+    profiler = Profiler(every=2)
+    files = fastq_generator.generate(str(tmp_path), 20, 50)
+    validator = SeqValidator(files[0], 0, file_b=files[1], progress_pairs=0, engine=engine,
+                             profiler=profiler)
+    validator.validate()
+    assert profiler.blocks > 2
+    assert profiler.profiled == (profiler.blocks + 1) // 2
+    filename = str(tmp_path / 'sampled.pstats')
+    profiler.dump(filename)
+    functions = _functions(filename)
+    if engine == 'line':
+        assert '__init__' in functions  # FastqRead
+        assert 'qual_range' in functions
+    else:
+        assert 'read_records' in functions
+
+def test_seq_validator_sampled_engine():
+    with pytest.raises(SeqValidationError) as e_info:
+        SeqValidator(os.path.join(test_dir, 'good_read_i.fq'), 0, progress_pairs=0,
+                     engine='threaded', profiler=Profiler(every=2))
+    assert 'Sampled profiling' in str(e_info.value)
+    # profiling everything works with any engine
+    SeqValidator(os.path.join(test_dir, 'good_read_i.fq'), 0, progress_pairs=0,
+                 engine='threaded', profiler=Profiler())
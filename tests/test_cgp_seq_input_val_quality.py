@@ -0,0 +1,68 @@
+import pytest
+import random
+
+from cgp_seq_input_val import quality
+from cgp_seq_input_val.quality import QualityHistogram, count_bytes
+
+random.seed(7)
+DATA = bytes([random.choice(b'#-8FFFF') for _ in range(5000)]) + b'I!~'
+
+
+def expected_counts(data):
+    counts = [0] * 256
+    for value in data:
+        counts[value] += 1
+    return counts
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_count_bytes(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(quality, 'numpy', None)
+    elif quality.numpy is None:
+        pytest.skip('numpy not installed')
+    monkeypatch.setattr(quality, 'NUMPY_PIECE', 1000)
+    counts = [0] * 256
+    count_bytes(DATA, counts)
+    count_bytes(DATA[:100], counts)  # counts carried over
+    assert counts == expected_counts(DATA + DATA[:100])
+
+
+def test_histogram_collects_small_reads(monkeypatch):
+    monkeypatch.setattr(quality, 'FLUSH_BYTES', 64)
+    hist = QualityHistogram()
+    for pos in range(0, len(DATA), 30):
+        hist.add(DATA[pos:pos + 30])
+    assert hist.counts == expected_counts(DATA)
+    assert (hist.min(), hist.max()) == (ord('!'), ord('~'))
+
+
+def test_histogram_empty():
+    hist = QualityHistogram()
+    assert (hist.min(), hist.max()) == (1000, -1)
+    assert hist.binning() is None
+    assert hist.report() == {}
+
+
+def test_histogram_merge():
+    hist = QualityHistogram()
+    hist.add(b'III')
+    hist.merge(expected_counts(b'#I'))
+    assert hist.report() == {'35': 1, '73': 4}
+
+
+@pytest.mark.parametrize('data_binning',
+    [
+        (b'#-8F' * 10, 'Illumina 4-level (RTA3)'),
+        (b'8F' * 10, 'Illumina 4-level (RTA3)'),
+        (b"#'07<BFI" * 10, 'Illumina 8-level'),
+        (b'<BF', 'Illumina 8-level'),
+        (b'ACEG', 'unknown'),
+        (bytes(range(33, 75)), None),
+        (b'FFFF', None),  # a single value can't be told apart
+    ])
+def test_histogram_binning(data_binning):
+    (data, binning) = data_binning
+    hist = QualityHistogram()
+    hist.add(data)
+    assert hist.binning() == binning
@@ -0,0 +1,107 @@
+import pytest
+import hashlib, os, shutil
+
+from cgp_seq_input_val import read_backend
+from cgp_seq_input_val.read_backend import PipedReader, select_backend, open_input
+from cgp_seq_input_val.digest import Digester, DigestReader
+from cgp_seq_input_val.seq_validator import SeqValidator
+from cgp_seq_input_val.error_classes import SeqValidationError
+
+test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
+
+with open(os.path.join(test_dir, 'good_read_1.fq'), 'rb') as fp:
+    expected = fp.read()
+
+
+@pytest.mark.parametrize('file_name', ['good_read_1.fq', 'good_read_1.fq.gz', 'good_read_1.fq.bz2'])
+def test_python_backend(file_name):
+    with open_input(os.path.join(test_dir, file_name), 'python') as fp:
+        assert fp.read() == expected
+
+
+def test_python_backend_text():
+    with open_input(os.path.join(test_dir, 'good_read_1.fq.gz'), 'python', text=True) as fp:
+        assert fp.read() == expected.decode()
+
+
+@pytest.mark.skipif(not read_backend.backend_available('isal'), reason='isal not installed')
+def test_isal_backend():
+    with open_input(os.path.join(test_dir, 'good_read_1.fq.gz'), 'isal', threads=2) as fp:
+        assert fp.read() == expected
+
+
+@pytest.mark.parametrize('command_file', [(['gzip', '-d', '-c'], 'good_read_1.fq.gz'),
+                                          (['bzip2', '-d', '-c'], 'good_read_1.fq.bz2')])
+def test_piped_reader(command_file):
+    (command, file_name) = command_file
+    if shutil.which(command[0]) is None:
+        pytest.skip('%s not installed' % command[0])
+    with PipedReader(command, os.path.join(test_dir, file_name)) as fp:
+        assert fp.read() == expected
+
+
+def test_piped_reader_failure():
+    if shutil.which('gzip') is None:
+        pytest.skip('gzip not installed')
+    with pytest.raises(SeqValidationError) as e_info:
+        with PipedReader(['gzip', '-d', '-c'], os.path.join(test_dir, 'good_read_1.fq')) as fp:
+            fp.read()
+    assert "'gzip' failed" in str(e_info.value)
+
+
+def test_select_backend():
+    assert select_backend(None, 'pigz') == 'python'
+    assert select_backend('bz2', 'python') == 'python'
+    assert select_backend('gzip', 'auto') in read_backend.BACKEND_ORDER['gzip']
+
+
+def test_select_backend_unsuitable():
+    with pytest.raises(SeqValidationError) as e_info:
+        select_backend('bz2', 'pigz')
+    assert 'can not read bz2' in str(e_info.value)
+
+
+def test_select_backend_unavailable(monkeypatch):
+    monkeypatch.setattr(read_backend, 'backend_available', lambda backend: backend == 'python')
+    assert select_backend('gzip', 'auto') == 'python'
+    with pytest.raises(SeqValidationError) as e_info:
+        select_backend('gzip', 'pigz')
+    assert 'not available' in str(e_info.value)
+
+
+@pytest.mark.parametrize('engine', ['line', 'block'])
+def test_seq_val_non_seekable_backend(engine, monkeypatch):
+    if shutil.which('gzip') is None:
+        pytest.skip('gzip not installed')
+    # fake a piped backend using gzip
+    monkeypatch.setitem(read_backend.PIPED_COMMANDS, 'pigz', ['gzip', '-d', '-c'])
+    monkeypatch.setattr(read_backend, 'backend_available', lambda backend: True)
+    fq1 = os.path.join(test_dir, 'good_read_1.fq.gz')
+    fq2 = os.path.join(test_dir, 'good_read_2.fq.gz')
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine, backend='pigz')
+    sv.validate()
+    assert sv.pairs == 1
+    assert sv.read_backend == 'pigz'
+
+
+@pytest.mark.parametrize('file_name', ['good_read_1.fq', 'good_read_1.fq.gz', 'good_read_1.fq.bz2'])
+def test_python_backend_digest(file_name):
+    digester = Digester(os.path.join(test_dir, file_name), ['md5'])
+    with open_input(digester.filename, 'python', digester=digester) as fp:
+        assert fp.read() == expected
+    assert digester.position == os.path.getsize(digester.filename)
+    with open(digester.filename, 'rb') as fp:
+        assert digester.hexdigests() == {'md5': hashlib.md5(fp.read()).hexdigest()}
+
+
+def test_piped_reader_digest():
+    if shutil.which('gzip') is None:
+        pytest.skip('gzip not installed')
+    filename = os.path.join(test_dir, 'good_read_1.fq.gz')
+    digester = Digester(filename, ['md5'])
+    source = DigestReader(open(filename, 'rb'), digester)
+    with PipedReader(['gzip', '-d', '-c'], filename, source) as fp:
+        assert fp.read() == expected
+    assert digester.position == os.path.getsize(filename)
+    with open(filename, 'rb') as fp:
+        assert digester.hexdigests() == {'md5': hashlib.md5(fp.read()).hexdigest()}
@@ -0,0 +1,114 @@
+import pytest
+import io, os
+
+from cgp_seq_input_val.record_batch import (BatchReader, RecordBatch, HEADER, SEQ, QUAL,
+                                            pairs_valid, as_records)
+from cgp_seq_input_val.fastq_block import FastqBlockReader, pairs_valid as records_pairs_valid
+from cgp_seq_input_val.fastq_read import FastqFormat
+
+test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
+
+
+def read_all(reader, count):
+    records = []
+    while not reader.finished:
+        records.extend(as_records(reader.read_records(count)))
+    return records
+
+
+def block_records(data, interleaved=False):
+    return FastqBlockReader(io.BytesIO(data), interleaved=interleaved).read_records(1000)
+
+
+@pytest.mark.parametrize('block_size', [1, 5, 64, 1024 * 1024])
+@pytest.mark.parametrize('file_name', ['2_reads_1.fq', 'good_read_i.fq', 'casava_dual_1.fq'])
+def test_batch_matches_block(file_name, block_size):
+    with open(os.path.join(test_dir, file_name), 'rb') as fp:
+        data = fp.read()
+    for count in (1, 2, 1000):
+        reader = BatchReader(io.BytesIO(data), block_size=block_size)
+        assert read_all(reader, count) == block_records(data)
+
+
+def test_batch_is_columnar():
+    data = b'@a/1\nACGT\n+\nIIII\n@b/1\nAC\n+\nJJ\n'
+    batch = BatchReader(io.BytesIO(data)).read_records(10)
+    assert isinstance(batch, RecordBatch)
+    assert len(batch) == 2
+    assert batch.lengths(SEQ).tolist() == [4, 2]
+    assert batch.column(QUAL) == b'IIIIJJ'
+    assert batch.column(HEADER, newlines=True) == b'@a/1\n@b/1\n'
+    assert batch.fields(SEQ) == [b'ACGT', b'AC']
+    assert b''.join(batch.chunks()) == data
+    assert batch[1] == (4, b'@b/1', b'AC', b'+', b'JJ')
+    assert batch[1:].records() == [batch[1]]
+
+
+@pytest.mark.parametrize('data',
+    [
+        b'@a/1\r\nAC\r\nGT\r\n+\r\nII\r\nII \r\n@a/2\nACGT\n+\nIIII\n\n@b/1\nA\n+\nI\n',
+        b'@a/1\nA\n+\nI\n@b/1\nAC\nGT\n+\nIIII\n@c/1\nA\n+\nI',
+        b'@a/1\nA\n+\nI\n@b/1\nA \n+\nI\n',
+        b'@a/1\nA\n+\nI\n@b/1\nACGT\n',
+        b'\n@a/1\nA\n+\nI\n',
+    ])
+def test_batch_irregular_records(data):
+    # irregular data is handed to a FastqBlockReader from the first batch it is in
+    for count in (1, 2, 1000):
+        reader = BatchReader(io.BytesIO(data), block_size=3)
+        assert read_all(reader, count) == block_records(data)
+
+
+def test_batch_interleaved_empty_line():
+    data = b'@a/1\nA\n+\nI\n@a/2\nA\n+\nI\n\n@b/1\nA\n+\nI\n'
+    reader = BatchReader(io.BytesIO(data), interleaved=True)
+    batch = reader.read_records(10)
+    assert isinstance(batch, RecordBatch)
+    assert len(batch) == 2
+    assert reader.finished
+    # after the first read of a pair an empty line is a record
+    data = b'@a/1\nA\n+\nI\n\nA\n+\nI\n'
+    reader = BatchReader(io.BytesIO(data), interleaved=True)
+    assert read_all(reader, 10) == block_records(data, interleaved=True)
+
+
+@pytest.mark.parametrize('mutate, valid',
+    [
+        (None, True),
+        (lambda r: r.replace(b'@r0/2', b'@r0/1'), False),
+        (lambda r: r.replace(b'@r1/2', b'@x1/2'), False),
+        (lambda r: r.replace(b'IIII', b'IIIII'), False),
+        (lambda r: r.replace(b'@r2/2', b'r2/2'), False),
+    ])
+def test_batch_pairs_valid(mutate, valid):
+    data_1 = b''.join([b'@r%d/1\nACGT\n+\nIIII\n' % i for i in range(3)])
+    data_2 = data_1.replace(b'/1', b'/2')
+    if mutate:
+        data_2 = mutate(data_2)
+    batch_1 = BatchReader(io.BytesIO(data_1)).read_records(10)
+    batch_2 = BatchReader(io.BytesIO(data_2)).read_records(10)
+    assert pairs_valid(batch_1, batch_2, FastqFormat.ILLUMINA) == valid
+    assert records_pairs_valid(batch_1.records(), batch_2.records(), FastqFormat.ILLUMINA) == valid
+
+
+def test_batch_alphabet_valid():
+    batch = BatchReader(io.BytesIO(b'@a/1\nACGT\n+\nIIII\n@b/1\nAC.T\n+\nIIII\n')).read_records(10)
+    assert batch[:1].alphabet_valid()
+    assert not batch.alphabet_valid()
+
+
+@pytest.mark.parametrize('data',
+    [
+        b'@a/1\nA\n+\nI\n@b/1\nAC\n+\nII\n@c/1\nA\n+\nI\n@d/1\nA\n+\nI',
+        b'@a/1\nA\n+\nI\n@b/1\nA\nC\n+\nII\n@c/1\nA\n+\nI\n@d/1\nA\n+\nI\n',
+    ])
+@pytest.mark.parametrize('reader_class', [FastqBlockReader, BatchReader])
+def test_batch_tell(data, reader_class):
+    # position of the next record, also after handing over to FastqBlockReader
+    starts = [data.index(b'@%s/1' % name) for name in (b'b', b'c', b'd')]
+    reader = reader_class(io.BytesIO(data), 3)
+    for start in starts:
+        assert len(reader.read_records(1)) == 1
+        assert reader.tell() == start
+    resumed = reader_class(io.BytesIO(data[starts[1]:]), line_no=reader.line_no - 3)
+    assert as_records(resumed.read_records(10)) == block_records(data)[2:]
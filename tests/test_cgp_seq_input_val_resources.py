@@ -0,0 +1,35 @@
+import pytest
+import json, os, subprocess, sys
+
+from cgp_seq_input_val import resources
+from cgp_seq_input_val.resources import ResourceUsage, proc_io
+
+def test_proc_io(tmp_path):
+    path = str(tmp_path / 'io')
+    with open(path, 'w') as fp:
+        fp.write('rchar: 10\nwchar: 20\nsyscr: 1\nread_bytes: 4096\nwrite_bytes: 0\n')
+    assert proc_io(path) == {'read_chars': 10, 'write_chars': 20, 'read_bytes': 4096,
+                             'write_bytes': 0}
+    assert proc_io(str(tmp_path / 'absent')) is None
+
+def test_resource_usage_children(tmp_path):
+    usage = ResourceUsage()
+    # a child touching a small allocation, its peak counts towards the report
+    size = 32 * 1024 * 1024
+    touch = 'x = bytearray(%d); x[::4096] = b"1" * len(x[::4096])' % size
+    subprocess.run([sys.executable, '-c', touch], check=True)
+    report = usage.report()
+    assert report['peak_rss_bytes'] >= size
+    assert report['user_seconds'] + report['system_seconds'] > 0
+    assert report['wall_seconds'] >= 0
+    if os.path.exists(resources.PROC_IO):
+        assert report['io']['read_chars'] > 0
+
+def test_resource_write(tmp_path):
+    path = str(tmp_path / 'resources.json')
+    ResourceUsage().write(path, 'man-valid', 2)
+    with open(path) as fp:
+        report = json.load(fp)
+    assert report['command'] == 'man-valid'
+    assert report['exit_code'] == 2
+    assert 'peak_rss_bytes' in report
@@ -0,0 +1,52 @@
+import pytest
+import os, time
+
+from cgp_seq_input_val import result_cache
+from cgp_seq_input_val.result_cache import ResultCache, cache_key
+
+def test_cache_key(tmp_path):
+    name = str(tmp_path / 'in.fq')
+    with open(name, 'w') as fp:
+        fp.write('@r/1\nA\n+\n#\n')
+    key = cache_key([name], {'qc': 0})
+    assert key == cache_key([name], {'qc': 0})
+    assert key != cache_key([name], {'qc': 10})
+    assert key != cache_key([name, name], {'qc': 0})
+    stat = os.stat(name)
+    os.utime(name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert key != cache_key([name], {'qc': 0})
+
+def test_cache_put_get(tmp_path):
+    cache = ResultCache(str(tmp_path / 'sub' / 'cache.sqlite'))
+    assert cache.get('a') is None
+    cache.put('a', {'report': {'pairs': 1}})
+    assert ResultCache(cache.filename).get('a') == {'report': {'pairs': 1}}
+    cache.put('a', {'error': 'bad'})
+    assert cache.get('a') == {'error': 'bad'}
+
+def test_cache_age(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'cache.sqlite'), max_age=100)
+    now = time.time()
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now)
+    cache.put('a', {'report': 1})
+    cache.put('b', {'report': 2})
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now + 60)
+    assert cache.get('a') == {'report': 1}  # use extends the age
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now + 120)
+    assert cache.get('a') == {'report': 1}
+    assert cache.get('b') is None
+    cache.put('c', {'report': 3})
+    with cache._connect() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM results').fetchone()[0] == 2
+
+def test_cache_size(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'cache.sqlite'), max_bytes=40)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(result_cache.time, 'time', lambda: next(clock))
+    for key in 'abc':
+        cache.put(key, {'report': 'x' * 5})  # 20 bytes each
+    assert cache.get('a') is None
+    assert cache.get('b') is not None
+    cache.put('d', {'report': 'x' * 5})
+    assert cache.get('c') is None  # least recently used
+    assert cache.get('b') is not None
@@ -0,0 +1,45 @@
+import pytest
+import io, os
+
+from cgp_seq_input_val import bgzf, sample
+
+RECORDS = b''.join(b'@r%d/1\nACGT\n+\n@@@@\n' % idx for idx in range(200))
+
+def test_site_fractions():
+    fractions = sample.site_fractions(4)
+    assert len(fractions) == 4
+    assert fractions[0] == 0.0
+    assert fractions == sorted(fractions)
+    assert fractions == sample.site_fractions(4)
+    assert sample.site_fractions(1) == [0.0]
+
+def test_record_start():
+    # quality starting '@' is not a header
+    assert sample.record_start(b'CGT\n+\n@@@@\n@r1/1\nACGT\n+\n@@@@\n') == 11
+    assert sample.record_start(b'/1\nACGT\n+\n@@@@\n@r1/1\nAC') is None
+    assert sample.record_start(b'ACGT') is None
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_site_reader(tmp_path, monkeypatch, compressed):
+    name = str(tmp_path / 'in.fq')
+    if compressed:
+        monkeypatch.setattr(bgzf, 'BLOCK_DATA', 100)
+        with bgzf.BgzfWriter(open(name, 'wb')) as writer:
+            writer.write(RECORDS)
+    else:
+        with open(name, 'wb') as writer:
+            writer.write(RECORDS)
+    fq_fh = sample.open_site(name, 0.5, compressed)
+    reader = sample.site_reader(fq_fh)
+    records = reader.read_records(3)
+    fq_fh.close()
+    assert records[0][0] == 1
+    idx = int(records[0][1][2:-2])
+    assert 90 < idx < 110
+    assert [record[1] for record in records] == [b'@r%d/1' % i for i in range(idx, idx + 3)]
+
+def test_open_site_end(tmp_path):
+    name = str(tmp_path / 'in.fq.gz')
+    with bgzf.BgzfWriter(open(name, 'wb')) as writer:
+        writer.write(RECORDS)
+    assert sample.open_site(name, 0.999, True) is None
@@ -0,0 +1,125 @@
+import pytest
+import io, json, os, time
+
+from argparse import Namespace
+
+from cgp_seq_input_val import seq_batch
+from cgp_seq_input_val.seq_batch import BatchValidator, BatchJob
+from cgp_seq_input_val.seq_validator import SeqValidator
+
+test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
+
+ROWS = [('good_read_1.fq', 'good_read_2.fq'),
+        ('good_read_i.fq', '.'),
+        ('good_read_1.fq', 'diff_2.fq'),
+        ('good_read_1.fq.gz', 'good_read_2.fq.gz'),
+        ('absent_1.fq', 'absent_2.fq')]
+
+def write_manifest(path, rows):
+    manifest = os.path.join(path, 'manifest.json')
+    with open(manifest, 'w') as fp:
+        json.dump({'type': 'IMPORT', 'version': '1.0', 'header': {},
+                   'body': [{'File': file_1, 'File_2': file_2} for (file_1, file_2) in rows]}, fp)
+    return manifest
+
+def test_batch_validate(tmp_path):
+    manifest = write_manifest(str(tmp_path), ROWS)
+    report = BatchValidator(manifest, 0, input_dir=test_dir, processes=2, engine='block').validate()
+    assert (report['passed'], report['failed'], report['cancelled']) == (3, 2, 0)
+    rows = report['rows']
+    assert sorted(rows) == ['1', '2', '3', '4', '5']
+    assert rows['2']['files'] == ['good_read_i.fq', None]
+    assert rows['2']['report']['interleaved'] is True
+    assert rows['3']['status'] == 'failed'
+    assert 'line 1' in rows['3']['error']
+    assert "absent_1.fq' is not a file" in rows['5']['error']
+
+    sv = SeqValidator(os.path.join(test_dir, 'good_read_1.fq'), 0,
+                      file_b=os.path.join(test_dir, 'good_read_2.fq'), progress_pairs=0,
+                      engine='block')
+    sv.validate()
+    assert rows['1'] == {'status': 'passed', 'report': sv.summary(),
+                         'files': ['good_read_1.fq', 'good_read_2.fq']}
+
+def test_batch_fail_fast(tmp_path):
+    manifest = write_manifest(str(tmp_path), ROWS[:3])
+    # one process and the largest first, the failing row is the last
+    report = BatchValidator(manifest, 0, input_dir=test_dir, processes=1, fail_fast=True,
+                            engine='block').validate()
+    assert [report['rows'][row]['status'] for row in '123'] == ['passed', 'passed', 'failed']
+    manifest = write_manifest(str(tmp_path), ROWS[2:])
+    report = BatchValidator(manifest, 0, input_dir=test_dir, processes=1, fail_fast=True,
+                            engine='block').validate()
+    # the missing files fail before any row is started
+    assert [report['rows'][row]['status'] for row in '123'] == ['cancelled', 'cancelled', 'failed']
+
+def failing_or_slow_row(files, qc_reads, options, cache_file=None):
+    if files[1] is not None and files[1].endswith('diff_2.fq'):
+        return {'status': 'failed', 'error': 'mismatch'}
+    time.sleep(60)
+    return {'status': 'passed', 'report': {}}
+
+def test_batch_fail_fast_running(tmp_path, monkeypatch):
+    # forked workers see the patched row validation
+    monkeypatch.setattr(seq_batch, 'validate_row', failing_or_slow_row)
+    manifest = write_manifest(str(tmp_path), ROWS[:3])
+    started = time.time()
+    report = BatchValidator(manifest, 0, input_dir=test_dir, processes=3, fail_fast=True,
+                            engine='block').validate()
+    assert time.time() - started < 30
+    assert [report['rows'][row]['status'] for row in '123'] == ['cancelled', 'cancelled', 'failed']
+    assert (report['failed'], report['cancelled']) == (1, 2)
+
+def test_batch_skipped(tmp_path):
+    manifest = write_manifest(str(tmp_path), [ROWS[0], ('sample.bam', '.'), ('sample.cram', '.')])
+    report = BatchValidator(manifest, 0, input_dir=test_dir, processes=2,
+                            fail_fast=True, engine='block').validate()
+    assert (report['passed'], report['failed'], report['skipped']) == (1, 0, 2)
+    assert report['rows']['2'] == {'status': 'skipped', 'files': ['sample.bam', None]}
+    assert report['rows']['3']['status'] == 'skipped'
+
+def test_batch_next_job():
+    jobs = [BatchJob(idx, files, test_dir) for (idx, files) in enumerate(ROWS[:4], 1)]
+    assert [job.compressed for job in jobs] == [False, False, False, True]
+    validator = BatchValidator('manifest.json', 0, processes=4, decompressors=1)
+    pending = sorted(jobs, key=lambda job: job.size, reverse=True)
+    assert validator.next_job(pending, 1).row == 1
+    assert validator.next_job(list(reversed(pending)), 0).row == 4
+    assert validator.next_job([jobs[3]], 1) is None
+
+def test_batch_not_manifest(tmp_path):
+    manifest = str(tmp_path / 'other.json')
+    with open(manifest, 'w') as fp:
+        json.dump({'body': 'x'}, fp)
+    with pytest.raises(seq_batch.SeqValidationError):
+        BatchValidator(manifest, 0).jobs()
+    with pytest.raises(ValueError):
+        BatchValidator(manifest, 0, engine='parallel')
+
+def test_validate_manifest_files(tmp_path):
+    manifest = write_manifest(str(tmp_path), ROWS[:2])
+    args = Namespace(input=manifest, input_dir=test_dir, report=io.StringIO(), processes=1,
+                     decompressors=None, fail_fast=False, qc=0, engine='block', backend='auto',
+                     threads=1, stats=False, strict=False, sample=0, cache=None, digests=None,
+                     no_cache=True)
+    seq_batch.validate_manifest_files(args)
+    assert json.loads(args.report.getvalue())['passed'] == 2
+    args.input = write_manifest(str(tmp_path), [ROWS[0], ('sample.bam', '.')])
+    args.report = io.StringIO()
+    seq_batch.validate_manifest_files(args)
+    assert json.loads(args.report.getvalue())['skipped'] == 1
+    args.input = write_manifest(str(tmp_path), ROWS[2:3])
+    args.report = io.StringIO()
+    with pytest.raises(SystemExit) as e_info:
+        seq_batch.validate_manifest_files(args)
+    assert '1 of 1 manifest rows' in str(e_info.value)
+
+def test_batch_cache(tmp_path):
+    manifest = write_manifest(str(tmp_path), ROWS[:3])
+    cache = str(tmp_path / 'cache.sqlite')
+    first = BatchValidator(manifest, 0, input_dir=test_dir, processes=1, engine='block',
+                           cache=cache).validate()
+    second = BatchValidator(manifest, 0, input_dir=test_dir, processes=1, engine='block',
+                            cache=cache).validate()
+    assert second['rows']['1']['report'] == dict(first['rows']['1']['report'], cached=True)
+    assert second['rows']['3'] == first['rows']['3']
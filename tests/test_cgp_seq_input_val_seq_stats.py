@@ -0,0 +1,75 @@
+import pytest
+import json
+
+from cgp_seq_input_val import seq_stats
+from cgp_seq_input_val.seq_stats import SeqStats
+
+CASAVA = [b'@A00471:89:HMTWVDMXX:1:1101:2871:1016 1:N:0:TTGGACGT',
+          b'@A00471:89:HMTWVDMXX:1:1101:2872:1016 1:Y:0:TTGGACGT',
+          b'@A00471:89:HMTWVDMXX:2:1102:2871:1016 1:N:0:TTGGACGT',
+          b'@A00471:90:HMTWVDMYY:1:1101:2871:1016 1:N:0:TTGGACGT']
+SEQS = [b'ACGTN', b'GGCCA', b'acgtnn', b'AAAAX']
+
+
+def test_stats_report():
+    stats = SeqStats()
+    stats.add_reads(CASAVA, SEQS)
+    report = stats.report()
+    assert report['reads'] == 4
+    assert report['read_length'] == {'5': 3, '6': 1}
+    assert report['bases'] == {'A': 7, 'C': 4, 'G': 4, 'T': 2, 'N': 3, 'other': 1}
+    assert report['gc_content'] == round(8 / 17, 4)
+    assert report['n_content'] == round(3 / 21, 4)
+    assert report['filtered'] == {'N': 3, 'Y': 1}
+    assert report['tiles'] == {'HMTWVDMXX': {'1': {'1101': 2}, '2': {'1102': 1}},
+                               'HMTWVDMYY': {'1': {'1101': 1}}}
+
+
+def test_stats_not_casava():
+    stats = SeqStats()
+    stats.add_records([(1, b'@HWUSI-EAS100R:6:73:941:1973#0/1', b'ACGT', b'+', b'IIII')])
+    report = stats.report()
+    assert stats.casava is False
+    assert 'tiles' not in report and 'filtered' not in report
+    assert report['gc_content'] == 0.5
+
+
+def test_stats_empty():
+    report = SeqStats().report()
+    assert report['reads'] == 0
+    assert report['gc_content'] is None and report['n_content'] is None
+
+
+def test_stats_merge():
+    whole = SeqStats()
+    whole.add_reads(CASAVA, SEQS)
+    parts = SeqStats()
+    for idx in range(len(SEQS)):
+        part = SeqStats()
+        part.add_reads(CASAVA[idx:idx + 1], SEQS[idx:idx + 1])
+        parts.merge(part)
+    parts.merge(SeqStats())  # a worker with no reads
+    assert parts.report() == whole.report()
+
+
+def test_stats_tiles_capped(monkeypatch):
+    monkeypatch.setattr(seq_stats, 'MAX_TILES', 2)
+    stats = SeqStats()
+    stats.add_reads(CASAVA + CASAVA[:1], SEQS + SEQS[:1])
+    tiles = stats.tile_counts()
+    assert len(stats.tiles) == 2
+    assert tiles['HMTWVDMXX']['1']['1101'] == 3
+    assert tiles['other'] == {'other': {'other': 2}}
+
+
+def test_stats_unknown_tile():
+    stats = SeqStats()
+    stats.add_reads([b'@A:1:2 1:N:0:ACGT'], [b'ACGT'])
+    assert stats.tile_counts() == {'unknown': {'unknown': {'unknown': 1}}}
+
+
+def test_stats_state_round_trip():
+    stats = SeqStats()
+    stats.add_reads(CASAVA, SEQS)
+    state = json.loads(json.dumps(stats.state()))
+    assert SeqStats.from_state(state).report() == stats.report()
@@ -1,8 +1,9 @@
 import pytest
-import os, sys, tempfile
+import io, json, os, sys, tempfile
 
+from cgp_seq_input_val import seq_validator, bgzf, parallel
 from cgp_seq_input_val.seq_validator import SeqValidator
-from cgp_seq_input_val.error_classes import SeqValidationError
+from cgp_seq_input_val.error_classes import BackendError, SeqValidationError
 
 test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
 
@@ -94,3 +95,581 @@ def test_seq_val_fq_name():
         fq2 = os.path.join(test_dir, 'diff_2.fq')
         sv = SeqValidator(fq1, 1, out_fh=None, file_b=fq2, progress_pairs=0)
         sv.validate()
+
+def run_engine(engine, fq1, fq2, out_fh=None, stats=False, strict=False):
+    sv = SeqValidator(fq1, 0, out_fh=out_fh, file_b=fq2, progress_pairs=0, engine=engine,
+                      stats=stats, strict=strict)
+    try:
+        sv.validate()
+    except SeqValidationError as ve:
+        return str(ve)
+    report = io.StringIO()
+    sv.report(report)
+    return report.getvalue()
+
+@pytest.mark.parametrize('files',
+    [
+        ('good_read_1.fq', 'good_read_2.fq'),
+        ('good_read_1.fq.gz', 'good_read_2.fq.gz'),
+        ('good_read_1.fq.bz2', 'good_read_2.fq.bz2'),
+        ('good_read_i.fq', None),
+        ('casava_dual_1.fq', 'casava_dual_2.fq'),
+        ('good_read_1.fq', '2_reads_2.fq'),
+        ('2_reads_1.fq', 'good_read_2.fq'),
+        ('good_read_1.fq', 'r1_reads_in_2.fq'),
+        ('good_read_2.fq', 'r2_reads_in_1.fq'),
+        ('good_read_1.fq', 'diff_2.fq'),
+        ('seq-shorter_1.fq', 'good_read_2.fq'),
+        ('good_read_1.fq', 'qual-shorter_1.fq'),
+        ('bad_header_1.fq', 'good_read_2.fq'),
+        ('seq-shorter_1.fq', None),
+    ])
+@pytest.mark.parametrize('engine', ['block', 'batch', 'threaded', 'parallel'])
+def test_seq_val_engines_match(files, engine):
+    fq1 = os.path.join(test_dir, files[0])
+    fq2 = None if files[1] is None else os.path.join(test_dir, files[1])
+    assert run_engine(engine, fq1, fq2) == run_engine('line', fq1, fq2)
+
+@pytest.mark.parametrize('engine', ['block', 'batch', 'threaded', 'parallel'])
+def test_seq_val_block_output_matches(engine):
+    fq1 = os.path.join(test_dir, 'casava_dual_1.fq')
+    fq2 = os.path.join(test_dir, 'casava_dual_2.fq')
+    line_out = io.StringIO()
+    run_engine('line', fq1, fq2, out_fh=line_out)
+    block_out = io.BytesIO()
+    run_engine(engine, fq1, fq2, out_fh=block_out)
+    assert block_out.getvalue().decode() == line_out.getvalue()
+
+def test_seq_val_line_output_batches(monkeypatch):
+    monkeypatch.setattr(seq_validator, 'BATCH_RECORDS', 3)
+    fq1 = os.path.join(test_dir, 'casava_dual_1.fq')
+    fq2 = os.path.join(test_dir, 'casava_dual_2.fq')
+    line_out = io.StringIO()
+    run_engine('line', fq1, fq2, out_fh=line_out)
+    block_out = io.BytesIO()
+    run_engine('block', fq1, fq2, out_fh=block_out)
+    assert block_out.getvalue().decode() == line_out.getvalue()
+
+@pytest.mark.parametrize('engine', ['block', 'batch', 'threaded', 'parallel'])
+def test_seq_val_block_no_mate(engine):
+    with pytest.raises(SeqValidationError) as e_info:
+        fqi = os.path.join(test_dir, 'good_read_1.fq')
+        sv = SeqValidator(fqi, 1, file_b=None, progress_pairs=0, engine=engine)
+        sv.validate()
+    assert 'has no mate' in str(e_info.value)
+
+def test_seq_val_threaded_small_batches(monkeypatch):
+    # force many batches so records are carried between them
+    monkeypatch.setattr(seq_validator, 'BATCH_RECORDS', 2)
+    fq1 = os.path.join(test_dir, 'casava_dual_1.fq')
+    fq2 = os.path.join(test_dir, 'casava_dual_2.fq')
+    assert run_engine('threaded', fq1, fq2) == run_engine('line', fq1, fq2)
+    fq2 = os.path.join(test_dir, 'good_read_2.fq')
+    assert run_engine('threaded', fq1, fq2) == run_engine('line', fq1, fq2)
+
+def test_seq_val_bad_engine():
+    with pytest.raises(ValueError) as e_info:
+        fqi = os.path.join(test_dir, 'good_read_i.fq')
+        SeqValidator(fqi, 1, progress_pairs=0, engine='BAD')
+
+def interleaved_records(mutate=None):
+    with open(os.path.join(test_dir, 'good_read_i.fq'), 'rb') as fp:
+        lines = fp.read().splitlines()
+    records = []
+    for idx in range(60):
+        for member in (0, 4):
+            record = lines[member:member + 4]
+            records.append([record[0].replace(b'#6/', b'#%d/' % idx)] + record[1:])
+    if mutate:
+        mutate(records)
+    return records
+
+def fastq_bytes(records):
+    return b'\n'.join([b'\n'.join(record) for record in records]) + b'\n'
+
+def write_interleaved_bgzf(path, mutate=None):
+    with bgzf.BgzfWriter(open(path, 'wb')) as writer:
+        writer.write(fastq_bytes(interleaved_records(mutate)))
+
+def _truncate_qual(records):
+    records[51][3] = records[51][3][:-1]
+
+def _bad_header(records):
+    records[40][0] = records[40][0].replace(b'/', b'|')
+
+def _multi_line(records):
+    records[30][1:] = [records[30][1][:9], records[30][1][9:], b'+',
+                       records[30][3][:9], records[30][3][9:]]
+
+def _empty_line(records):
+    records.insert(50, [b''])
+
+def _pair_mismatch(records):
+    records[55][0] = records[55][0].replace(b'#', b'#9')
+
+@pytest.mark.parametrize('mutate', [None, _truncate_qual, _bad_header, _multi_line,
+                                    _empty_line, _pair_mismatch])
+@pytest.mark.parametrize('qc', [0, 5])
+def test_seq_val_parallel_matches(tmp_path, monkeypatch, mutate, qc):
+    # small blocks and chunks so the file is split between many workers
+    monkeypatch.setattr(bgzf, 'BLOCK_DATA', 1000)
+    monkeypatch.setattr(parallel, 'CHUNK_BYTES', 1000)
+    fqi = str(tmp_path / 'interleaved.fq.gz')
+    write_interleaved_bgzf(fqi, mutate)
+    assert len(bgzf.chunk_offsets(fqi, parallel.CHUNK_BYTES)) > 4
+    results = []
+    for engine in ('block', 'parallel'):
+        sv = SeqValidator(fqi, qc, progress_pairs=0, engine=engine, processes=2, stats=True)
+        try:
+            sv.validate()
+            results.append((sv.pairs, sv.q_min, sv.q_max, sv.stats.report()))
+        except SeqValidationError as ve:
+            results.append(str(ve))
+    assert results[0] == results[1]
+
+def _read_2_longer(records):
+    records.append(list(records[-1]))
+
+@pytest.mark.parametrize('mutate', [None, _truncate_qual, _bad_header, _multi_line,
+                                    _empty_line, _pair_mismatch, _read_2_longer])
+@pytest.mark.parametrize('interleaved', [True, False])
+@pytest.mark.parametrize('qc', [0, 5])
+def test_seq_val_parallel_mapped_matches(tmp_path, monkeypatch, mutate, interleaved, qc):
+    # small chunks so the files are split between many workers
+    monkeypatch.setattr(parallel, 'CHUNK_BYTES', 1000)
+    monkeypatch.setattr(parallel, 'COUNT_BYTES', 100)
+    records = interleaved_records()
+    if interleaved:
+        fq1 = str(tmp_path / 'interleaved.fq')
+        fq2 = None
+        (tmp_path / 'interleaved.fq').write_bytes(fastq_bytes(interleaved_records(mutate)))
+    else:
+        fq1 = str(tmp_path / 'paired_1.fq')
+        fq2 = str(tmp_path / 'paired_2.fq')
+        read_2 = records[1::2]
+        if mutate:
+            mutate(read_2)
+        (tmp_path / 'paired_1.fq').write_bytes(fastq_bytes(records[0::2]))
+        (tmp_path / 'paired_2.fq').write_bytes(fastq_bytes(read_2))
+    results = []
+    for engine in ('block', 'parallel'):
+        sv = SeqValidator(fq1, qc, file_b=fq2, progress_pairs=0, engine=engine, processes=2,
+                          stats=True)
+        try:
+            sv.validate()
+            results.append((sv.pairs, sv.q_min, sv.q_max, sv.stats.report()))
+        except SeqValidationError as ve:
+            results.append(str(ve))
+    assert results[0] == results[1]
+
+@pytest.mark.parametrize('files',
+    [
+        ('good_read_i.fq.gz', None),
+        ('good_read_1.fq.gz', 'good_read_2.fq.gz'),
+    ])
+def test_seq_val_parallel_not_bgzf(files):
+    fq1 = os.path.join(test_dir, files[0])
+    fq2 = None if files[1] is None else os.path.join(test_dir, files[1])
+    assert run_engine('parallel', fq1, fq2) == run_engine('line', fq1, fq2)
+
+@pytest.mark.parametrize('engine', ['line', 'block', 'batch'])
+def test_seq_val_quality_histogram(engine):
+    fqi = os.path.join(test_dir, 'good_read_i.fq')
+    report = json.loads(run_engine(engine, fqi, None))
+    with open(fqi) as fp:
+        quals = ''.join(fp.read().splitlines()[3::4])
+    assert report['quality_histogram'] == dict([(str(ord(char)), quals.count(char))
+                                                for char in set(quals)])
+    assert report['quality_ascii_range'] == [ord(min(quals)), ord(max(quals))]
+    assert report['quality_binning'] is None
+
+@pytest.mark.parametrize('files',
+    [
+        ('good_read_1.fq.gz', 'good_read_2.fq.gz'),
+        ('good_read_i.fq', None),
+        ('casava_dual_1.fq', 'casava_dual_2.fq'),
+    ])
+@pytest.mark.parametrize('engine', ['block', 'batch', 'threaded', 'parallel'])
+def test_seq_val_stats_engines_match(files, engine):
+    fq1 = os.path.join(test_dir, files[0])
+    fq2 = None if files[1] is None else os.path.join(test_dir, files[1])
+    assert run_engine(engine, fq1, fq2, stats=True) == run_engine('line', fq1, fq2, stats=True)
+
+def test_seq_val_stats_casava():
+    fq1 = os.path.join(test_dir, 'casava_dual_1.fq')
+    fq2 = os.path.join(test_dir, 'casava_dual_2.fq')
+    report = json.loads(run_engine('block', fq1, fq2, stats=True))
+    assert 'stats' not in json.loads(run_engine('block', fq1, fq2))
+    stats = report['stats']
+    assert stats['reads'] == report['pairs'] * 2
+    assert sum(stats['filtered'].values()) == stats['reads']
+    assert sum([count for lanes in stats['tiles'].values() for tiles in lanes.values()
+                for count in tiles.values()]) == stats['reads']
+
+def _bad_base(records):
+    records[45][1] = records[45][1][:7] + b'X' + records[45][1][8:]
+
+def _bad_qual(records):
+    records[20][3] = records[20][3][:-1] + b'\x7f'
+
+def _bad_base_then_header(records):
+    _bad_base(records)
+    records[47][0] = records[47][0].replace(b'/', b'|')
+
+def _header_then_bad_qual(records):
+    _bad_header(records)
+    records[41][3] = records[41][3][:-1] + b' '
+
+@pytest.mark.parametrize('mutate', [None, _bad_base, _bad_qual, _bad_base_then_header,
+                                    _header_then_bad_qual, _pair_mismatch])
+@pytest.mark.parametrize('interleaved', [True, False])
+def test_seq_val_strict_engines_match(tmp_path, monkeypatch, mutate, interleaved):
+    # small batches and chunks so errors are found part way through
+    monkeypatch.setattr(seq_validator, 'BATCH_RECORDS', 16)
+    monkeypatch.setattr(parallel, 'CHUNK_BYTES', 1000)
+    monkeypatch.setattr(parallel, 'COUNT_BYTES', 100)
+    records = interleaved_records(mutate)
+    if interleaved:
+        fq1 = str(tmp_path / 'interleaved.fq')
+        fq2 = None
+        (tmp_path / 'interleaved.fq').write_bytes(fastq_bytes(records))
+    else:
+        fq1 = str(tmp_path / 'paired_1.fq')
+        fq2 = str(tmp_path / 'paired_2.fq')
+        (tmp_path / 'paired_1.fq').write_bytes(fastq_bytes(records[0::2]))
+        (tmp_path / 'paired_2.fq').write_bytes(fastq_bytes(records[1::2]))
+    expected = run_engine('line', fq1, fq2, strict=True)
+    if mutate in (_bad_base, _bad_base_then_header):
+        assert "invalid sequence character 'X' at position 8" in expected
+    elif mutate is None:
+        assert expected == run_engine('line', fq1, fq2)
+    for engine in ('block', 'batch', 'threaded', 'parallel'):
+        assert run_engine(engine, fq1, fq2, strict=True) == expected
+
+class Interrupted(Exception):
+    pass
+
+def write_pairs(path, ext, interleaved, monkeypatch):
+    reads = [b'@r%d/%d\n%s\n+\n%s\n' % (idx, member, b'ACGTN'[idx % 5:] * 3,
+                                         bytes([35 + (idx + member) % 40]) * len(b'ACGTN'[idx % 5:]) * 3)
+             for idx in range(40) for member in (1, 2)]
+    names = [os.path.join(path, 'in_i' + ext)] if interleaved else \
+        [os.path.join(path, 'in_%d' % member + ext) for member in (1, 2)]
+    contents = [b''.join(reads)] if interleaved else [b''.join(reads[0::2]), b''.join(reads[1::2])]
+    for (name, data) in zip(names, contents):
+        if ext == '.fq.gz':
+            monkeypatch.setattr(bgzf, 'BLOCK_DATA', 100)
+            with bgzf.BgzfWriter(open(name, 'wb')) as writer:
+                writer.write(data)
+        elif ext == '.fq.bz2':
+            import bz2
+            with bz2.open(name, 'wb') as writer:
+                writer.write(data)
+        else:
+            with open(name, 'wb') as writer:
+                writer.write(data)
+    return names + [None] if interleaved else names
+
+@pytest.mark.parametrize('ext', ['.fq', '.fq.gz', '.fq.bz2'])
+@pytest.mark.parametrize('interleaved', [False, True])
+@pytest.mark.parametrize('engine', ['block', 'batch'])
+def test_seq_val_checkpoint_resume(tmp_path, monkeypatch, ext, interleaved, engine):
+    monkeypatch.setattr(seq_validator, 'BATCH_RECORDS', 6)
+    (fq1, fq2) = write_pairs(str(tmp_path), ext, interleaved, monkeypatch)
+    checkpoint = str(tmp_path / 'progress.json')
+    expected = run_engine(engine, fq1, fq2, stats=True)
+
+    save = seq_validator.Checkpoint.save
+    def interrupt(self, state):
+        save(self, state)
+        if state['pairs'] >= 9:
+            raise Interrupted()
+    monkeypatch.setattr(seq_validator.Checkpoint, 'save', interrupt)
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine, stats=True,
+                      checkpoint=checkpoint, checkpoint_interval=0)
+    with pytest.raises(Interrupted):
+        sv.validate()
+    with open(checkpoint) as fp:
+        state = json.load(fp)
+    assert 9 <= state['pairs'] < 40
+    assert (state['inputs'][0]['virtual_offset'] is not None) == (ext == '.fq.gz')
+
+    monkeypatch.setattr(seq_validator.Checkpoint, 'save', save)
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine, stats=True,
+                      checkpoint=checkpoint, resume=True)
+    sv.validate()
+    report = io.StringIO()
+    sv.report(report)
+    assert report.getvalue() == expected
+    assert not os.path.exists(checkpoint)
+
+def test_seq_val_checkpoint_mismatch(tmp_path, monkeypatch):
+    (fq1, fq2) = write_pairs(str(tmp_path), '.fq', False, monkeypatch)
+    checkpoint = str(tmp_path / 'progress.json')
+    monkeypatch.setattr(seq_validator, 'BATCH_RECORDS', 6)
+    monkeypatch.setattr(seq_validator.Checkpoint, 'remove', lambda self: None)
+    SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', checkpoint=checkpoint,
+                 checkpoint_interval=0).validate()
+    with pytest.raises(SeqValidationError) as e_info:
+        SeqValidator(fq1, 5, file_b=fq2, progress_pairs=0, engine='block',
+                     checkpoint=checkpoint, resume=True).validate()
+    assert 'does not match' in str(e_info.value)
+
+def test_seq_val_checkpoint_engines():
+    fqi = os.path.join(test_dir, 'good_read_i.fq')
+    for kwargs in ({'engine': 'line'}, {'engine': 'block', 'out_fh': io.BytesIO()}):
+        with pytest.raises(SeqValidationError):
+            SeqValidator(fqi, 0, progress_pairs=0, checkpoint='x.json', **kwargs)
+
+@pytest.mark.parametrize('engine', ['block', 'batch'])
+def test_seq_val_checkpoint_resume_error(tmp_path, monkeypatch, engine):
+    monkeypatch.setattr(seq_validator, 'BATCH_RECORDS', 6)
+    (fq1, fq2) = write_pairs(str(tmp_path), '.fq', False, monkeypatch)
+    with open(fq2, 'rb') as fp:
+        data = fp.read()
+    with open(fq2, 'wb') as fp:
+        fp.write(data.replace(b'@r30/2', b'@x30/2'))
+    checkpoint = str(tmp_path / 'progress.json')
+    expected = run_engine(engine, fq1, fq2)
+    assert 'line 91 ' in expected
+
+    monkeypatch.setattr(seq_validator.Checkpoint, 'remove', lambda self: None)
+    run = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine,
+                       checkpoint=checkpoint, checkpoint_interval=0)
+    with pytest.raises(SeqValidationError):
+        run.validate()
+    with open(checkpoint) as fp:
+        assert json.load(fp)['pairs'] == 30
+    run = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine,
+                       checkpoint=checkpoint, resume=True)
+    with pytest.raises(SeqValidationError) as e_info:
+        run.validate()
+    assert str(e_info.value) == expected
+
+@pytest.mark.parametrize('engine', ['block', 'batch'])
+def test_seq_val_sample_complete(engine):
+    fq1 = os.path.join(test_dir, 'good_read_1.fq')
+    fq2 = os.path.join(test_dir, 'good_read_2.fq')
+    expected = json.loads(run_engine(engine, fq1, fq2))
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine, sample_sites=4)
+    sv.validate()
+    report = io.StringIO()
+    sv.report(report)
+    sampled = json.loads(report.getvalue())
+    assert sampled.pop('sampled') == {'sites': 1, 'pairs_per_site': 2000, 'complete': True}
+    assert sampled == expected
+
+@pytest.mark.parametrize('ext', ['.fq', '.fq.gz', '.fq.bz2'])
+@pytest.mark.parametrize('interleaved', [False, True])
+@pytest.mark.parametrize('engine', ['block', 'batch'])
+def test_seq_val_sample_sites(tmp_path, monkeypatch, ext, interleaved, engine):
+    monkeypatch.setattr(seq_validator.sample, 'SAMPLE_PAIRS', 5)
+    (fq1, fq2) = write_pairs(str(tmp_path), ext, interleaved, monkeypatch)
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine, sample_sites=3)
+    sv.validate()
+    report = io.StringIO()
+    sv.report(report)
+    sampled = json.loads(report.getvalue())
+    if ext == '.fq.bz2':  # no random access, the start of the file is sampled
+        assert sampled['sampled']['sites'] == 1
+        assert sampled['pairs'] == 15
+    else:
+        assert sampled['sampled']['sites'] == 3
+        assert 5 < sampled['pairs'] <= 15  # a site near the end holds fewer pairs
+    assert sampled['sampled']['complete'] is False
+
+@pytest.mark.parametrize('engine', ['block', 'batch'])
+def test_seq_val_sample_error(tmp_path, monkeypatch, engine):
+    monkeypatch.setattr(seq_validator.sample, 'SAMPLE_PAIRS', 5)
+    (fq1, fq2) = write_pairs(str(tmp_path), '.fq', False, monkeypatch)
+    with open(fq2, 'rb') as fp:
+        data = fp.read()
+    with open(fq2, 'wb') as fp:
+        fp.write(data.replace(b'@r10/2', b'@x10/2'))
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine, sample_sites=3)
+    with pytest.raises(SeqValidationError) as e_info:
+        sv.validate()
+    assert 'sampled at 13.4% of the input' in str(e_info.value)
+
+def test_seq_val_sample_not_paired():
+    fq1 = os.path.join(test_dir, 'good_read_1.fq')
+    fq2 = os.path.join(test_dir, 'good_read_2.fq')
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', sample_sites=2)
+    validate_record = seq_validator.fastq_block.record_validator('Casava_1.8')
+    records_1 = [(1, b'@a 1:N:0:1', b'A', b'+', b'#'), (5, b'@b 1:N:0:1', b'A', b'+', b'#')]
+    records_2 = [(1, b'@b 2:N:0:1', b'A', b'+', b'#')]
+    assert sv.align_mates(records_1, records_2, validate_record) == (1, 0)
+    with pytest.raises(SeqValidationError) as e_info:
+        sv.align_mates(records_1[:1], records_2, validate_record)
+    assert 'may not be paired' in str(e_info.value)
+
+def test_seq_val_sample_options():
+    fqi = os.path.join(test_dir, 'good_read_i.fq')
+    for kwargs in ({'checkpoint': 'x.json'}, {'out_fh': io.BytesIO()}):
+        with pytest.raises(SeqValidationError):
+            SeqValidator(fqi, 0, progress_pairs=0, engine='block', sample_sites=2, **kwargs)
+
+def test_seq_val_cache(tmp_path, monkeypatch):
+    fq1 = os.path.join(test_dir, 'good_read_1.fq')
+    fq2 = os.path.join(test_dir, 'good_read_2.fq')
+    cache = seq_validator.ResultCache(str(tmp_path / 'cache.sqlite'))
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache)
+    sv.validate()
+    expected = sv.summary()
+    assert 'cached' not in expected
+
+    def fail(self):
+        raise AssertionError('validated')
+    monkeypatch.setattr(SeqValidator, 'validate_input', fail)
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache)
+    sv.validate()
+    assert sv.summary() == dict(expected, cached=True)
+    with pytest.raises(AssertionError):  # different options
+        SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache,
+                     stats=True).validate()
+    with pytest.raises(AssertionError):  # different engine
+        SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='line', cache=cache).validate()
+
+def test_seq_val_cache_read_backend(tmp_path, monkeypatch):
+    fq1 = os.path.join(test_dir, 'good_read_1.fq.gz')
+    fq2 = os.path.join(test_dir, 'good_read_2.fq.gz')
+    cache = seq_validator.ResultCache(str(tmp_path / 'cache.sqlite'))
+    SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache,
+                 backend='python').validate()
+
+    def fail(self):
+        raise AssertionError('validated')
+    monkeypatch.setattr(SeqValidator, 'validate_input', fail)
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache,
+                      backend='python')
+    sv.validate()
+    assert sv.summary()['cached'] and sv.summary()['read_backend'] == 'python'
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache,
+                      backend='python')
+    sv.read_backend = 'pigz'  # as if resolved from auto
+    with pytest.raises(AssertionError):
+        sv.validate()
+
+def test_seq_val_cache_unusable(tmp_path, capsys):
+    fq1 = os.path.join(test_dir, 'good_read_1.fq')
+    fq2 = os.path.join(test_dir, 'good_read_2.fq')
+    not_dir = tmp_path / 'file'
+    not_dir.write_text('')
+    cache = seq_validator.ResultCache(str(not_dir / 'cache.sqlite'))
+    assert cache.disabled
+    assert 'WARNING: result cache' in capsys.readouterr().err
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache)
+    sv.validate()
+    expected = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block')
+    expected.validate()
+    assert sv.summary() == expected.summary()
+
+def test_seq_val_cache_error(tmp_path, monkeypatch):
+    fq1 = os.path.join(test_dir, 'good_read_1.fq')
+    fq2 = os.path.join(test_dir, 'diff_2.fq')
+    cache = seq_validator.ResultCache(str(tmp_path / 'cache.sqlite'))
+    with pytest.raises(SeqValidationError) as e_info:
+        SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache).validate()
+    monkeypatch.setattr(SeqValidator, 'validate_input', None)
+    with pytest.raises(SeqValidationError) as cached_info:
+        SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache).validate()
+    assert str(cached_info.value) == str(e_info.value)
+    with pytest.raises(SeqValidationError):
+        SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache,
+                     out_fh=io.BytesIO())
+
+def test_seq_val_cache_backend_error(tmp_path, monkeypatch):
+    fq1 = os.path.join(test_dir, 'good_read_1.fq')
+    fq2 = os.path.join(test_dir, 'good_read_2.fq')
+    cache = seq_validator.ResultCache(str(tmp_path / 'cache.sqlite'))
+
+    def fail(self):
+        raise BackendError("'pigz' failed (exit 1)")
+    with monkeypatch.context() as patch:
+        patch.setattr(SeqValidator, 'validate_input', fail)
+        with pytest.raises(BackendError):
+            SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block',
+                         cache=cache).validate()
+    # not cached, validated again
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine='block', cache=cache)
+    sv.validate()
+    assert 'cached' not in sv.summary()
+
+def file_md5(filename):
+    import hashlib
+    with open(filename, 'rb') as fp:
+        return hashlib.md5(fp.read()).hexdigest()
+
+@pytest.mark.parametrize('engine', ['line', 'block', 'batch', 'threaded', 'parallel'])
+@pytest.mark.parametrize('files', [('good_read_1.fq', 'good_read_2.fq'),
+                                   ('good_read_1.fq.gz', 'good_read_2.fq.gz'),
+                                   ('good_read_i.fq', None)])
+def test_seq_val_digests(engine, files):
+    (fq1, fq2) = [None if name is None else os.path.join(test_dir, name) for name in files]
+    sv = SeqValidator(fq1, 0, file_b=fq2, progress_pairs=0, engine=engine, processes=2,
+                      digests=('md5', 'sha256'))
+    sv.validate()
+    checksums = sv.summary()['checksums']
+    assert sorted(checksums) == sorted(set([fq1, fq2 or fq1]))
+    for (filename, digests) in checksums.items():
+        assert digests['md5'] == file_md5(filename)
+        assert sorted(digests) == ['md5', 'sha256']
+
+def test_seq_val_digests_output(tmp_path):
+    from argparse import Namespace
+    out = str(tmp_path / 'out.fq.gz')
+    args = Namespace(input=[os.path.join(test_dir, 'good_read_1.fq.bz2'),
+                            os.path.join(test_dir, 'good_read_2.fq.bz2')],
+                     qc=0, output=out, engine='block', backend='python', threads=1,
+                     write_backend='python', compress_level=6, processes=None, stats=False,
+                     strict=False, checkpoint=None, checkpoint_interval=600, resume=False,
+                     sample=0, cache=None, no_cache=True, digests=['md5'], performance=False,
+                     resources=True, profiler=None, report=io.StringIO())
+    seq_validator.validate_seq_files(args)
+    report = json.loads(args.report.getvalue())
+    assert report['resources']['peak_rss_bytes'] > 0
+    checksums = report['checksums']
+    assert checksums == dict((filename, {'md5': file_md5(filename)})
+                             for filename in args.input + [out])
+
+def test_seq_val_digests_invalid():
+    with pytest.raises(ValueError):
+        SeqValidator(os.path.join(test_dir, 'good_read_i.fq'), 0, digests=('crc',))
+
+@pytest.mark.parametrize('engine', ['block', 'batch'])
+@pytest.mark.parametrize('file_name', ['good_read_i.fq', 'good_read_i.fq.gz'])
+def test_seq_val_performance(tmp_path, engine, file_name):
+    fqi = os.path.join(test_dir, file_name)
+    out_fh = io.BytesIO()
+    sv = SeqValidator(fqi, 0, out_fh=out_fh, progress_pairs=0, engine=engine, backend='python',
+                      performance=True)
+    sv.validate()
+    report = sv.summary()['performance']
+    assert report['records'] == sv.pairs * 2
+    assert report['input_bytes'] == os.path.getsize(fqi)
+    with open(os.path.join(test_dir, 'good_read_i.fq'), 'rb') as fp:
+        assert report['decompressed_bytes'] == len(fp.read())
+    assert report['output_bytes'] == len(out_fh.getvalue())
+    assert set(['io', 'decode', 'parse', 'check_pair', 'qual_range', 'output']) \
+        == set(report['stages'])
+
+def test_seq_val_performance_engines():
+    with pytest.raises(SeqValidationError):
+        SeqValidator(os.path.join(test_dir, 'good_read_i.fq'), 0, engine='line',
+                     performance=True)
+
+def test_seq_val_cli_cache_unusable(tmp_path):
+    from argparse import Namespace
+    not_dir = tmp_path / 'file'
+    not_dir.write_text('')
+    args = Namespace(input=[os.path.join(test_dir, 'good_read_1.fq'),
+                            os.path.join(test_dir, 'good_read_2.fq')],
+                     qc=0, output=None, engine='block', backend='python', threads=1,
+                     write_backend='python', compress_level=6, processes=None, stats=False,
+                     strict=False, checkpoint=None, checkpoint_interval=600, resume=False,
+                     sample=0, cache=str(not_dir / 'cgp_seq_input_val' / 'results.sqlite'),
+                     no_cache=False, digests=None, performance=False, resources=False,
+                     profiler=None, report=io.StringIO())
+    seq_validator.validate_seq_files(args)
+    report = json.loads(args.report.getvalue())
+    assert report['pairs'] > 0 and 'cached' not in report
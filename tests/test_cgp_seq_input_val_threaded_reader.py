@@ -0,0 +1,50 @@
+import pytest
+import io
+
+from cgp_seq_input_val.fastq_block import FastqBlockReader
+from cgp_seq_input_val.fastq_read import FastqFormat
+from cgp_seq_input_val.threaded_reader import ThreadedRecordReader
+from cgp_seq_input_val.error_classes import SeqValidationError
+
+GOOD = b''.join(b'@r%d/1\nACGT\n+\nIIII\n' % i for i in range(10))
+
+
+def reader_for(data, batch_records):
+    return ThreadedRecordReader(FastqBlockReader(io.BytesIO(data)),
+                                FastqFormat.ILLUMINA, 'x', batch_records)
+
+
+def test_threaded_reader_batches():
+    worker = reader_for(GOOD, 4)
+    names = []
+    while True:
+        batch = worker.get()
+        assert batch.error is None
+        names.extend([record[1] for record in batch.records])
+        if batch.terminal():
+            break
+    worker.stop()
+    assert names == [b'@r%d/1' % i for i in range(10)]
+    assert batch.finished
+
+
+def test_threaded_reader_error_in_order():
+    data = GOOD + b'@bad\nACGT\n+\nIIII\n' + GOOD
+    worker = reader_for(data, 4)
+    count = 0
+    while True:
+        batch = worker.get()
+        count += len(batch)
+        if batch.terminal():
+            break
+    worker.stop()
+    assert count == 10  # records before the error are still returned
+    assert isinstance(batch.error, SeqValidationError)
+    assert 'line 31 of x' in str(batch.error)
+
+
+def test_threaded_reader_stop_when_full():
+    # consumer stops without reading, worker must not block forever
+    worker = reader_for(GOOD * 100, 2)
+    worker.stop()
+    assert not worker._thread.is_alive()
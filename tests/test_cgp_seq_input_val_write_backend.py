@@ -0,0 +1,118 @@
+import pytest
+import bz2, gzip, hashlib, os, shutil
+
+from cgp_seq_input_val import bgzf, write_backend
+from cgp_seq_input_val.write_backend import PipedWriter, select_backend, open_output
+from cgp_seq_input_val.error_classes import SeqValidationError
+from cgp_seq_input_val.digest import Digester
+
+test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fastq_read')
+
+with open(os.path.join(test_dir, 'good_read_i.fq'), 'rb') as fp:
+    expected = fp.read() * 20
+
+
+def read_output(path):
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    return gzip.decompress(data) if path.endswith('.gz') else data
+
+
+@pytest.mark.parametrize('file_name', ['out.fq', 'out.fq.gz'])
+@pytest.mark.parametrize('threads', [1, 2])
+def test_python_backend(tmp_path, file_name, threads):
+    path = str(tmp_path / file_name)
+    with open_output(path, 'python', threads=threads) as fp:
+        fp.write(expected)
+    assert read_output(path) == expected
+    if file_name.endswith('.gz'):
+        assert bgzf.is_bgzf(path)
+
+
+def test_python_backend_text(tmp_path):
+    path = str(tmp_path / 'out.fq.gz')
+    with open_output(path, 'python', text=True) as fp:
+        fp.write(expected.decode())
+    assert read_output(path) == expected
+
+
+def test_python_backend_level(tmp_path):
+    sizes = []
+    for level in (1, 6, 9):
+        path = str(tmp_path / ('out%d.fq.gz' % level))
+        with open_output(path, 'python', level=level) as fp:
+            fp.write(expected)
+        assert read_output(path) == expected
+        sizes.append(os.path.getsize(path))
+    assert sizes[0] > sizes[1] >= sizes[2]
+
+
+def test_other_compression(tmp_path):
+    path = str(tmp_path / 'out.fq.bz2')
+    with open_output(path) as fp:
+        fp.write(expected)
+    with bz2.open(path, 'rb') as fp:
+        assert fp.read() == expected
+
+
+def test_piped_writer(tmp_path):
+    if shutil.which('gzip') is None:
+        pytest.skip('gzip not installed')
+    path = str(tmp_path / 'out.fq.gz')
+    with PipedWriter(['gzip', '-c', '-1'], path) as fp:
+        fp.write(expected)
+    assert read_output(path) == expected
+
+
+def test_piped_writer_failure(tmp_path):
+    if shutil.which('gzip') is None:
+        pytest.skip('gzip not installed')
+    with pytest.raises(SeqValidationError) as e_info:
+        with PipedWriter(['gzip', '--no-such-option'], str(tmp_path / 'out.fq.gz')) as fp:
+            pass
+    assert "'gzip' failed" in str(e_info.value)
+
+
+def test_select_backend():
+    assert select_backend(None, 'pigz') == 'python'
+    assert select_backend('bz2', 'auto') == 'python'
+    assert select_backend('gzip', 'auto') in write_backend.BACKEND_ORDER['gzip']
+
+
+def test_select_backend_unsuitable():
+    with pytest.raises(SeqValidationError) as e_info:
+        select_backend('bz2', 'bgzip')
+    assert 'can not write bz2' in str(e_info.value)
+
+
+def test_select_backend_unavailable(monkeypatch):
+    monkeypatch.setattr(shutil, 'which', lambda name: None)
+    assert select_backend('gzip', 'auto') == 'python'
+    with pytest.raises(SeqValidationError) as e_info:
+        select_backend('gzip', 'pigz')
+    assert 'not available' in str(e_info.value)
+
+
+@pytest.mark.parametrize('file_name', ['out.fq', 'out.fq.gz', 'out.fq.bz2'])
+def test_python_backend_digest(tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    digester = Digester(path, ['sha256'])
+    with open_output(path, 'python', threads=2, digester=digester) as fp:
+        fp.write(expected)
+    checksums = digester.hexdigests()  # bz2 output is only complete now
+    assert digester.position == os.path.getsize(path)
+    with open(path, 'rb') as fp:
+        assert checksums == {'sha256': hashlib.sha256(fp.read()).hexdigest()}
+
+
+def test_piped_writer_digest(tmp_path):
+    if shutil.which('gzip') is None:
+        pytest.skip('gzip not installed')
+    path = str(tmp_path / 'out.fq.gz')
+    digester = Digester(path, ['md5'])
+    with PipedWriter(['gzip', '-c', '-1'], path, digester) as fp:
+        fp.write(expected)
+    assert read_output(path) == expected
+    assert digester.position == os.path.getsize(path)
+    with open(path, 'rb') as fp:
+        assert digester.hexdigests() == {'md5': hashlib.md5(fp.read()).hexdigest()}